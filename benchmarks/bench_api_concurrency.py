@@ -0,0 +1,104 @@
+"""
+REST API throughput under a mix of slow and fast database queries, with and
+without the gevent psycopg2 wait callback. Needs the database from .env.
+
+    python -m benchmarks.bench_api_concurrency [mode] [clients] [seconds] [slow_percent] [slow_ms]
+
+mode is "blocking" (no wait callback), "cooperative" (make_cooperative), or
+omitted to run both, each in its own process. Every client thread sends
+requests back to back over a keep-alive connection; ``slow_percent`` of them
+run pg_sleep(slow_ms), the others SELECT 1. With the blocking driver every
+slow query stalls the whole API hub, so fast requests queue behind it.
+"""
+import sys
+import time
+import threading
+import subprocess
+import http.client
+import gevent
+from flask import Flask
+from gevent.pool import Pool
+from gevent.pywsgi import WSGIServer
+from src.config.env_loader import API_MAX_CONCURRENCY
+from src.config.postgresql import with_connection, make_cooperative
+
+MODES = ('blocking', 'cooperative')
+
+@with_connection
+def slow_query(cursor, seconds):
+    cursor.execute("SELECT pg_sleep(%s)", (seconds,))
+
+@with_connection
+def fast_query(cursor):
+    cursor.execute("SELECT 1")
+    return cursor.fetchone()[0]
+
+def create_app(slow_seconds):
+    app = Flask(__name__)
+
+    @app.route('/slow')
+    def slow():
+        slow_query(slow_seconds)
+        return 'slow'
+
+    @app.route('/fast')
+    def fast():
+        return str(fast_query())
+
+    return app
+
+def run_client(port, deadline, slow_every, latencies, counts):
+    sent = 0
+    while time.perf_counter() < deadline:
+        sent += 1
+        path = '/slow' if slow_every and sent % slow_every == 0 else '/fast'
+        started = time.perf_counter()
+        # One connection per request: keep-alive adds delayed-ACK stalls that would hide the difference
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        connection.request('GET', path, headers={'Connection': 'close'})
+        connection.getresponse().read()
+        connection.close()
+        if path == '/fast':
+            latencies.append(time.perf_counter() - started)
+        counts[path] = counts.get(path, 0) + 1
+
+def run(mode, clients, seconds, slow_percent, slow_ms):
+    if mode == 'cooperative':
+        make_cooperative()
+    server = WSGIServer(('127.0.0.1', 0), create_app(slow_ms / 1000), spawn=Pool(API_MAX_CONCURRENCY), log=None)
+    server.start()
+
+    slow_every = round(100 / slow_percent) if slow_percent else 0
+    latencies, counts = [], {}
+    deadline = time.perf_counter() + seconds
+    # Clients are plain threads; the server runs on this thread's hub while they are alive
+    threads = [threading.Thread(target=run_client, args=(server.server_port, deadline, slow_every, latencies, counts))
+               for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        gevent.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    server.stop()
+
+    latencies.sort()
+    total = sum(counts.values())
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+    print(f"{mode:>11}: {total / elapsed:8,.0f} req/s ({counts.get('/fast', 0)} fast, {counts.get('/slow', 0)} slow "
+          f"in {elapsed:.1f}s), fast p50 {p50:.1f} ms, p99 {p99:.1f} ms")
+
+def main(mode=None, clients=50, seconds=10, slow_percent=10, slow_ms=200):
+    if mode is None:
+        print(f"{clients} clients, {slow_percent}% slow requests of {slow_ms} ms")
+        for mode in MODES:
+            subprocess.run([sys.executable, '-m', 'benchmarks.bench_api_concurrency', mode,
+                            str(clients), str(seconds), str(slow_percent), str(slow_ms)], check=True)
+        return
+    if mode not in MODES:
+        raise SystemExit(f"mode must be one of {', '.join(MODES)}")
+    run(mode, int(clients), float(seconds), float(slow_percent), float(slow_ms))
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
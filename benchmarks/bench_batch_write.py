@@ -0,0 +1,80 @@
+"""
+asset_data write throughput: one round trip per fix versus micro-batches.
+Needs the database from .env, and writes to it (use a scratch database).
+
+    python -m benchmarks.bench_batch_write [fixes] [batch_size] [workers] [devices]
+
+Times ``upload_data`` called once per fix (on the first 2000 fixes, the way
+ingest used to write), then ``upload_data_batch`` over batches of
+``batch_size`` fixes, first from one thread and then from ``workers``
+threads each writing its own devices, like the ingest worker shards.
+Every run writes new devices and GPS times, so nothing is skipped as a
+duplicate and devices are upserted on their first batch, as in production.
+"""
+import sys
+import time
+import random
+import logging
+import threading
+from datetime import datetime, timedelta
+from src.config.env_loader import INGEST_BATCH_SIZE, INGEST_WORKERS
+from src.data_models.mtrack_data_model import upload_data, upload_data_batch
+from src.ingest.mt700_parser import Fix, VALID_POSITION
+
+SINGLE_FIXES = 2000
+TARGET_RATE = 20000
+
+def synthetic_fixes(rng, count, device_count, run):
+    """Fixes of ``device_count`` new devices, each reporting every 10 seconds."""
+    devices = [f"99{run:07d}{i:06d}" for i in range(device_count)]
+    start = datetime(2020, 1, 1) + timedelta(seconds=run * 10)
+    fixes = []
+    for i in range(count):
+        device = i % device_count
+        fixes.append(Fix(0, devices[device], VALID_POSITION, round(rng.uniform(3.4, 4.2), 2),
+                         rng.uniform(-60, 60), rng.uniform(-180, 180), round(rng.uniform(0, 90), 2),
+                         start + timedelta(seconds=10 * (i // device_count))))
+    return fixes
+
+def batched(fixes, batch_size):
+    return [fixes[i:i + batch_size] for i in range(0, len(fixes), batch_size)]
+
+def timed(name, count, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed
+    print(f"{name:>26}: {count:7d} fixes in {elapsed:6.2f}s, {rate:8,.0f} fixes/s")
+    return rate
+
+def write_sharded(shards):
+    threads = [threading.Thread(target=lambda batches=batches: [upload_data_batch(batch) for batch in batches])
+               for batches in shards]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def main(fix_count=200000, batch_size=INGEST_BATCH_SIZE, workers=INGEST_WORKERS, device_count=10000):
+    logging.disable(logging.INFO)
+    rng = random.Random(1)
+    # A new range of device ids and GPS times per run
+    run = int(time.time()) % 10 ** 7
+
+    single = synthetic_fixes(rng, SINGLE_FIXES, min(device_count, SINGLE_FIXES), run)
+    timed('upload_data per fix', len(single), lambda: [upload_data(fix) for fix in single])
+
+    fixes = synthetic_fixes(rng, fix_count, device_count, run + 1)
+    timed(f"batches of {batch_size}, 1 thread", len(fixes), lambda: [upload_data_batch(batch)
+                                                                     for batch in batched(fixes, batch_size)])
+
+    # Shard by device like the ingest pool, so workers never write the same device
+    fixes = synthetic_fixes(rng, fix_count, device_count, run + 2)
+    shards = [batched([fix for fix in fixes if hash(fix.device_id) % workers == shard], batch_size)
+              for shard in range(workers)]
+    rate = timed(f"batches of {batch_size}, {workers} threads", len(fixes), lambda: write_sharded(shards))
+    verdict = "meets" if rate >= TARGET_RATE else "misses"
+    print(f"{verdict} the {TARGET_RATE:,} fixes/s target")
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,47 @@
+"""
+Memory held by parsed fixes waiting in the ingest pipeline (no database needed).
+
+    python -m benchmarks.bench_fix_memory [fixes] [batch_size]
+
+Parses ``fixes`` synthetic frames into the camelCase dicts the pipeline used
+to carry (``legacy_parse``) and into Fix records (``parse_many``
+over micro-batches), keeps every fix alive like a backed-up queue, and
+reports what tracemalloc attributes to them: memory blocks and bytes still
+held per fix, and the peak while parsing.
+"""
+import sys
+import random
+import logging
+import tracemalloc
+from src.ingest.mt700_parser import parse_many
+from benchmarks.bench_mt700_parser import legacy_parse, synthetic_frame
+
+def measure(build):
+    tracemalloc.start()
+    kept = build()
+    snapshot = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    statistics = snapshot.statistics('filename')
+    return kept, sum(stat.count for stat in statistics), sum(stat.size for stat in statistics), peak
+
+def main(fix_count=100000, batch_size=500):
+    logging.disable(logging.WARNING)
+    rng = random.Random(1)
+    devices = [f"86018602{i:07d}" for i in range(10000)]
+    frames = [synthetic_frame(rng, rng.choice(devices)) for _ in range(fix_count)]
+    batches = [frames[i:i + batch_size] for i in range(0, fix_count, batch_size)]
+
+    results = {
+        'dicts': measure(lambda: [legacy_parse(frame) for frame in frames]),
+        'Fix records': measure(lambda: [fix for batch in batches for fix in parse_many(batch).fixes()]),
+    }
+    for name, (kept, blocks, size, peak) in results.items():
+        print(f"{name:>11}: {blocks / len(kept):5.1f} blocks/fix, {size / len(kept):6.0f} bytes/fix held, "
+              f"peak {peak / 2 ** 20:6.1f} MiB for {len(kept)} fixes")
+    _, dict_blocks, dict_size, _ = results['dicts']
+    _, fix_blocks, fix_size, _ = results['Fix records']
+    print(f"reduction: {1 - fix_blocks / dict_blocks:.0%} fewer blocks, {1 - fix_size / dict_size:.0%} less memory")
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,68 @@
+"""
+Geofence evaluation throughput on synthetic data (no database needed).
+
+    python -m benchmarks.bench_geofence [fences] [fixes] [batch_size]
+"""
+import sys
+import math
+import time
+import random
+from src.ingest.geofence import GeofenceEngine
+
+def make_fences(count, seed=1):
+    rng = random.Random(seed)
+    fences = []
+    for i in range(count):
+        lat, lon = rng.uniform(-60, 60), rng.uniform(-180, 180)
+        if i % 2:
+            fences.append({'geofence_id': i, 'name': f'circle-{i}', 'shape': 'circle',
+                           'center_latitude': lat, 'center_longitude': lon,
+                           'radius_meters': rng.uniform(100, 5000), 'vertices': None})
+        else:
+            size = rng.uniform(0.005, 0.1)
+            sides = rng.randint(4, 12)
+            vertices = [[lon + size * rng.uniform(0.5, 1) * _cos(k, sides),
+                         lat + size * rng.uniform(0.5, 1) * _sin(k, sides)] for k in range(sides)]
+            fences.append({'geofence_id': i, 'name': f'polygon-{i}', 'shape': 'polygon',
+                           'vertices': vertices, 'center_latitude': None,
+                           'center_longitude': None, 'radius_meters': None})
+    return fences
+
+def _cos(k, n):
+    return math.cos(2 * math.pi * k / n)
+
+def _sin(k, n):
+    return math.sin(2 * math.pi * k / n)
+
+def main(fence_count=50000, fix_count=200000, batch_size=500):
+    fences = make_fences(fence_count)
+    engine = GeofenceEngine()
+    started = time.perf_counter()
+    engine.load(fences)
+    print(f"indexed {fence_count} fences in {time.perf_counter() - started:.2f}s")
+
+    rng = random.Random(2)
+    # Half of the fixes are placed near a fence so the exact tests actually run
+    anchors = [(f['center_latitude'], f['center_longitude']) if f['shape'] == 'circle'
+               else (f['vertices'][0][1], f['vertices'][0][0]) for f in fences]
+    devices = [f"35{i:013d}" for i in range(5000)]
+    fixes = []
+    for i in range(fix_count):
+        if i % 2:
+            lat, lon = rng.choice(anchors)
+            lat, lon = lat + rng.uniform(-0.02, 0.02), lon + rng.uniform(-0.02, 0.02)
+        else:
+            lat, lon = rng.uniform(-60, 60), rng.uniform(-180, 180)
+        fixes.append((rng.choice(devices), lat, lon))
+
+    started = time.perf_counter()
+    for offset in range(0, fix_count, batch_size):
+        batch = fixes[offset:offset + batch_size]
+        engine.evaluate([f[0] for f in batch], [f[1] for f in batch], [f[2] for f in batch])
+    elapsed = time.perf_counter() - started
+    print(f"evaluated {fix_count} fixes in batches of {batch_size}: {elapsed:.2f}s, "
+          f"{elapsed / fix_count * 1e6:.1f} us/fix, {fix_count / elapsed:,.0f} fixes/s")
+    print(engine.stats())
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
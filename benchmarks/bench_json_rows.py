@@ -0,0 +1,85 @@
+"""
+JSON encoding cost of a device history response (no database needed).
+
+    python -m benchmarks.bench_json_rows [rows] [runs]
+
+Builds ``rows`` synthetic asset data rows as the cursor returns them and
+times how long they take to become response text: before, rows became dicts,
+went through ``serialize_data`` (kept below verbatim) and then through Flask's
+default provider; now RowJSONProvider encodes them straight from the tuples.
+Both the single-document (jsonify) and the chunked streaming paths are
+timed, and their outputs are checked to be identical. Best of ``runs``.
+"""
+import sys
+import time
+import random
+from datetime import date, time as dt_time, datetime, timedelta, timezone
+from decimal import Decimal
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from src.restapi.json_provider import Rows, RowJSONProvider
+
+COLUMNS = ['id', 'device_id', 'voltage', 'status', 'current_speed', 'gps_date', 'gps_time',
+           'inserted_at', 'latitude', 'longitude']
+CHUNK_ROWS = 2000
+
+def serialize_data(data):
+    if isinstance(data, dict):
+        return {k: serialize_data(v) for k, v in data.items()}
+    elif isinstance(data, list):
+        return [serialize_data(item) for item in data]
+    elif isinstance(data, (date, dt_time, datetime)):
+        return data.isoformat()
+    return data
+
+def synthetic_rows(rng, count):
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(count):
+        at = start + timedelta(seconds=30 * i, microseconds=rng.randint(0, 999999))
+        rows.append((i + 1, '860186020000001', Decimal(f"{rng.uniform(30, 42):.2f}"),
+                     rng.choice(('valid_position', 'invalid_position')), Decimal(f"{rng.uniform(0, 90):.2f}"),
+                     at.date(), at.time().replace(microsecond=0), at,
+                     Decimal(f"{rng.uniform(-90, 90):.8f}"), Decimal(f"{rng.uniform(-180, 180):.8f}")))
+    return rows
+
+def best_of(runs, func):
+    best = float('inf')
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def main(row_count=100000, runs=3):
+    rows = synthetic_rows(random.Random(1), row_count)
+    app = Flask(__name__)
+    default, provider = DefaultJSONProvider(app), RowJSONProvider(app)
+    chunks = [rows[i:i + CHUNK_ROWS] for i in range(0, row_count, CHUNK_ROWS)]
+
+    def legacy_document():
+        return default.dumps(serialize_data([dict(zip(COLUMNS, row)) for row in rows]), separators=(",", ":"))
+
+    def legacy_stream():
+        return [default.dumps(serialize_data(dict(zip(COLUMNS, row))), separators=(",", ":"))
+                for chunk in chunks for row in chunk]
+
+    def document():
+        return provider.dumps(Rows(COLUMNS, rows), separators=(",", ":"))
+
+    def stream():
+        return [text for chunk in chunks for text in provider.encode_rows(Rows(COLUMNS, chunk))]
+
+    results = {}
+    for name, func in (('legacy document', legacy_document), ('document', document),
+                       ('legacy stream', legacy_stream), ('stream', stream)):
+        results[name] = best_of(runs, func)
+        seconds, _ = results[name]
+        print(f"{name:>15}: {seconds * 1000:7.1f} ms, {seconds / row_count * 1e6:.2f} us/row")
+    assert results['document'][1] == results['legacy document'][1], "document output differs"
+    assert results['stream'][1] == results['legacy stream'][1], "stream output differs"
+    print(f"speedup: document {results['legacy document'][0] / results['document'][0]:.1f}x, "
+          f"stream {results['legacy stream'][0] / results['stream'][0]:.1f}x (outputs identical)")
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,98 @@
+"""
+MT700 frame parsing throughput on a synthetic corpus (no database needed).
+
+    python -m benchmarks.bench_mt700_parser [frames] [batch_size] [runs]
+
+Compares the per-frame split parser that parse_device_message used to be
+(kept below verbatim as ``legacy_parse``) with parse_many over micro-batches
+of ``batch_size`` frames, the way the ingest workers call it: once filling
+the FixBatch columns only, and once also turning them into the Fix records
+the ingest pipeline carries. Each is timed ``runs`` times and the best run
+is reported.
+"""
+import sys
+import time
+import random
+import logging
+from src.ingest.mt700_parser import parse_many, nmea_checksum
+
+def legacy_parse(msg):
+    try:
+        parts = msg.split("#")
+        device_id = parts[1]
+        voltage = parts[6].split("$")[0]
+        gprmc_raw = parts[6].split("$")[1].split(",")
+
+        time_utc = gprmc_raw[1] or "0"
+        status = gprmc_raw[2]
+        status_message = {
+            "A": "valid_position",
+            "L": "last_known_position",
+            "V": "invalid_position"
+        }.get(status, "invalid_position")
+
+        latitude_raw = gprmc_raw[3] or "0"
+        latitude_direction = gprmc_raw[4] or "N"
+        longitude_raw = gprmc_raw[5] or "0"
+        longitude_direction = gprmc_raw[6] or "E"
+        speed_knots = gprmc_raw[7] or "0"
+        date = gprmc_raw[9] or "0"
+
+        def convert_to_decimal(degree_minutes, direction):
+            degrees = float(degree_minutes[:-7]) if degree_minutes else 0
+            minutes = float(degree_minutes[-7:]) / 60 if degree_minutes else 0
+            decimal = degrees + minutes
+            return -decimal if direction in ['S', 'W'] else decimal
+
+        latitude = convert_to_decimal(latitude_raw, latitude_direction)
+        longitude = convert_to_decimal(longitude_raw, longitude_direction)
+
+        return {
+            "deviceId": device_id,
+            "voltage": float(voltage),
+            "status": status_message,
+            "latitude": latitude,
+            "longitude": longitude,
+            "currentSpeed": float(speed_knots),
+            "gpsDate": f"20{date[4:6]}-{date[2:4]}-{date[:2]}",
+            "gpsTime": f"{time_utc[:2]}:{time_utc[2:4]}:{time_utc[4:6]}"
+        }
+    except Exception:
+        return None
+
+def synthetic_frame(rng, device_id):
+    sentence = (f"GPRMC,{rng.randint(0, 23):02d}{rng.randint(0, 59):02d}{rng.randint(0, 59):02d}.00,"
+                f"{rng.choice('AAAAV')},{rng.randint(0, 89) * 100 + rng.uniform(0, 59.9999):09.4f},{rng.choice('NS')},"
+                f"{rng.randint(0, 179) * 100 + rng.uniform(0, 59.9999):010.4f},{rng.choice('EW')},"
+                f"{rng.uniform(0, 90):.2f},{rng.uniform(0, 360):.2f},"
+                f"{rng.randint(1, 28):02d}{rng.randint(1, 12):02d}{rng.randint(20, 30):02d},,,A")
+    return (f"#{device_id}#MT700#0000#AUTO#1\r\n#{rng.randint(30, 42)}${sentence}"
+            f"*{nmea_checksum(sentence):02X}\r\n##")
+
+def best_of(runs, func):
+    best = float('inf')
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def main(frame_count=200000, batch_size=500, runs=3):
+    logging.disable(logging.WARNING)
+    rng = random.Random(1)
+    devices = [f"86018602{i:07d}" for i in range(10000)]
+    frames = [synthetic_frame(rng, rng.choice(devices)) for _ in range(frame_count)]
+    batches = [frames[i:i + batch_size] for i in range(0, frame_count, batch_size)]
+
+    legacy, _ = best_of(runs, lambda: [legacy_parse(frame) for frame in frames])
+    batched, parsed = best_of(runs, lambda: sum(len(parse_many(batch)) for batch in batches))
+    records, _ = best_of(runs, lambda: sum(len(parse_many(batch).fixes()) for batch in batches))
+
+    print(f"legacy per-frame parser: {legacy / frame_count * 1e6:.2f} us/frame, {frame_count / legacy:,.0f} frames/s")
+    for name, seconds in ((f"parse_many ({batch_size}/batch)", batched), ("parse_many + fixes()", records)):
+        print(f"{name}: {seconds / frame_count * 1e6:.2f} us/frame, {frame_count / seconds:,.0f} frames/s, "
+              f"{legacy / seconds:.1f}x")
+    print(f"{parsed} fixes, checksums checked")
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,42 @@
+"""
+Speed rule evaluation throughput on synthetic data (no database needed).
+
+    python -m benchmarks.bench_speed_rules [devices] [fixes] [batch_size]
+
+The measured rate should stay well above the batched database write rate
+(see bench_batch_write).
+"""
+import sys
+import time
+import random
+from src.ingest.speed_rules import SpeedRuleEngine, SpeedRule
+
+def main(device_count=10000, fix_count=1000000, batch_size=500):
+    rng = random.Random(1)
+    engine = SpeedRuleEngine(rules=[SpeedRule(60, 30), SpeedRule(80, 10), SpeedRule(100, 0)])
+    devices = [f"35{i:013d}" for i in range(device_count)]
+    clock = {device_id: 1700000000.0 for device_id in devices}
+    speed = {device_id: rng.uniform(0, 90) for device_id in devices}
+
+    batches = []
+    for offset in range(0, fix_count, batch_size):
+        ids, times, speeds = [], [], []
+        for _ in range(min(batch_size, fix_count - offset)):
+            device_id = rng.choice(devices)
+            clock[device_id] += rng.uniform(5, 15)
+            speed[device_id] = min(120.0, max(0.0, speed[device_id] + rng.uniform(-8, 8)))
+            ids.append(device_id)
+            times.append(clock[device_id])
+            speeds.append(speed[device_id])
+        batches.append((ids, times, speeds))
+
+    started = time.perf_counter()
+    for ids, times, speeds in batches:
+        engine.evaluate(ids, times, speeds)
+    elapsed = time.perf_counter() - started
+    print(f"evaluated {fix_count} fixes from {device_count} devices against {len(engine.rules)} rules: "
+          f"{elapsed:.2f}s, {elapsed / fix_count * 1e6:.2f} us/fix, {fix_count / elapsed:,.0f} fixes/s")
+    print(engine.stats())
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
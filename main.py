@@ -1,20 +1,52 @@
 import os
 import logging
 import threading
+from gevent.pool import Pool
 from gevent.pywsgi import WSGIServer
 from src.config.logger import setup_logging
+from src.config.env_loader import API_MAX_CONCURRENCY, LIVE_MAX_SUBSCRIBERS
+from src.config.postgresql import make_cooperative
 from src.tcp_receivers.mtrack_receiver import create_tcp_receiver
-from src.controllers.mtrack_data_parser import process_message
+from src.tcp_receivers.mtrack_framer import frame_device_id
+from src.ingest.worker_pool import create_ingest_pool
+from src.ingest.device_registry import device_registry
+from src.ingest.battery_alerts import battery_alerts
+from src.ingest.geofence import geofences
+from src.ingest.offline_detector import offline_detector
+from src.ingest.event_bus import event_bus, FIX, NOTIFICATION, USER
+from src.ingest.latest_state import latest_state
+from src.ingest.live_feed import live_feed
+from src.middleware.principal_cache import principal_cache
+from src.controllers.mtrack_data_parser import process_messages, handle_offline_notification
 from src.restapi.mtrack_api import app
 
 log_filename = setup_logging()
 
+def start_event_bus():
+    # Fixes and notifications from every process feed this process's live streams;
+    # fixes stored by other processes also refresh the latest-position table, and
+    # user changes made there drop this process's cached tokens
+    event_bus.subscribe(FIX, lambda rows: live_feed.publish(FIX, rows))
+    event_bus.subscribe(NOTIFICATION, lambda notifications: live_feed.publish(NOTIFICATION, notifications))
+    event_bus.subscribe(FIX, latest_state.update, remote_only=True)
+    event_bus.subscribe(USER, principal_cache.invalidate_events, remote_only=True)
+    event_bus.start()
+
 def start_tcp_receiver():
-    tcp_receiver = create_tcp_receiver(process_message)
+    device_registry.start()
+    battery_alerts.start()
+    geofences.start()
+    offline_detector.start(handle_offline_notification)
+    # Messages are processed in micro-batches off the socket greenlets, sharded by device IMEI
+    ingest_pool = create_ingest_pool(process_messages, key_func=frame_device_id)
+    ingest_pool.start()
+    tcp_receiver = create_tcp_receiver(ingest_pool.submit)
     tcp_receiver.start()
 
 def start_flask_api():
-    http_server = WSGIServer(('0.0.0.0', 5000), app)
+    # Live streams hold their greenlet for as long as the client stays connected,
+    # so they get their own share on top of the request limit
+    http_server = WSGIServer(('0.0.0.0', 5000), app, spawn=Pool(API_MAX_CONCURRENCY + LIVE_MAX_SUBSCRIBERS))
     http_server.serve_forever()
 
 def user_input_handler():
@@ -31,6 +63,12 @@ def user_input_handler():
 if __name__ == "__main__":
     logging.info("Initializing application")
 
+    # Database calls suspend only their own greenlet instead of the whole hub
+    make_cooperative()
+
+    # Before the receiver and the API, so no event published at start-up is missed
+    start_event_bus()
+
     # Start TCP receiver in a separate thread
     tcp_thread = threading.Thread(target=start_tcp_receiver)
     tcp_thread.start()
@@ -4,6 +4,8 @@ CREATE TYPE status_message AS ENUM ('valid_position', 'last_known_position', 'in
 -- Create devices table
 CREATE TABLE devices (
     device_id VARCHAR(50) PRIMARY KEY,
+    -- Silence after which device_offline is raised (NULL = DEVICE_OFFLINE_TIMEOUT)
+    offline_timeout_seconds INTEGER CHECK (offline_timeout_seconds > 0),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
@@ -33,6 +35,10 @@ CREATE TABLE asset_data (
 -- Create index on device_id and inserted_at for faster queries
 CREATE INDEX idx_asset_data_device_id_inserted_at ON asset_data(device_id, inserted_at);
 
+-- One row per device and GPS fix time: retransmitted frames are skipped on insert
+-- (latitude and longitude live in locations; a unit reports one position per second)
+CREATE UNIQUE INDEX idx_asset_data_device_fix ON asset_data(device_id, gps_date, gps_time);
+
 -- Create index on location_id for faster joins
 CREATE INDEX idx_asset_data_location_id ON asset_data(location_id);
 
@@ -75,10 +81,39 @@ CREATE TABLE notifications (
 );
 
 -- Create indexes for better query performance
-CREATE INDEX idx_notifications_device_id ON notifications(device_id);
-CREATE INDEX idx_notifications_type ON notifications(type);
-CREATE INDEX idx_notifications_status ON notifications(status);
-CREATE INDEX idx_notifications_created_at ON notifications(created_at);
+-- Per-device listing, newest first (keyset on created_at, notification_id)
+CREATE INDEX idx_notifications_device_created ON notifications(device_id, created_at, notification_id);
+-- Fleet-wide pending queue, oldest first
+CREATE INDEX idx_notifications_pending ON notifications(created_at, notification_id)
+    WHERE status = 'pending';
+-- Latest active notification of a type per device (alert engines warm-up)
+CREATE INDEX idx_notifications_active_type ON notifications(type, device_id, created_at)
+    WHERE status IN ('pending', 'sent');
+
+-- Create enum for geofence shapes
+CREATE TYPE geofence_shape AS ENUM ('polygon', 'circle');
+
+-- Create geofences table (applies to every device)
+CREATE TABLE geofences (
+    geofence_id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    shape geofence_shape NOT NULL,
+    -- Polygon ring as a JSON array of [longitude, latitude] pairs
+    vertices JSONB,
+    center_latitude DECIMAL(10, 8),
+    center_longitude DECIMAL(11, 8),
+    radius_meters DOUBLE PRECISION,
+    active BOOLEAN NOT NULL DEFAULT TRUE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CHECK (
+        (shape = 'polygon' AND jsonb_typeof(vertices) = 'array' AND jsonb_array_length(vertices) >= 3)
+        OR (shape = 'circle' AND center_latitude IS NOT NULL AND center_longitude IS NOT NULL
+            AND radius_meters > 0)
+    )
+);
+
+CREATE INDEX idx_geofences_active ON geofences(active);
 
 -- Create trigger to update updated_at column
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -93,3 +128,8 @@ CREATE TRIGGER update_notifications_updated_at
     BEFORE UPDATE ON notifications
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
+
+CREATE TRIGGER update_geofences_updated_at
+    BEFORE UPDATE ON geofences
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
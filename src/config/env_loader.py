@@ -10,3 +10,56 @@ POSTGRE_DATABASE=os.getenv('POSTGRE_DATABASE')
 POSTGRE_USERNAME=os.getenv('POSTGRE_USERNAME')
 POSTGRE_PASSWORD=os.getenv('POSTGRE_PASSWORD')
 SECRET_KEY=os.getenv("SECRET_KEY")
+
+# Verified-token cache of token_required (0 disables it)
+AUTH_CACHE_TTL=float(os.getenv('AUTH_CACHE_TTL', 60))
+AUTH_CACHE_SIZE=int(os.getenv('AUTH_CACHE_SIZE', 10000))
+
+# TCP receiver tuning
+TCP_IDLE_TIMEOUT=float(os.getenv('TCP_IDLE_TIMEOUT', 300))
+TCP_MAX_CONNECTIONS=int(os.getenv('TCP_MAX_CONNECTIONS', 10000))
+TCP_MAX_FRAME_SIZE=int(os.getenv('TCP_MAX_FRAME_SIZE', 64 * 1024))
+
+# Ingest pipeline tuning
+INGEST_WORKERS=int(os.getenv('INGEST_WORKERS', 8))
+INGEST_QUEUE_SIZE=int(os.getenv('INGEST_QUEUE_SIZE', 10000))
+INGEST_BATCH_SIZE=int(os.getenv('INGEST_BATCH_SIZE', 500))
+INGEST_BATCH_WINDOW_MS=float(os.getenv('INGEST_BATCH_WINDOW_MS', 20))
+# Drop MT700 records whose NMEA checksum does not match; mismatches are always logged and counted
+NMEA_CHECKSUM_REQUIRED=os.getenv('NMEA_CHECKSUM_REQUIRED', 'false').lower() in ('1', 'true', 'yes')
+DEVICE_LAST_SEEN_FLUSH_INTERVAL=float(os.getenv('DEVICE_LAST_SEEN_FLUSH_INTERVAL', 30))
+BATTERY_HYSTERESIS=float(os.getenv('BATTERY_HYSTERESIS', 0.5))
+GEOFENCE_CELL_SIZE=float(os.getenv('GEOFENCE_CELL_SIZE', 0.05))
+GEOFENCE_RELOAD_INTERVAL=float(os.getenv('GEOFENCE_RELOAD_INTERVAL', 60))
+# Comma-separated "knots:seconds" rules, e.g. "60:30,80:10"
+SPEED_RULES=os.getenv('SPEED_RULES', '60:30')
+SPEED_HYSTERESIS=float(os.getenv('SPEED_HYSTERESIS', 2))
+DEVICE_OFFLINE_TIMEOUT=float(os.getenv('DEVICE_OFFLINE_TIMEOUT', 900))
+DEVICE_OFFLINE_TICK=float(os.getenv('DEVICE_OFFLINE_TICK', 5))
+DEVICE_OFFLINE_RELOAD_INTERVAL=float(os.getenv('DEVICE_OFFLINE_RELOAD_INTERVAL', 300))
+# Retransmitted-fix suppression: recent fixes remembered per device, and devices remembered
+FIX_DEDUP_WINDOW=int(os.getenv('FIX_DEDUP_WINDOW', 16))
+FIX_DEDUP_MAX_DEVICES=int(os.getenv('FIX_DEDUP_MAX_DEVICES', 100000))
+
+# REST API: requests served at once, not counting open live streams
+API_MAX_CONCURRENCY=int(os.getenv('API_MAX_CONCURRENCY', 1000))
+# Seconds the fleet snapshot's "since" watermark trails the newest inserted_at, to cover
+# transactions still committing (inserted_at is their start time)
+SNAPSHOT_SINCE_LAG=float(os.getenv('SNAPSHOT_SINCE_LAG', 30))
+
+# Live push stream
+LIVE_QUEUE_SIZE=int(os.getenv('LIVE_QUEUE_SIZE', 1000))
+LIVE_INBOX_SIZE=int(os.getenv('LIVE_INBOX_SIZE', 10000))
+LIVE_HEARTBEAT_INTERVAL=float(os.getenv('LIVE_HEARTBEAT_INTERVAL', 15))
+LIVE_MAX_SUBSCRIBERS=int(os.getenv('LIVE_MAX_SUBSCRIBERS', 10000))
+
+# Event fan-out between processes: "local" (in-process only) or "postgres" (LISTEN/NOTIFY)
+EVENT_BUS=os.getenv('EVENT_BUS', 'local')
+EVENT_BUS_CHANNEL=os.getenv('EVENT_BUS_CHANNEL', 'mtrack_events')
+
+# Database connection pool
+DB_POOL_MIN=int(os.getenv('DB_POOL_MIN', 2))
+DB_POOL_MAX=int(os.getenv('DB_POOL_MAX', 20))
+DB_POOL_TIMEOUT=float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_MAX_LIFETIME=float(os.getenv('DB_POOL_MAX_LIFETIME', 3600))
+DB_POOL_HEALTH_CHECK_INTERVAL=float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30))
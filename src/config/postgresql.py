@@ -1,6 +1,21 @@
-import psycopg2
+import time
 import logging
-from src.config.env_loader import POSTGRE_HOST, POSTGRE_PORT, POSTGRE_DATABASE, POSTGRE_USERNAME, POSTGRE_PASSWORD
+import threading
+import contextvars
+from collections import deque
+from functools import wraps
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.pool import PoolError
+from greenlet import getcurrent
+from gevent.event import Event
+from gevent.socket import wait_read, wait_write
+from src.config.env_loader import (
+    POSTGRE_HOST, POSTGRE_PORT, POSTGRE_DATABASE, POSTGRE_USERNAME, POSTGRE_PASSWORD,
+    DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_MAX_LIFETIME, DB_POOL_HEALTH_CHECK_INTERVAL
+)
 
 logger = logging.getLogger(__name__)
 
@@ -18,3 +33,326 @@ def get_db_connection():
     except (Exception, psycopg2.Error) as error:
         logger.error(f"Error while connecting to PostgreSQL: {error}")
         raise
+
+def gevent_wait_callback(connection, timeout=None):
+    """
+    psycopg2 wait callback that waits for the server through the gevent hub
+    of the calling thread, so a query only suspends its own greenlet.
+    """
+    while True:
+        state = connection.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(connection.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(connection.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError(f"Bad result from poll: {state}")
+
+def make_cooperative():
+    """
+    Route all psycopg2 socket waits through gevent, process-wide. Must be
+    called before any connection is opened. Plain threads keep working: each
+    one waits on its own hub, created on first use.
+    """
+    if extensions.get_wait_callback() is not gevent_wait_callback:
+        extensions.set_wait_callback(gevent_wait_callback)
+        logger.info("psycopg2 gevent wait callback installed")
+
+class _GreenletWaiter:
+    __slots__ = ('event', 'granted')
+
+    def __init__(self):
+        self.event = Event()
+        self.granted = False
+
+    def wait(self, timeout):
+        self.event.wait(timeout)
+
+    def wake(self):
+        self.event.set()
+
+class _ThreadWaiter:
+    __slots__ = ('lock', 'granted')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.lock.acquire()
+        self.granted = False
+
+    def wait(self, timeout):
+        self.lock.acquire(timeout=-1 if timeout is None else timeout)
+
+    def wake(self):
+        self.lock.release()
+
+class PoolSlots:
+    """
+    Bounded semaphore shared by greenlets and plain threads.
+
+    A greenlet waiting for a slot only suspends itself, so the rest of its
+    hub keeps serving; a plain thread (the main greenlet of its thread)
+    blocks on a lock. A released slot is handed straight to the oldest
+    waiter, which makes waiting first-come first-served across threads.
+    """
+
+    def __init__(self, value):
+        self.value = value
+        self._free = value
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        with self._lock:
+            if self._free:
+                self._free -= 1
+                return True
+            # Greenlets spawned on a hub have it as parent; a thread's main greenlet has none
+            waiter = _GreenletWaiter() if getcurrent().parent is not None else _ThreadWaiter()
+            self._waiters.append(waiter)
+        try:
+            waiter.wait(timeout)
+        except BaseException:
+            # Killed while waiting: give back a slot handed over in the meantime
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._waiters.remove(waiter)
+            if granted:
+                self.release()
+            raise
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                if self._free >= self.value:
+                    raise ValueError("PoolSlots released too many times")
+                self._free += 1
+                return
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+        waiter.wake()
+
+    def waiting(self):
+        return len(self._waiters)
+
+class ConnectionPool:
+    """
+    Thread- and greenlet-safe pool of PostgreSQL connections shared by every data model.
+
+    - At most ``maxconn`` connections exist at once; callers wait up to
+      ``timeout`` seconds for a free one before PoolError is raised. Waiting
+      greenlets only suspend themselves (see PoolSlots).
+    - Connections idle for more than ``health_check_interval`` seconds are
+      pinged with ``SELECT 1`` on checkout; closed or broken connections are
+      discarded and replaced transparently.
+    - Connections older than ``max_lifetime`` seconds are closed when they are
+      returned, so server-side memory and stale sessions are recycled.
+    """
+
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT,
+                 max_lifetime=DB_POOL_MAX_LIFETIME, health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL,
+                 connect=get_db_connection):
+        if maxconn < 1 or minconn > maxconn:
+            raise ValueError("Pool size must satisfy 0 <= minconn <= maxconn and maxconn >= 1")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self._connect = connect
+        self._lock = threading.Lock()
+        self._slots = PoolSlots(maxconn)
+        self._idle = []        # [(connection, last_used)]
+        self._created = {}     # connection -> creation time
+        self.checkouts = 0
+        self.discarded = 0
+        self.timeouts = 0
+
+    def fill(self):
+        """Open connections until ``minconn`` exist; failures are left to later checkouts."""
+        while len(self._created) < self.minconn and self._slots.acquire(timeout=0):
+            try:
+                connection = self._new_connection()
+            except Exception:
+                break
+            else:
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+            finally:
+                self._slots.release()
+
+    def _new_connection(self):
+        connection = self._connect()
+        with self._lock:
+            self._created[connection] = time.monotonic()
+        return connection
+
+    def _discard(self, connection):
+        with self._lock:
+            self._created.pop(connection, None)
+            self.discarded += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, connection, last_used):
+        if connection.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with connection.cursor() as cur:
+                cur.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Discarding broken pooled connection: {e}")
+            return False
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            self.timeouts += 1
+            raise PoolError(f"No database connection available after {self.timeout}s "
+                            f"(pool size {self.maxconn})")
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    connection = self._new_connection()
+                    break
+                connection, last_used = entry
+                if self._is_healthy(connection, last_used):
+                    break
+                self._discard(connection)
+            self.checkouts += 1
+            return connection
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, connection, discard=False):
+        try:
+            if not discard and not connection.closed:
+                if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+                with self._lock:
+                    age = time.monotonic() - self._created.get(connection, 0)
+                discard = age > self.max_lifetime
+            else:
+                discard = True
+        except Exception as e:
+            logger.warning(f"Discarding pooled connection on return: {e}")
+            discard = True
+
+        if discard:
+            self._discard(connection)
+        else:
+            with self._lock:
+                self._idle.append((connection, time.monotonic()))
+        self._slots.release()
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def stats(self):
+        with self._lock:
+            total = len(self._created)
+            idle = len(self._idle)
+        return {
+            'max_size': self.maxconn,
+            'open': total,
+            'idle': idle,
+            'in_use': total - idle,
+            'waiting': self._slots.waiting(),
+            'checkouts': self.checkouts,
+            'discarded': self.discarded,
+            'timeouts': self.timeouts,
+        }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Connection of the transaction currently open in this thread/greenlet, if any
+_current_connection = contextvars.ContextVar('current_connection', default=None)
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        created = False
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+                created = True
+        if created:
+            # Connecting may switch greenlets, so it must not happen under _pool_lock
+            _pool.fill()
+            logger.info(f"Database pool created (min {_pool.minconn}, max {_pool.maxconn})")
+    return _pool
+
+def pool_stats():
+    """Stats of the connection pool, empty until the first connection is requested."""
+    pool = _pool
+    return pool.stats() if pool is not None else {}
+
+@contextmanager
+def pooled_connection():
+    """
+    Check a connection out of the pool for the duration of the block, without
+    registering it as the current transaction. Any open transaction is rolled
+    back when it is returned; connections that failed at the network level
+    are discarded.
+    """
+    pool = get_pool()
+    connection = pool.getconn()
+    broken = False
+    try:
+        yield connection
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        pool.putconn(connection, discard=broken)
+
+@contextmanager
+def transaction():
+    """
+    Yield a connection with an open transaction, committed on success and
+    rolled back on error. Nested use inside an open transaction reuses the
+    outer connection and leaves commit/rollback to the outermost block.
+    """
+    connection = _current_connection.get()
+    if connection is not None:
+        yield connection
+        return
+
+    with pooled_connection() as connection:
+        token = _current_connection.set(connection)
+        try:
+            with connection:
+                yield connection
+        finally:
+            _current_connection.reset(token)
+
+def with_connection(func):
+    """
+    Call ``func(cursor, *args, **kwargs)`` with a cursor from the current
+    transaction, or from a new pooled one if none is open.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with transaction() as conn:
+            with conn.cursor() as cur:
+                return func(cur, *args, **kwargs)
+    return wrapper
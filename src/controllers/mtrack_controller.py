@@ -1,68 +1,163 @@
+import base64
 import logging
 from src.data_models.mtrack_data_model import (
     get_last_asset_data,
+    get_last_asset_data_for_devices,
     get_device_locations,
     get_all_devices,
-    get_asset_data_by_date_range
+    get_asset_data_page,
+    stream_asset_data_by_date_range
 )
-from datetime import date, time, datetime
+from src.ingest.latest_state import latest_state
+from src.config.env_loader import SNAPSHOT_SINCE_LAG
+from src.restapi.json_provider import Rows
+from datetime import date, time, datetime, timedelta
+from decimal import Decimal
 
 logger = logging.getLogger(__name__)
 
-def serialize_data(data):
-    if isinstance(data, dict):
-        return {k: serialize_data(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [serialize_data(item) for item in data]
-    elif isinstance(data, (date, time, datetime)):
-        return data.isoformat()
-    return data
+# Results are returned as read; the app's JSON provider (RowJSONProvider)
+# encodes dates, times and Decimals while writing the response
 
 def get_device_last_data(device_id):
     try:
-        result = get_last_asset_data(device_id)
-        return serialize_data(result)
+        # Served from the latest-position table; the database is only hit on a cold miss
+        result = latest_state.get(device_id)
+        if result is None:
+            result = get_last_asset_data(device_id)
+            if result:
+                latest_state.update([result])
+        return result
     except Exception as e:
         logger.error(f"Error in get_device_last_data: {e}")
         raise
 
 def get_device_location_history(device_id):
     try:
-        result = get_device_locations(device_id)
-        return serialize_data(result)
+        return get_device_locations(device_id)
     except Exception as e:
         logger.error(f"Error in get_device_location_history: {e}")
         raise
 
 def get_devices():
     try:
-        result = get_all_devices()
-        return serialize_data(result)
+        return get_all_devices()
     except Exception as e:
         logger.error(f"Error in get_devices: {e}")
         raise
 
-def get_device_data_by_date_range(device_id, start_date, end_date):
+SNAPSHOT_FIELDS = (
+    'device_id', 'latitude', 'longitude', 'current_speed', 'voltage',
+    'status', 'gps_date', 'gps_time', 'inserted_at'
+)
+
+def _snapshot_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, time, datetime)):
+        return value.isoformat()
+    return value
+
+def load_fleet_latest_state():
+    """
+    Fill the latest-position table for every device it does not hold yet,
+    using one set-based query. Only runs until the table is complete.
     """
-    Get asset data with location for a specific device within a date range.
+    if latest_state.complete:
+        return
+    device_ids = [device['device_id'] for device in get_all_devices()]
+    missing = [device_id for device_id in device_ids if device_id not in latest_state]
+    if missing:
+        latest_state.update(get_last_asset_data_for_devices(missing))
+    latest_state.complete = True
+    logger.info(f"Loaded latest positions for {len(missing)} of {len(device_ids)} devices")
+
+def get_fleet_snapshot(bbox=None, since=None):
+    """
+    Latest fix of every device in a compact, column-oriented form.
+
+    Args:
+        bbox (tuple): Optional (min_lon, min_lat, max_lon, max_lat) filter
+        since (datetime): Optional; only fixes inserted after this time are returned
+
+    Returns:
+        dict: {'fields': [...], 'devices': [[...], ...], 'count': n, 'since': ts}
+        where 'since' is the watermark to pass back for deltas: the newest
+        inserted_at known minus SNAPSHOT_SINCE_LAG seconds. inserted_at is set
+        when a write transaction starts, so a fix committed after this
+        snapshot can carry an older inserted_at; the lag keeps such fixes in
+        the next delta, at the cost of devices already returned coming back
+        again. Clients must treat deltas as upserts by device_id.
+    """
+    try:
+        load_fleet_latest_state()
+        rows = latest_state.rows()
+        newest = max((row['inserted_at'] for row in rows), default=None)
+        watermark = newest - timedelta(seconds=SNAPSHOT_SINCE_LAG) if newest is not None else None
+
+        if since is not None:
+            rows = [row for row in rows if row['inserted_at'] > since]
+        if bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            rows = [row for row in rows
+                    if min_lat <= row['latitude'] <= max_lat and min_lon <= row['longitude'] <= max_lon]
+
+        return {
+            'fields': list(SNAPSHOT_FIELDS),
+            'devices': [[_snapshot_value(row[field]) for field in SNAPSHOT_FIELDS] for row in rows],
+            'count': len(rows),
+            'since': _snapshot_value(watermark),
+        }
+    except Exception as e:
+        logger.error(f"Error in get_fleet_snapshot: {e}")
+        raise
+
+def encode_page_cursor(row, time_key='inserted_at', id_key='id'):
+    """Opaque keyset cursor for the row a page ended on."""
+    raw = f"{row[time_key].isoformat()}|{row[id_key]}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_page_cursor(cursor):
+    """
+    Decode a cursor from encode_page_cursor into (timestamp, id).
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        inserted_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(inserted_at), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def get_device_data_page(device_id, start_date, end_date, limit, cursor=None):
+    """
+    Get one page of a device's history within a date range, newest first.
 
     Args:
         device_id (str): The ID of the device to query
-        start_date (str or datetime): The start date of the range
-        end_date (str or datetime): The end date of the range
+        start_date (datetime): The start date of the range
+        end_date (datetime): The end date of the range
+        limit (int): Page size
+        cursor (str): Optional cursor returned with the previous page
 
     Returns:
-        list: Serialized list of asset data with location information
+        tuple: (Rows, cursor for the next page or None)
     """
     try:
-        # Convert string dates to datetime if needed
-        if isinstance(start_date, str):
-            start_date = datetime.fromisoformat(start_date)
-        if isinstance(end_date, str):
-            end_date = datetime.fromisoformat(end_date)
-
-        result = get_asset_data_by_date_range(device_id, start_date, end_date)
-        return serialize_data(result)
+        after = decode_page_cursor(cursor) if cursor else None
+        # Fetch one extra row to know whether another page exists
+        rows = Rows(*get_asset_data_page(device_id, start_date, end_date, limit + 1, after))
+        next_cursor = encode_page_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return rows[:limit], next_cursor
+    except ValueError:
+        raise
     except Exception as e:
-        logger.error(f"Error in get_device_data_by_date_range: {e}")
+        logger.error(f"Error in get_device_data_page: {e}")
         raise
+
+def stream_device_data(device_id, start_date, end_date):
+    """
+    Yield a device's history within a date range as chunks of Rows, newest
+    first, without loading the whole range in memory.
+    """
+    for columns, rows in stream_asset_data_by_date_range(device_id, start_date, end_date):
+        yield Rows(columns, rows)
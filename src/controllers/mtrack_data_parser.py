@@ -1,163 +1,253 @@
 import logging
-from src.data_models.mtrack_data_model import upload_data
-from src.data_models.notification_data_model import (
-    create_notification,
-    get_device_notifications
+from itertools import groupby
+from operator import attrgetter
+from datetime import datetime, timezone
+from src.data_models.mtrack_data_model import upload_data_batch, DUPLICATE
+from src.ingest.device_registry import device_registry
+from src.ingest.latest_state import latest_state
+from src.ingest.battery_alerts import (
+    battery_alerts,
+    battery_category,
+    CRITICAL,
+    LOW,
+    MEDIUM,
+    NORMAL
 )
+from src.ingest.geofence import geofences, ENTER
+from src.ingest.speed_rules import speed_rules
+from src.ingest.offline_detector import offline_detector
+from src.ingest.event_bus import event_bus, FIX
+from src.ingest.fix_dedup import fix_dedup
+from src.ingest.mt700_parser import parse_many, VALID_POSITION
+from src.controllers.notification_controller import create_device_notification
 
 logger = logging.getLogger(__name__)
 
-# Battery threshold constants
-BATTERY_CRITICAL = 33.0
-BATTERY_LOW = 35.0
-BATTERY_MEDIUM = 37.0
+# Row placeholder of fixes that could not be stored (DUPLICATE marks fixes already stored)
+FAILED = object()
 
-def check_battery_status(voltage):
+BATTERY_MESSAGES = {
+    CRITICAL: 'CRITICAL: Device battery at critical level ({volts}V)',
+    LOW: 'WARNING: Device battery is low ({volts}V)',
+    MEDIUM: 'NOTICE: Device battery is at medium level ({volts}V)',
+}
+
+def check_battery_status(voltage, category=None):
     """
-    Determine battery status based on voltage thresholds.
+    Determine battery status based on voltage thresholds, or on an already
+    decided category (which may differ from the raw voltage's because of hysteresis).
     Returns tuple of (status_type, message) or (None, None) if no notification needed.
     """
-    if voltage <= BATTERY_CRITICAL:
-        return ('low_battery', f'CRITICAL: Device battery at critical level ({voltage / 10}V)')
-    elif voltage < BATTERY_LOW:
-        return ('low_battery', f'WARNING: Device battery is low ({voltage / 10}V)')
-    elif voltage < BATTERY_MEDIUM:
-        return ('low_battery', f'NOTICE: Device battery is at medium level ({voltage / 10}V)')
-    return None, None
-
-def should_create_battery_notification(device_id, voltage):
+    category = category or battery_category(voltage)
+    if category == NORMAL:
+        return None, None
+    return ('low_battery', BATTERY_MESSAGES[category].format(volts=voltage / 10))
+
+def parse_device_message(msg):
+    """Parse a single frame; returns the Fix of its first record, or None if it has none."""
+    fixes = parse_many([msg]).fixes()
+    return fixes[0] if fixes else None
+
+def handle_battery_notification(device_id, voltage, asset_data_id):
     """
-    Check if a new battery notification should be created based on existing notifications.
+    Handle battery notification creation based on voltage levels.
+    A notification is only created when the device's battery category changes
+    to a non-normal level, so the database is untouched for steady readings.
     """
+    transition = battery_alerts.evaluate(device_id, voltage)
+    if not transition:
+        return None
+    previous, category = transition
+    if category == NORMAL:
+        logger.info(f"Battery for device {device_id} recovered from {previous} level")
+        return None
     try:
-        # Get recent notifications for the device
-        device_notifications = get_device_notifications(device_id)
-
-        # Filter for active battery notifications
-        battery_notifications = [
-            n for n in device_notifications
-            if n['type'] == 'low_battery'
-            and n['status'] in ('pending', 'sent')
-        ]
-
-        if not battery_notifications:
-            return True
-
-        # Get the most recent battery notification
-        latest_notification = max(
-            battery_notifications,
-            key=lambda x: x['created_at']
-        )
-
-        # Extract voltage from the latest notification message
-        # Assuming message format includes voltage in parentheses like "... (35.5V)"
-        current_notif_voltage = float(
-            latest_notification['message']
-            .split('(')[1]
-            .split('V')[0]
+        notification_type, message = check_battery_status(voltage, category)
+        notification = create_device_notification(
+            device_id=device_id,
+            notification_type=notification_type,
+            message=message,
+            asset_data_id=asset_data_id
         )
+        logger.info(f"Created battery notification for device {device_id}: {message}")
+        return notification
+    except Exception as e:
+        # Retry on the next reading
+        battery_alerts.restore(device_id, previous)
+        logger.error(f"Error handling battery notification: {e}")
+        return None
 
-        # Determine voltage threshold categories
-        def get_threshold_category(v):
-            if v <= BATTERY_CRITICAL:
-                return "critical"
-            elif v < BATTERY_LOW:
-                return "low"
-            elif v < BATTERY_MEDIUM:
-                return "medium"
-            return "normal"
-
-        # Only create new notification if voltage category has changed
-        current_category = get_threshold_category(current_notif_voltage)
-        new_category = get_threshold_category(voltage)
-
-        return current_category != new_category
+def stored_rows(rows):
+    """The asset_data rows of ``rows`` that were newly stored, without DUPLICATE and FAILED."""
+    return [row for row in rows if row is not DUPLICATE and row is not FAILED]
 
-    except Exception as e:
-        logger.error(f"Error checking battery notifications: {e}")
-        return True  # Create notification if there's an error checking
+def stored_valid_fixes(fixes, rows):
+    """(fix, row) pairs of the fixes that were stored and carry a valid GPS position."""
+    return [(fix, row) for fix, row in zip(fixes, rows)
+            if row is not DUPLICATE and row is not FAILED and fix.status == VALID_POSITION]
 
-def parse_device_message(msg):
+def handle_geofence_notifications(fixes):
+    """
+    Run stored, valid-position fixes through the geofence engine and create
+    a geofence_breach notification for every enter/exit.
+    """
+    if not fixes:
+        return []
     try:
-        parts = msg.split("#")
-        device_id = parts[1]
-        voltage = parts[6].split("$")[0]
-        gprmc_raw = parts[6].split("$")[1].split(",")
-
-        time_utc = gprmc_raw[1] or "0"
-        status = gprmc_raw[2]
-        status_message = {
-            "A": "valid_position",
-            "L": "last_known_position",
-            "V": "invalid_position"
-        }.get(status, "invalid_position")
-
-        latitude_raw = gprmc_raw[3] or "0"
-        latitude_direction = gprmc_raw[4] or "N"
-        longitude_raw = gprmc_raw[5] or "0"
-        longitude_direction = gprmc_raw[6] or "E"
-        speed_knots = gprmc_raw[7] or "0"
-        date = gprmc_raw[9] or "0"
-
-        def convert_to_decimal(degree_minutes, direction):
-            degrees = float(degree_minutes[:-7]) if degree_minutes else 0
-            minutes = float(degree_minutes[-7:]) / 60 if degree_minutes else 0
-            decimal = degrees + minutes
-            return -decimal if direction in ['S', 'W'] else decimal
-
-        latitude = convert_to_decimal(latitude_raw, latitude_direction)
-        longitude = convert_to_decimal(longitude_raw, longitude_direction)
-
-        return {
-            "deviceId": device_id,
-            "voltage": float(voltage),
-            "status": status_message,
-            "latitude": latitude,
-            "longitude": longitude,
-            "currentSpeed": float(speed_knots),
-            "gpsDate": f"20{date[4:6]}-{date[2:4]}-{date[:2]}",
-            "gpsTime": f"{time_utc[:2]}:{time_utc[2:4]}:{time_utc[4:6]}"
-        }
-
+        events = geofences.evaluate(
+            [fix.device_id for fix, _ in fixes],
+            [fix.latitude for fix, _ in fixes],
+            [fix.longitude for fix, _ in fixes]
+        )
     except Exception as e:
-        logger.error(f"Error parsing message: {e}")
-        return None
+        logger.error(f"Error evaluating geofences: {e}")
+        return []
 
-def handle_battery_notification(device_id, voltage, asset_data_id):
+    notifications = []
+    for position, device_id, geofence_id, name, transition in events:
+        action = 'entered' if transition == ENTER else 'exited'
+        message = f"Device {action} geofence {name} (#{geofence_id})"
+        try:
+            notifications.append(create_device_notification(
+                device_id=device_id,
+                notification_type='geofence_breach',
+                message=message,
+                asset_data_id=fixes[position][1]['id']
+            ))
+            logger.info(f"Created geofence notification for device {device_id}: {message}")
+        except Exception as e:
+            logger.error(f"Error creating geofence notification for device {device_id}: {e}")
+    return notifications
+
+def handle_speed_notifications(fixes):
     """
-    Handle battery notification creation based on voltage levels.
+    Run stored, valid-position fixes through the speed rules and create a
+    speed_alert notification for every rule that fires.
     """
+    if not fixes:
+        return []
     try:
-        notification_type, message = check_battery_status(voltage)
+        alerts = speed_rules.evaluate(
+            [fix.device_id for fix, _ in fixes],
+            [fix.timestamp for fix, _ in fixes],
+            [fix.speed for fix, _ in fixes]
+        )
+    except Exception as e:
+        logger.error(f"Error evaluating speed rules: {e}")
+        return []
 
-        if notification_type and should_create_battery_notification(device_id, voltage):
-            notification = create_notification(
+    notifications = []
+    for position, device_id, rule, peak, seconds in alerts:
+        message = (f"Device speed {rule.name} "
+                   f"({seconds:.0f}s above threshold, peak {peak:g} knots)")
+        try:
+            notifications.append(create_device_notification(
                 device_id=device_id,
-                notification_type=notification_type,
+                notification_type='speed_alert',
                 message=message,
-                asset_data_id=asset_data_id
-            )
-            logger.info(f"Created battery notification for device {device_id}: {message}")
-            return notification
-        return None
+                asset_data_id=fixes[position][1]['id']
+            ))
+            logger.info(f"Created speed notification for device {device_id}: {message}")
+        except Exception as e:
+            logger.error(f"Error creating speed notification for device {device_id}: {e}")
+    return notifications
+
+def handle_offline_notification(device_id, last_seen, timeout):
+    """
+    Create a device_offline notification for a device that has been silent
+    for ``timeout`` seconds, linked to its last stored fix when known.
+    Called from the offline detector thread.
+    """
+    last_fix = latest_state.get(device_id)
+    seen_at = datetime.fromtimestamp(last_seen, timezone.utc).isoformat(timespec='seconds')
+    message = f"Device offline: no data for {timeout:g}s (last seen {seen_at})"
+    notification = create_device_notification(
+        device_id=device_id,
+        notification_type='device_offline',
+        message=message,
+        asset_data_id=last_fix['id'] if last_fix else None
+    )
+    logger.info(f"Created offline notification for device {device_id}: {message}")
+    return notification
+
+def upload_parsed_batch(fixes):
+    """
+    Write a micro-batch of fixes in one transaction, upserting devices only
+    when the batch contains a device the registry has not seen yet. If the
+    batch is rejected (e.g. one malformed row), fall back to writing it frame
+    by frame, with the device upsert, so a single bad frame does not lose the
+    rest; the records of a frame are always stored together or not at all.
+    Stored rows update the latest-position table, and committed fixes the
+    duplicate filter.
+    Returns the stored asset_data rows in order, with DUPLICATE for fixes that
+    were already stored and FAILED for fixes that could not be stored.
+    """
+    device_ids = {fix.device_id for fix in fixes}
+    new_device_ids = device_registry.unknown(device_ids)
+    try:
+        rows = upload_data_batch(fixes, upsert_devices=bool(new_device_ids))
+        device_registry.mark_known(new_device_ids)
+        latest_state.update(stored_rows(rows))
+        fix_dedup.remember(fixes, database_duplicates=rows.count(DUPLICATE))
+        return rows
     except Exception as e:
-        logger.error(f"Error handling battery notification: {e}")
-        return None
+        logger.error(f"Batch upload failed, retrying {len(fixes)} fixes frame by frame: {e}")
 
-def process_message(message):
-    parsed_data = parse_device_message(message)
-    if parsed_data:
+    rows = []
+    for _, group in groupby(fixes, key=attrgetter('frame')):
+        frame_fixes = list(group)
+        device_id = frame_fixes[0].device_id
         try:
-            # Upload data and get the asset_data_id
-            asset_data_id = upload_data(parsed_data)
+            frame_rows = upload_data_batch(frame_fixes)
+            device_registry.mark_known([device_id])
+            latest_state.update(stored_rows(frame_rows))
+            fix_dedup.remember(frame_fixes, database_duplicates=frame_rows.count(DUPLICATE))
+            rows += frame_rows
+        except Exception as e:
+            logger.error(f"Error uploading {len(frame_fixes)} fixes for device {device_id}: {e}")
+            rows += [FAILED] * len(frame_fixes)
+    return rows
 
+def process_messages(messages):
+    """
+    Parse and store a micro-batch of device messages, publish the stored
+    fixes on the event bus, then run battery, geofence and speed
+    notifications for them. Retransmitted fixes are dropped before the write.
+    Returns, per message, the asset_data ids of its newly stored records
+    (empty if it held none worth storing, e.g. only duplicates), or None if
+    they could not be stored.
+    """
+    results = [[] for _ in messages]
+    # Frames and records that fail to parse are logged and counted by the parser
+    fixes = parse_many(messages).fixes()
+    # A device resending fixes we already hold is still alive
+    device_ids = {fix.device_id for fix in fixes}
+    device_registry.touch(device_ids)
+    offline_detector.touch(device_ids)
+    fixes = fix_dedup.fresh(fixes)
+
+    if not fixes:
+        return results
+
+    rows = upload_parsed_batch(fixes)
+    event_bus.publish(FIX, stored_rows(rows))
+    for fix, row in zip(fixes, rows):
+        if row is FAILED:
+            results[fix.frame] = None
+            continue
+        if row is DUPLICATE:
+            continue
+        results[fix.frame].append(row['id'])
+        try:
             # Handle battery notifications
-            voltage = parsed_data['voltage']
-            device_id = parsed_data['deviceId']
-
-            handle_battery_notification(device_id, voltage, asset_data_id)
-
+            handle_battery_notification(fix.device_id, fix.voltage, row['id'])
         except Exception as e:
             logger.error(f"Error processing message: {e}")
-    else:
-        logger.warning("Failed to parse message, invalid format.")
+
+    valid_fixes = stored_valid_fixes(fixes, rows)
+    handle_geofence_notifications(valid_fixes)
+    handle_speed_notifications(valid_fixes)
+    return results
+
+def process_message(message):
+    return process_messages([message])[0]
@@ -1,16 +1,31 @@
 import logging
-from datetime import datetime
 from src.data_models.notification_data_model import (
     create_notification,
     get_notification,
     update_notification,
+    update_notifications,
     delete_notification,
+    delete_notifications,
     get_device_notifications,
     get_pending_notifications
 )
+from src.controllers.mtrack_controller import encode_page_cursor, decode_page_cursor
+from src.ingest.event_bus import event_bus, NOTIFICATION
 
 logger = logging.getLogger(__name__)
 
+# Values of the notification_status and notification_type enums
+NOTIFICATION_STATUSES = ('pending', 'sent', 'failed', 'acknowledged')
+NOTIFICATION_TYPES = ('low_battery', 'geofence_breach', 'speed_alert', 'device_offline', 'position_invalid')
+
+def _check_status(status):
+    if status not in NOTIFICATION_STATUSES:
+        raise ValueError(f"Invalid status '{status}', expected one of {', '.join(NOTIFICATION_STATUSES)}")
+
+def _check_type(notification_type):
+    if notification_type not in NOTIFICATION_TYPES:
+        raise ValueError(f"Invalid type '{notification_type}', expected one of {', '.join(NOTIFICATION_TYPES)}")
+
 def create_device_notification(device_id, notification_type, message, asset_data_id=None):
     """
     Create a new notification for a device.
@@ -32,6 +47,7 @@ def create_device_notification(device_id, notification_type, message, asset_data
             asset_data_id=asset_data_id
         )
         logger.info(f"Controller: Created notification for device {device_id}")
+        event_bus.publish(NOTIFICATION, [notification])
         return notification
     except Exception as e:
         logger.error(f"Controller: Error creating notification: {e}")
@@ -96,6 +112,7 @@ def update_notification_status(notification_id, status, message=None):
     Returns:
         Dictionary containing updated notification details
     """
+    _check_status(status)
     try:
         notification = update_notification(
             notification_id=notification_id,
@@ -132,35 +149,144 @@ def remove_notification(notification_id):
         logger.error(f"Controller: Error deleting notification: {e}")
         raise
 
-def get_notifications_for_device(device_id):
+def _batch_results(notification_ids, done_ids, result):
+    """Per-id outcome, in request order: ``result`` for ids in ``done_ids``, else 'not_found'."""
+    return [{'notification_id': notification_id,
+             'result': result if notification_id in done_ids else 'not_found'}
+            for notification_id in notification_ids]
+
+def _unique_ids(notification_ids):
+    return list(dict.fromkeys(notification_ids))
+
+def acknowledge_notifications(notification_ids, user_id):
+    """
+    Acknowledge many notifications in one statement.
+
+    Args:
+        notification_ids: IDs of the notifications to acknowledge
+        user_id: ID of the user acknowledging them
+
+    Returns:
+        Tuple of (updated notifications, per-id results)
+    """
+    notification_ids = _unique_ids(notification_ids)
+    try:
+        notifications = update_notifications(
+            notification_ids,
+            status='acknowledged',
+            acknowledged_by=user_id
+        )
+        logger.info(f"Controller: {len(notifications)} of {len(notification_ids)} notifications "
+                    f"acknowledged by user {user_id}")
+        done_ids = {notification['notification_id'] for notification in notifications}
+        return notifications, _batch_results(notification_ids, done_ids, 'acknowledged')
+    except Exception as e:
+        logger.error(f"Controller: Error acknowledging notifications: {e}")
+        raise
+
+def update_notifications_status(notification_ids, status, message=None):
     """
-    Get all notifications for a specific device.
+    Set the status (and optionally the message) of many notifications in one statement.
+
+    Args:
+        notification_ids: IDs of the notifications to update
+        status: New status (must be valid notification_status enum)
+        message: Optional new message
+
+    Returns:
+        Tuple of (updated notifications, per-id results)
+    """
+    _check_status(status)
+    notification_ids = _unique_ids(notification_ids)
+    try:
+        notifications = update_notifications(notification_ids, status=status, message=message)
+        logger.info(f"Controller: Updated {len(notifications)} of {len(notification_ids)} "
+                    f"notifications to status {status}")
+        done_ids = {notification['notification_id'] for notification in notifications}
+        return notifications, _batch_results(notification_ids, done_ids, 'updated')
+    except Exception as e:
+        logger.error(f"Controller: Error updating notifications: {e}")
+        raise
+
+def remove_notifications(notification_ids):
+    """
+    Delete many notifications in one statement.
+
+    Args:
+        notification_ids: IDs of the notifications to delete
+
+    Returns:
+        Per-id results
+    """
+    notification_ids = _unique_ids(notification_ids)
+    try:
+        deleted_ids = set(delete_notifications(notification_ids))
+        logger.info(f"Controller: Deleted {len(deleted_ids)} of {len(notification_ids)} notifications")
+        return _batch_results(notification_ids, deleted_ids, 'deleted')
+    except Exception as e:
+        logger.error(f"Controller: Error deleting notifications: {e}")
+        raise
+
+def _page(rows, limit):
+    """Trim a limit + 1 fetch to one page and the cursor of the next one (None on the last page)."""
+    next_cursor = (encode_page_cursor(rows[limit - 1], 'created_at', 'notification_id')
+                   if len(rows) > limit else None)
+    return rows[:limit], next_cursor
+
+def get_notifications_for_device(device_id, limit, cursor=None, notification_type=None,
+                                 status=None, start_date=None, end_date=None):
+    """
+    Get one page of a device's notifications, newest first.
 
     Args:
         device_id: ID of the device
+        limit: Page size
+        cursor: Optional cursor returned with the previous page
+        notification_type, status: Optional filters
+        start_date, end_date: Optional created_at range
 
     Returns:
-        List of dictionaries containing notification details
+        Tuple of (list of notification dictionaries, cursor for the next page or None)
     """
+    if notification_type is not None:
+        _check_type(notification_type)
+    if status is not None:
+        _check_status(status)
+    after = decode_page_cursor(cursor) if cursor else None
     try:
-        notifications = get_device_notifications(device_id)
+        # Fetch one extra row to know whether another page exists
+        notifications, next_cursor = _page(get_device_notifications(
+            device_id, limit + 1, after, notification_type=notification_type, status=status,
+            start_date=start_date, end_date=end_date), limit)
         logger.info(f"Controller: Retrieved {len(notifications)} notifications for device {device_id}")
-        return notifications
+        return notifications, next_cursor
     except Exception as e:
         logger.error(f"Controller: Error retrieving device notifications: {e}")
         raise
 
-def get_all_pending_notifications():
+def get_all_pending_notifications(limit, cursor=None, notification_type=None, device_id=None,
+                                  start_date=None, end_date=None):
     """
-    Get all pending notifications across all devices.
+    Get one page of pending notifications across all devices, oldest first.
+
+    Args:
+        limit: Page size
+        cursor: Optional cursor returned with the previous page
+        notification_type, device_id: Optional filters
+        start_date, end_date: Optional created_at range
 
     Returns:
-        List of dictionaries containing notification details
+        Tuple of (list of notification dictionaries, cursor for the next page or None)
     """
+    if notification_type is not None:
+        _check_type(notification_type)
+    after = decode_page_cursor(cursor) if cursor else None
     try:
-        notifications = get_pending_notifications()
+        notifications, next_cursor = _page(get_pending_notifications(
+            limit + 1, after, notification_type=notification_type, device_id=device_id,
+            start_date=start_date, end_date=end_date), limit)
         logger.info(f"Controller: Retrieved {len(notifications)} pending notifications")
-        return notifications
+        return notifications, next_cursor
     except Exception as e:
         logger.error(f"Controller: Error retrieving pending notifications: {e}")
         raise
@@ -4,10 +4,15 @@ from werkzeug.security import check_password_hash, generate_password_hash
 from src.data_models.user_data_model import get_user_by_username, update_user, delete_user, get_user_by_id
 from datetime import datetime, timedelta
 from src.config.env_loader import SECRET_KEY
+from src.middleware.principal_cache import principal_cache
+from src.ingest.event_bus import event_bus, USER
 
 logger = logging.getLogger(__name__)
 
-
+def _forget_principal(user_id):
+    """Drop the cached tokens of a changed user here and in every other API process."""
+    principal_cache.invalidate(user_id)
+    event_bus.publish(USER, [{'user_id': user_id}])
 
 def generate_token(user_id, username):
     """
@@ -39,6 +44,7 @@ def update_user_profile(user_id, new_username, new_password):
     try:
         password_hash = generate_password_hash(new_password)
         updated_user_id = update_user(user_id, new_username, password_hash)
+        _forget_principal(user_id)
         if updated_user_id:
             logger.info(f"User {user_id} successfully updated their profile.")
             return updated_user_id
@@ -52,6 +58,7 @@ def update_user_profile(user_id, new_username, new_password):
 def delete_user_account(user_id):
     try:
         deleted_user_id = delete_user(user_id)
+        _forget_principal(user_id)
         if deleted_user_id:
             logger.info(f"User {user_id} successfully deleted their account.")
             return deleted_user_id
@@ -69,7 +76,7 @@ def find_user_by_id(user_id):
     try:
         user = get_user_by_id(user_id)
         if user:
-            logger.info(f"User with ID {user_id} found.")
+            logger.debug(f"User with ID {user_id} found.")
             return user
         else:
             logger.warning(f"User with ID {user_id} not found.")
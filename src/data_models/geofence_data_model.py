@@ -0,0 +1,26 @@
+import logging
+from src.config.postgresql import with_connection
+
+logger = logging.getLogger(__name__)
+
+# SQL Statements
+GET_ACTIVE_GEOFENCES = """
+    SELECT geofence_id, name, shape, vertices,
+           center_latitude, center_longitude, radius_meters
+    FROM geofences
+    WHERE active
+    ORDER BY geofence_id
+"""
+
+@with_connection
+def get_active_geofences(cursor):
+    """
+    Retrieve every active geofence. Polygon vertices come back as a list of
+    [longitude, latitude] pairs.
+    """
+    try:
+        cursor.execute(GET_ACTIVE_GEOFENCES)
+        return [dict(zip([column[0] for column in cursor.description], row)) for row in cursor.fetchall()]
+    except Exception as e:
+        logger.error(f"Error retrieving active geofences: {e}")
+        raise
@@ -1,25 +1,79 @@
 import logging
 from psycopg2.extras import execute_values
-from src.config.postgresql import get_db_connection
+from src.config.postgresql import with_connection, pooled_connection
 
 logger = logging.getLogger(__name__)
 
 # SQL Statements
-INSERT_DEVICE = """
-    INSERT INTO devices (device_id)
-    VALUES (%s)
-    ON CONFLICT (device_id) DO NOTHING
+# Device upsert, location insert and asset_data insert in one statement.
+# Location ids are drawn from the sequence up front so every asset_data row
+# can reference its own location without a second round trip. Fixes already
+# stored (same device, GPS date and time) are skipped, and so are their
+# locations. The final SELECT returns the new rows in input order with their
+# input position, otherwise shaped exactly like GET_LAST_ASSET_DATA so they can
+# feed the latest-position cache. The device upsert is left out when every
+# device in the batch is already known to exist.
+_UPLOAD_FIXES = """
+    WITH input AS (
+        SELECT v.ord,
+               v.device_id,
+               v.voltage::numeric AS voltage,
+               v.status::status_message AS status,
+               v.latitude::numeric AS latitude,
+               v.longitude::numeric AS longitude,
+               v.current_speed::numeric AS current_speed,
+               v.gps_date::date AS gps_date,
+               v.gps_time::time AS gps_time,
+               nextval(pg_get_serial_sequence('locations', 'location_id')) AS location_id
+        FROM (VALUES %s) AS v(ord, device_id, voltage, status, latitude, longitude,
+                              current_speed, gps_date, gps_time)
+    ),{device_upsert}
+    new_asset_data AS (
+        INSERT INTO asset_data (device_id, voltage, status, location_id, current_speed, gps_date, gps_time)
+        SELECT device_id, voltage, status, location_id, current_speed, gps_date, gps_time
+        FROM input
+        ON CONFLICT (device_id, gps_date, gps_time) DO NOTHING
+        RETURNING *
+    ),
+    new_locations AS (
+        INSERT INTO locations (location_id, latitude, longitude)
+        SELECT location_id, latitude, longitude
+        FROM input
+        JOIN new_asset_data USING (location_id)
+    )
+    SELECT input.ord,
+           nad.*,
+           input.latitude::numeric(10, 8) AS latitude,
+           input.longitude::numeric(11, 8) AS longitude
+    FROM new_asset_data nad
+    JOIN input USING (location_id)
+    ORDER BY input.ord
 """
 
-INSERT_LOCATION = """
-    INSERT INTO locations (latitude, longitude)
-    VALUES (%s, %s)
-    RETURNING location_id
+_DEVICE_UPSERT = """
+    new_devices AS (
+        INSERT INTO devices (device_id)
+        SELECT DISTINCT device_id FROM input
+        ON CONFLICT (device_id) DO NOTHING
+    ),"""
+
+UPLOAD_FIXES = _UPLOAD_FIXES.replace('{device_upsert}', _DEVICE_UPSERT)
+UPLOAD_FIXES_KNOWN_DEVICES = _UPLOAD_FIXES.replace('{device_upsert}', '')
+
+GET_ALL_DEVICE_IDS = """
+    SELECT device_id FROM devices
+"""
+
+GET_DEVICE_LIVENESS = """
+    SELECT device_id, updated_at AS last_seen, offline_timeout_seconds
+    FROM devices
 """
 
-INSERT_ASSET_DATA = """
-    INSERT INTO asset_data (device_id, voltage, status, location_id, current_speed, gps_date, gps_time)
-    VALUES %s
+UPDATE_DEVICES_LAST_SEEN = """
+    UPDATE devices d
+    SET updated_at = GREATEST(d.updated_at, v.last_seen)
+    FROM (VALUES %s) AS v(device_id, last_seen)
+    WHERE d.device_id = v.device_id
 """
 
 GET_LAST_ASSET_DATA = """
@@ -31,6 +85,21 @@ GET_LAST_ASSET_DATA = """
     LIMIT 1
 """
 
+# Same row shape as GET_LAST_ASSET_DATA, for many devices in one statement
+GET_LAST_ASSET_DATA_FOR_DEVICES = """
+    SELECT latest.*
+    FROM devices d
+    CROSS JOIN LATERAL (
+        SELECT ad.*, l.latitude, l.longitude
+        FROM asset_data ad
+        JOIN locations l ON ad.location_id = l.location_id
+        WHERE ad.device_id = d.device_id
+        ORDER BY ad.inserted_at DESC, ad.id DESC
+        LIMIT 1
+    ) latest
+    WHERE d.device_id = ANY(%s)
+"""
+
 GET_DEVICE_LOCATIONS = """
     SELECT DISTINCT ON (l.latitude, l.longitude) l.latitude, l.longitude, ad.inserted_at
     FROM asset_data ad
@@ -43,8 +112,10 @@ GET_ALL_DEVICES = """
     SELECT * FROM devices
 """
 
-GET_ASSET_DATA_BY_DATE_RANGE = """
+# Keyset pages over (inserted_at, id), newest first
+_ASSET_DATA_HISTORY = """
     SELECT
+        ad.id,
         ad.device_id,
         ad.voltage,
         ad.status,
@@ -56,71 +127,133 @@ GET_ASSET_DATA_BY_DATE_RANGE = """
         l.longitude
     FROM asset_data ad
     JOIN locations l ON ad.location_id = l.location_id
-    WHERE ad.device_id = %s
-    AND ad.inserted_at BETWEEN %s AND %s
-    ORDER BY ad.inserted_at DESC
+    WHERE ad.device_id = %(device_id)s
+    AND ad.inserted_at BETWEEN %(start_date)s AND %(end_date)s{keyset}
+    ORDER BY ad.inserted_at DESC, ad.id DESC{limit}
 """
 
-def with_connection(func):
-    def wrapper(*args, **kwargs):
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                return func(cur, *args, **kwargs)
-    return wrapper
+GET_ASSET_DATA_PAGE = _ASSET_DATA_HISTORY.replace('{keyset}', '').replace('{limit}', """
+    LIMIT %(limit)s""")
+
+GET_ASSET_DATA_PAGE_AFTER = _ASSET_DATA_HISTORY.replace('{keyset}', """
+    AND (ad.inserted_at, ad.id) < (%(after_inserted_at)s, %(after_id)s)""").replace('{limit}', """
+    LIMIT %(limit)s""")
+
+STREAM_ASSET_DATA = _ASSET_DATA_HISTORY.replace('{keyset}', '').replace('{limit}', '')
+
+STREAM_ITERSIZE = 2000
+
+# Row placeholder of upload_fixes for a fix the database already held
+DUPLICATE = object()
+
+def upload_fixes(cursor, fixes, upsert_devices=True):
+    """
+    Write Fix records with the given cursor using a single UPLOAD_FIXES
+    statement, so each fix's device, location and asset_data rows are stored
+    atomically. Pass upsert_devices=False when every device is known to exist.
+    Returns the new asset_data rows (with latitude/longitude) in input order,
+    with DUPLICATE for fixes that were already stored.
+    """
+    values = [(
+        ord,
+        fix.device_id,
+        fix.voltage,
+        fix.status,
+        fix.latitude,
+        fix.longitude,
+        fix.speed,
+        fix.gps_time.date(),
+        fix.gps_time.time()
+    ) for ord, fix in enumerate(fixes)]
+    statement = UPLOAD_FIXES if upsert_devices else UPLOAD_FIXES_KNOWN_DEVICES
+    rows = execute_values(cursor, statement, values, page_size=len(values), fetch=True)
+    columns = [column[0] for column in cursor.description][1:]
+    stored = [DUPLICATE] * len(values)
+    for row in rows:
+        stored[row[0]] = dict(zip(columns, row[1:]))
+    return stored
 
 @with_connection
-def insert_device(cursor, device_id):
+def upload_data(cursor, fix):
+    """
+    Store a single Fix in one round trip.
+
+    Returns:
+        The new asset_data id, or None if the fix was already stored
+    """
     try:
-        cursor.execute(INSERT_DEVICE, (device_id,))
-        logger.info(f"Device {device_id} inserted or already exists")
+        row = upload_fixes(cursor, [fix])[0]
+        if row is DUPLICATE:
+            logger.info(f"Skipped duplicate fix for device: {fix.device_id}")
+            return None
+        logger.info(f"Data uploaded successfully for device: {fix.device_id}")
+        return row['id']
     except Exception as e:
-        logger.error(f"Error inserting device {device_id}: {e}")
+        logger.error(f"Error uploading data: {e}")
         raise
 
 @with_connection
-def insert_location(cursor, latitude, longitude):
+def upload_data_batch(cursor, fixes, upsert_devices=True):
+    """
+    Store a micro-batch of fixes in one round trip and one transaction.
+
+    Args:
+        fixes: List of Fix records (see src.ingest.mt700_parser)
+        upsert_devices: Set to False to skip the devices upsert when every
+            device in the batch is already registered
+
+    Returns:
+        List of the new asset_data rows (with latitude and longitude), in the
+        same order as fixes, with DUPLICATE for fixes that were already stored
+    """
+    if not fixes:
+        return []
     try:
-        cursor.execute(INSERT_LOCATION, (latitude, longitude))
-        location_id = cursor.fetchone()[0]
-        logger.info(f"Location inserted with id {location_id}")
-        return location_id
+        rows = upload_fixes(cursor, fixes, upsert_devices)
+        logger.info(f"Uploaded batch of {len(fixes)} fixes")
+        return rows
     except Exception as e:
-        logger.error(f"Error inserting location: {e}")
+        logger.error(f"Error uploading batch of {len(fixes)} fixes: {e}")
         raise
 
 @with_connection
-def insert_asset_data(cursor, data, location_id):
+def get_all_device_ids(cursor):
     try:
-        values = [(
-            data['deviceId'],
-            data['voltage'],
-            data['status'],
-            location_id,
-            data['currentSpeed'],
-            data['gpsDate'],
-            data['gpsTime']
-        )]
-        execute_values(cursor, INSERT_ASSET_DATA, values)
-        logger.info(f"Asset data inserted for device {data['deviceId']}")
+        cursor.execute(GET_ALL_DEVICE_IDS)
+        return [row[0] for row in cursor.fetchall()]
     except Exception as e:
-        logger.error(f"Error inserting asset data: {e}")
+        logger.error(f"Error retrieving device ids: {e}")
         raise
 
 @with_connection
-def upload_data(cursor, parsed_data):
+def get_device_liveness(cursor):
+    """
+    Retrieve every device's last-seen time and its offline timeout override
+    (None when the default applies).
+    """
     try:
-        # Insert or update device
-        insert_device(parsed_data['deviceId'])
-
-        # Insert location
-        location_id = insert_location(parsed_data['latitude'], parsed_data['longitude'])
+        cursor.execute(GET_DEVICE_LIVENESS)
+        return [dict(zip([column[0] for column in cursor.description], row)) for row in cursor.fetchall()]
+    except Exception as e:
+        logger.error(f"Error retrieving device liveness: {e}")
+        raise
 
-        # Insert asset data
-        insert_asset_data(parsed_data, location_id)
+@with_connection
+def update_devices_last_seen(cursor, last_seen):
+    """
+    Batch-update devices.updated_at as a last-seen time.
 
-        logger.info(f"Data uploaded successfully for device: {parsed_data['deviceId']}")
+    Args:
+        last_seen: Dictionary of device_id -> timezone-aware datetime
+    """
+    if not last_seen:
+        return
+    try:
+        execute_values(cursor, UPDATE_DEVICES_LAST_SEEN, list(last_seen.items()),
+                       template="(%s, %s::timestamptz)", page_size=len(last_seen))
+        logger.info(f"Updated last-seen time for {len(last_seen)} devices")
     except Exception as e:
-        logger.error(f"Error uploading data: {e}")
+        logger.error(f"Error updating last-seen time for {len(last_seen)} devices: {e}")
         raise
 
 @with_connection
@@ -135,6 +268,19 @@ def get_last_asset_data(cursor, device_id):
         logger.error(f"Error retrieving last asset data for device {device_id}: {e}")
         raise
 
+@with_connection
+def get_last_asset_data_for_devices(cursor, device_ids):
+    """
+    Retrieve the latest asset data row of every given device in one query.
+    Devices without any data are left out.
+    """
+    try:
+        cursor.execute(GET_LAST_ASSET_DATA_FOR_DEVICES, (list(device_ids),))
+        return [dict(zip([column[0] for column in cursor.description], row)) for row in cursor.fetchall()]
+    except Exception as e:
+        logger.error(f"Error retrieving last asset data for {len(device_ids)} devices: {e}")
+        raise
+
 @with_connection
 def get_device_locations(cursor, device_id):
     try:
@@ -154,22 +300,55 @@ def get_all_devices(cursor):
         raise
 
 @with_connection
-def get_asset_data_by_date_range(cursor, device_id, start_date, end_date):
+def get_asset_data_page(cursor, device_id, start_date, end_date, limit, after=None):
     """
-    Retrieve asset data with location information for a specific device within a date range.
+    Retrieve one keyset page of asset data with location information, newest first.
 
     Args:
         device_id: The ID of the device to query
-        start_date: The start date of the range (datetime or string in ISO format)
-        end_date: The end date of the range (datetime or string in ISO format)
+        start_date: The start date of the range
+        end_date: The end date of the range
+        limit: Maximum number of rows to return
+        after: Optional (inserted_at, id) of the last row of the previous page
 
     Returns:
-        List of dictionaries containing asset data with location information
+        (column names, list of row tuples) of asset data with location information
     """
+    params = {'device_id': device_id, 'start_date': start_date, 'end_date': end_date, 'limit': limit}
     try:
-        cursor.execute(GET_ASSET_DATA_BY_DATE_RANGE, (device_id, start_date, end_date))
-        results = cursor.fetchall()
-        return [dict(zip([column[0] for column in cursor.description], row)) for row in results]
+        if after:
+            params['after_inserted_at'], params['after_id'] = after
+            cursor.execute(GET_ASSET_DATA_PAGE_AFTER, params)
+        else:
+            cursor.execute(GET_ASSET_DATA_PAGE, params)
+        return [column[0] for column in cursor.description], cursor.fetchall()
+    except Exception as e:
+        logger.error(f"Error retrieving asset data page for device {device_id}: {e}")
+        raise
+
+def stream_asset_data_by_date_range(device_id, start_date, end_date, itersize=STREAM_ITERSIZE):
+    """
+    Yield asset data for a date range through a server-side cursor, as
+    (column names, list of up to ``itersize`` row tuples) chunks, so only one
+    chunk is held in memory at a time. The pooled connection is held until
+    the generator is exhausted or closed.
+    """
+    params = {'device_id': device_id, 'start_date': start_date, 'end_date': end_date}
+    try:
+        with pooled_connection() as conn:
+            with conn.cursor(name='asset_data_stream') as cursor:
+                cursor.execute(STREAM_ASSET_DATA, params)
+                columns = None
+                while True:
+                    rows = cursor.fetchmany(itersize)
+                    if not rows:
+                        break
+                    if columns is None:
+                        columns = [column[0] for column in cursor.description]
+                    yield columns, rows
+    except GeneratorExit:
+        logger.info(f"Asset data stream for device {device_id} closed early")
+        raise
     except Exception as e:
-        logger.error(f"Error retrieving asset data for device {device_id} between {start_date} and {end_date}: {e}")
+        logger.error(f"Error streaming asset data for device {device_id}: {e}")
         raise
@@ -1,7 +1,6 @@
 import logging
 from psycopg2.extras import execute_values
-from src.config.postgresql import get_db_connection
-from datetime import datetime
+from src.config.postgresql import with_connection
 
 logger = logging.getLogger(__name__)
 
@@ -20,47 +19,76 @@ GET_NOTIFICATION = """
     WHERE notification_id = %s
 """
 
-UPDATE_NOTIFICATION = """
+# Updates keep the current value of every field passed as NULL; acknowledging
+# (acknowledged_by given) stamps acknowledged_at
+_UPDATE_NOTIFICATIONS = """
     UPDATE notifications
-    SET status = %s,
-        message = %s,
-        acknowledged_at = %s,
-        acknowledged_by = %s
-    WHERE notification_id = %s
-    RETURNING notification_id
+    SET status = COALESCE(%s, status),
+        message = COALESCE(%s, message),
+        acknowledged_at = CASE WHEN %s::integer IS NULL THEN acknowledged_at ELSE CURRENT_TIMESTAMP END,
+        acknowledged_by = COALESCE(%s, acknowledged_by)
+    WHERE {where}
+    RETURNING notification_id, device_id, type, status, message,
+              created_at, updated_at, asset_data_id,
+              acknowledged_at, acknowledged_by
 """
 
+UPDATE_NOTIFICATION = _UPDATE_NOTIFICATIONS.format(where="notification_id = %s")
+
+UPDATE_NOTIFICATIONS = _UPDATE_NOTIFICATIONS.format(where="notification_id = ANY(%s::integer[])")
+
 DELETE_NOTIFICATION = """
     DELETE FROM notifications
     WHERE notification_id = %s
     RETURNING notification_id
 """
 
-GET_DEVICE_NOTIFICATIONS = """
+DELETE_NOTIFICATIONS = """
+    DELETE FROM notifications
+    WHERE notification_id = ANY(%s::integer[])
+    RETURNING notification_id
+"""
+
+# Keyset-paginated listings. Unset filters are passed as NULL; psycopg2 inlines
+# the parameters, so the planner folds those conditions away and can use the
+# composite/partial indexes on notifications.
+_NOTIFICATION_PAGE = """
     SELECT notification_id, device_id, type, status, message,
            created_at, updated_at, asset_data_id,
            acknowledged_at, acknowledged_by
     FROM notifications
-    WHERE device_id = %s
-    ORDER BY created_at DESC
+    WHERE {scope}
+    AND (%(type)s IS NULL OR type = %(type)s)
+    AND (%(start_date)s IS NULL OR created_at >= %(start_date)s)
+    AND (%(end_date)s IS NULL OR created_at <= %(end_date)s)
+    AND (%(after_created_at)s IS NULL
+         OR (created_at, notification_id) {keyset} (%(after_created_at)s, %(after_id)s))
+    ORDER BY created_at {direction}, notification_id {direction}
+    LIMIT %(limit)s
 """
 
-GET_PENDING_NOTIFICATIONS = """
-    SELECT notification_id, device_id, type, status, message,
+# Newest first
+GET_DEVICE_NOTIFICATIONS = _NOTIFICATION_PAGE.format(
+    scope="device_id = %(device_id)s AND (%(status)s IS NULL OR status = %(status)s)",
+    keyset="<", direction="DESC")
+
+# Oldest first, as a work queue
+GET_PENDING_NOTIFICATIONS = _NOTIFICATION_PAGE.format(
+    scope="status = 'pending' AND (%(device_id)s IS NULL OR device_id = %(device_id)s)",
+    keyset=">", direction="ASC")
+
+# Latest pending/sent notification of a given type for every device
+GET_ACTIVE_NOTIFICATIONS = """
+    SELECT DISTINCT ON (device_id)
+           notification_id, device_id, type, status, message,
            created_at, updated_at, asset_data_id,
            acknowledged_at, acknowledged_by
     FROM notifications
-    WHERE status = 'pending'
-    ORDER BY created_at ASC
+    WHERE type = %s
+    AND status IN ('pending', 'sent')
+    ORDER BY device_id, created_at DESC
 """
 
-def with_connection(func):
-    def wrapper(*args, **kwargs):
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                return func(cur, *args, **kwargs)
-    return wrapper
-
 @with_connection
 def create_notification(cursor, device_id, notification_type, message, asset_data_id=None):
     """
@@ -108,30 +136,46 @@ def get_notification(cursor, notification_id):
 def update_notification(cursor, notification_id, status=None, message=None,
                        acknowledged_by=None):
     """
-    Update a notification's status, message, and acknowledgment details.
+    Update a notification's status, message, and acknowledgment details in a
+    single statement. Fields passed as None keep their current value.
+
+    Returns:
+        Dictionary containing the updated notification, or None if it does not exist
     """
     try:
-        # Get current notification data
-        current = get_notification(notification_id)
-        if not current:
-            raise ValueError(f"Notification {notification_id} not found")
-
-        # Update with new values or keep current ones
-        new_status = status or current['status']
-        new_message = message or current['message']
-        acknowledged_at = datetime.now() if acknowledged_by else current['acknowledged_at']
-
         cursor.execute(UPDATE_NOTIFICATION,
-                      (new_status, new_message, acknowledged_at,
-                       acknowledged_by, notification_id))
+                      (status, message, acknowledged_by, acknowledged_by, notification_id))
+        result = cursor.fetchone()
+        if not result:
+            return None
+        logger.info(f"Updated notification {notification_id}")
+        return dict(zip([column[0] for column in cursor.description], result))
+    except Exception as e:
+        logger.error(f"Error updating notification {notification_id}: {e}")
+        raise
 
-        updated_id = cursor.fetchone()[0]
-        logger.info(f"Updated notification {updated_id}")
+@with_connection
+def update_notifications(cursor, notification_ids, status=None, message=None,
+                        acknowledged_by=None):
+    """
+    Apply the same update to many notifications in one statement.
+    Fields passed as None keep their current value.
 
-        # Fetch and return the updated notification
-        return get_notification(updated_id)
+    Returns:
+        List of dictionaries containing the updated notifications; ids that
+        do not exist are absent
+    """
+    if not notification_ids:
+        return []
+    try:
+        cursor.execute(UPDATE_NOTIFICATIONS,
+                      (status, message, acknowledged_by, acknowledged_by, list(notification_ids)))
+        columns = [column[0] for column in cursor.description]
+        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        logger.info(f"Updated {len(results)} of {len(notification_ids)} notifications")
+        return results
     except Exception as e:
-        logger.error(f"Error updating notification {notification_id}: {e}")
+        logger.error(f"Error updating {len(notification_ids)} notifications: {e}")
         raise
 
 @with_connection
@@ -151,12 +195,49 @@ def delete_notification(cursor, notification_id):
         raise
 
 @with_connection
-def get_device_notifications(cursor, device_id):
+def delete_notifications(cursor, notification_ids):
     """
-    Retrieve all notifications for a specific device.
+    Delete many notifications in one statement.
+
+    Returns:
+        List of the ids that were deleted
+    """
+    if not notification_ids:
+        return []
+    try:
+        cursor.execute(DELETE_NOTIFICATIONS, (list(notification_ids),))
+        deleted_ids = [row[0] for row in cursor.fetchall()]
+        logger.info(f"Deleted {len(deleted_ids)} of {len(notification_ids)} notifications")
+        return deleted_ids
+    except Exception as e:
+        logger.error(f"Error deleting {len(notification_ids)} notifications: {e}")
+        raise
+
+def _notification_page_params(limit, after, notification_type, start_date, end_date, **extra):
+    params = {'limit': limit, 'type': notification_type, 'start_date': start_date,
+              'end_date': end_date, 'after_created_at': None, 'after_id': None}
+    if after:
+        params['after_created_at'], params['after_id'] = after
+    params.update(extra)
+    return params
+
+@with_connection
+def get_device_notifications(cursor, device_id, limit, after=None, notification_type=None,
+                             status=None, start_date=None, end_date=None):
+    """
+    Retrieve one keyset page of a device's notifications, newest first.
+
+    Args:
+        device_id: The ID of the device
+        limit: Maximum number of rows to return
+        after: Optional (created_at, notification_id) of the last row of the previous page
+        notification_type, status: Optional exact-match filters
+        start_date, end_date: Optional inclusive created_at range
     """
+    params = _notification_page_params(limit, after, notification_type, start_date, end_date,
+                                       device_id=device_id, status=status)
     try:
-        cursor.execute(GET_DEVICE_NOTIFICATIONS, (device_id,))
+        cursor.execute(GET_DEVICE_NOTIFICATIONS, params)
         results = cursor.fetchall()
         return [dict(zip([column[0] for column in cursor.description], row))
                 for row in results]
@@ -165,15 +246,41 @@ def get_device_notifications(cursor, device_id):
         raise
 
 @with_connection
-def get_pending_notifications(cursor):
+def get_pending_notifications(cursor, limit, after=None, notification_type=None,
+                              device_id=None, start_date=None, end_date=None):
     """
-    Retrieve all pending notifications across all devices.
+    Retrieve one keyset page of pending notifications across all devices, oldest first.
+
+    Args:
+        limit: Maximum number of rows to return
+        after: Optional (created_at, notification_id) of the last row of the previous page
+        notification_type, device_id: Optional exact-match filters
+        start_date, end_date: Optional inclusive created_at range
     """
+    params = _notification_page_params(limit, after, notification_type, start_date, end_date,
+                                       device_id=device_id)
     try:
-        cursor.execute(GET_PENDING_NOTIFICATIONS)
+        cursor.execute(GET_PENDING_NOTIFICATIONS, params)
         results = cursor.fetchall()
         return [dict(zip([column[0] for column in cursor.description], row))
                 for row in results]
     except Exception as e:
         logger.error(f"Error retrieving pending notifications: {e}")
         raise
+
+@with_connection
+def get_active_notifications(cursor, notification_type):
+    """
+    Retrieve the latest active (pending or sent) notification of the given type for every device.
+    """
+    try:
+        cursor.execute(GET_ACTIVE_NOTIFICATIONS, (notification_type,))
+        results = cursor.fetchall()
+        return [dict(zip([column[0] for column in cursor.description], row))
+                for row in results]
+    except Exception as e:
+        logger.error(f"Error retrieving active {notification_type} notifications: {e}")
+        raise
+
+def get_active_battery_notifications():
+    return get_active_notifications('low_battery')
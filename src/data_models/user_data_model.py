@@ -1,6 +1,6 @@
 import logging
 from psycopg2.extras import execute_values
-from src.config.postgresql import get_db_connection
+from src.config.postgresql import with_connection
 
 logger = logging.getLogger(__name__)
 
@@ -38,13 +38,6 @@ GET_ALL_USERS = """
     SELECT * FROM users
 """
 
-def with_connection(func):
-    def wrapper(*args, **kwargs):
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                return func(cur, *args, **kwargs)
-    return wrapper
-
 @with_connection
 def insert_user(cursor, username, password_hash):
     try:
@@ -0,0 +1,114 @@
+import logging
+import threading
+from src.config.env_loader import BATTERY_HYSTERESIS
+from src.data_models.notification_data_model import get_active_battery_notifications
+from src.ingest.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+# Battery threshold constants (device voltage units, tenths of a volt)
+BATTERY_CRITICAL = 33.0
+BATTERY_LOW = 35.0
+BATTERY_MEDIUM = 37.0
+
+CRITICAL = 'critical'
+LOW = 'low'
+MEDIUM = 'medium'
+NORMAL = 'normal'
+
+# Worst first
+_SEVERITY = {CRITICAL: 0, LOW: 1, MEDIUM: 2, NORMAL: 3}
+
+# Notification message prefixes written by check_battery_status
+_MESSAGE_CATEGORIES = (('CRITICAL', CRITICAL), ('WARNING', LOW), ('NOTICE', MEDIUM))
+
+def battery_category(voltage):
+    if voltage <= BATTERY_CRITICAL:
+        return CRITICAL
+    elif voltage < BATTERY_LOW:
+        return LOW
+    elif voltage < BATTERY_MEDIUM:
+        return MEDIUM
+    return NORMAL
+
+def category_from_message(message):
+    for prefix, category in _MESSAGE_CATEGORIES:
+        if message.startswith(prefix):
+            return category
+    return None
+
+class BatteryAlertEngine:
+    """
+    Per-device battery state machine (critical / low / medium / normal).
+
+    A falling voltage moves a device to a worse category as soon as it crosses
+    a threshold; recovering to a better category requires clearing the
+    threshold by ``hysteresis``, so a battery hovering around a boundary does
+    not flap. State is warmed from each device's latest active low_battery
+    notification, and callers only need the database when ``evaluate``
+    reports a category change.
+    """
+
+    def __init__(self, hysteresis=BATTERY_HYSTERESIS):
+        self.hysteresis = hysteresis
+        self._categories = {}
+        self._lock = threading.Lock()
+        self.evaluations = 0
+        self.transitions = 0
+
+    def warm(self):
+        notifications = get_active_battery_notifications()
+        with self._lock:
+            for notification in notifications:
+                category = category_from_message(notification['message'])
+                if category:
+                    self._categories[notification['device_id']] = category
+        logger.info(f"Battery alert state warmed for {len(notifications)} devices")
+
+    def start(self):
+        try:
+            self.warm()
+        except Exception as e:
+            logger.error(f"Error warming battery alert state, all devices start as normal: {e}")
+
+    def category(self, device_id):
+        return self._categories.get(device_id, NORMAL)
+
+    def evaluate(self, device_id, voltage):
+        """
+        Feed one voltage reading. Returns (previous, new) categories when the
+        device changes category, otherwise None.
+        """
+        self.evaluations += 1
+        with self._lock:
+            current = self._categories.get(device_id, NORMAL)
+            new = battery_category(voltage)
+            if _SEVERITY[new] > _SEVERITY[current]:
+                # Recovering: only as far as the hysteresis margin allows
+                new = battery_category(voltage - self.hysteresis)
+                if _SEVERITY[new] <= _SEVERITY[current]:
+                    return None
+            elif new == current:
+                return None
+            self._categories[device_id] = new
+            self.transitions += 1
+            return current, new
+
+    def restore(self, device_id, category):
+        """Roll a device back to ``category``, e.g. when its notification could not be stored."""
+        with self._lock:
+            self._categories[device_id] = category
+
+    def stats(self):
+        with self._lock:
+            counts = {category: 0 for category in _SEVERITY}
+            for category in self._categories.values():
+                counts[category] += 1
+        return {
+            'devices': counts,
+            'evaluations': self.evaluations,
+            'transitions': self.transitions,
+        }
+
+battery_alerts = BatteryAlertEngine()
+register_metrics('battery_alerts', battery_alerts.stats)
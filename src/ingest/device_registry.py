@@ -0,0 +1,99 @@
+import logging
+import threading
+from datetime import datetime, timezone
+from src.config.env_loader import DEVICE_LAST_SEEN_FLUSH_INTERVAL
+from src.data_models.mtrack_data_model import get_all_device_ids, update_devices_last_seen
+from src.ingest.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+class DeviceRegistry:
+    """
+    Process-local set of device_ids known to exist in ``devices``.
+
+    The ingest path asks for the ``unknown`` devices of a batch and only runs
+    the devices upsert when there are any. Last-seen times are collected in
+    memory and written to ``devices.updated_at`` in one statement every
+    ``flush_interval`` seconds instead of once per message.
+    """
+
+    def __init__(self, flush_interval=DEVICE_LAST_SEEN_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._known = set()
+        self._last_seen = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.upserts_skipped = 0
+        self.upserts_needed = 0
+
+    def warm(self):
+        device_ids = get_all_device_ids()
+        with self._lock:
+            self._known.update(device_ids)
+        logger.info(f"Device registry warmed with {len(device_ids)} devices")
+
+    def start(self):
+        try:
+            self.warm()
+        except Exception as e:
+            logger.error(f"Error warming device registry, devices will be upserted until seen: {e}")
+        self._thread = threading.Thread(target=self._run, name="device-last-seen", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.flush()
+
+    def unknown(self, device_ids):
+        """Return the subset of ``device_ids`` that may not exist in the database yet."""
+        with self._lock:
+            unknown = set(device_ids) - self._known
+        if unknown:
+            self.upserts_needed += 1
+        else:
+            self.upserts_skipped += 1
+        return unknown
+
+    def mark_known(self, device_ids):
+        """Record devices whose rows are committed."""
+        with self._lock:
+            self._known.update(device_ids)
+
+    def touch(self, device_ids, seen_at=None):
+        seen_at = seen_at or datetime.now(timezone.utc)
+        with self._lock:
+            for device_id in device_ids:
+                self._last_seen[device_id] = seen_at
+
+    def flush(self):
+        with self._lock:
+            pending, self._last_seen = self._last_seen, {}
+        if not pending:
+            return
+        try:
+            update_devices_last_seen(pending)
+        except Exception as e:
+            logger.error(f"Error flushing last-seen times for {len(pending)} devices: {e}")
+            # Keep the newest timestamps for the next attempt
+            with self._lock:
+                for device_id, seen_at in pending.items():
+                    self._last_seen.setdefault(device_id, seen_at)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'known_devices': len(self._known),
+                'pending_last_seen': len(self._last_seen),
+                'upserts_skipped': self.upserts_skipped,
+                'upserts_needed': self.upserts_needed,
+            }
+
+device_registry = DeviceRegistry()
+register_metrics('device_registry', device_registry.stats)
@@ -0,0 +1,240 @@
+import json
+import uuid
+import time
+import select
+import logging
+import threading
+from datetime import date, datetime
+from datetime import time as dt_time
+from decimal import Decimal
+from src.config.env_loader import EVENT_BUS, EVENT_BUS_CHANNEL
+from src.config.postgresql import get_db_connection, with_connection
+from src.ingest.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+FIX = 'fix'
+NOTIFICATION = 'notification'
+USER = 'user'
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7500
+
+# Columns restored to their database types when events arrive from another process
+_DECODERS = {
+    'voltage': Decimal,
+    'current_speed': Decimal,
+    'latitude': Decimal,
+    'longitude': Decimal,
+    'gps_date': date.fromisoformat,
+    'gps_time': dt_time.fromisoformat,
+    'inserted_at': datetime.fromisoformat,
+    'created_at': datetime.fromisoformat,
+    'updated_at': datetime.fromisoformat,
+    'acknowledged_at': datetime.fromisoformat,
+}
+
+NOTIFY_EVENTS = """
+    SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload
+"""
+
+def _encode_value(value):
+    if isinstance(value, (date, dt_time, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        # As text, so the receiving side gets back the exact numeric scale
+        return str(value)
+    return value
+
+def encode_payloads(origin, kind, events, max_bytes=MAX_PAYLOAD_BYTES):
+    """
+    Pack events into compact NOTIFY payloads of at most ``max_bytes``:
+    {"o": origin, "k": kind, "f": [field names], "r": [[values], ...]}.
+    Events of one call must share their field names. An event too large for
+    a payload on its own is left out, since Postgres would reject it.
+    Returns (payloads, number of events left out).
+    """
+    if not events:
+        return [], 0
+    fields = list(events[0])
+    header = json.dumps({'o': origin, 'k': kind, 'f': fields}, separators=(",", ":"))[:-1] + ',"r":['
+    payloads, chunk, size = [], [], len(header) + 2
+    oversized = 0
+    for event in events:
+        row = json.dumps([_encode_value(event[field]) for field in fields], separators=(",", ":"))
+        if len(header) + 2 + len(row) > max_bytes:
+            oversized += 1
+            continue
+        if chunk and size + len(row) + 1 > max_bytes:
+            payloads.append(header + ",".join(chunk) + "]}")
+            chunk, size = [], len(header) + 2
+        chunk.append(row)
+        size += len(row) + 1
+    if chunk:
+        payloads.append(header + ",".join(chunk) + "]}")
+    return payloads, oversized
+
+def decode_payload(payload):
+    """Inverse of encode_payloads for one payload: (origin, kind, events)."""
+    message = json.loads(payload)
+    fields = message['f']
+    decoders = [_DECODERS.get(field) for field in fields]
+    events = []
+    for row in message['r']:
+        events.append({field: (decoder(value) if decoder and value is not None else value)
+                       for field, decoder, value in zip(fields, decoders, row)})
+    return message['o'], message['k'], events
+
+class LocalEventBus:
+    """
+    In-process event bus: ``publish`` calls the handlers subscribed to the
+    event kind directly. Used for single-process deployments and as the
+    base of PostgresEventBus.
+    """
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex[:12]
+        self._handlers = {}
+        self.published = 0
+        self.received = 0
+        self.handler_errors = 0
+
+    def subscribe(self, kind, handler, remote_only=False):
+        """
+        Call ``handler(events)`` for every published batch of ``kind``.
+        ``remote_only`` handlers skip batches published by this process.
+        """
+        self._handlers.setdefault(kind, []).append((handler, remote_only))
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def publish(self, kind, events):
+        if not events:
+            return
+        self.published += len(events)
+        self._dispatch(kind, events, remote=False)
+
+    def _dispatch(self, kind, events, remote):
+        for handler, remote_only in self._handlers.get(kind, ()):
+            if remote_only and not remote:
+                continue
+            try:
+                handler(events)
+            except Exception as e:
+                self.handler_errors += 1
+                logger.error(f"Error in {kind} event handler {getattr(handler, '__name__', handler)}: {e}")
+
+    def stats(self):
+        return {
+            'bus': type(self).__name__,
+            'origin': self.origin,
+            'published': self.published,
+            'received': self.received,
+            'handler_errors': self.handler_errors,
+        }
+
+class PostgresEventBus(LocalEventBus):
+    """
+    Event bus shared by every process connected to the database.
+
+    ``publish`` dispatches to this process's handlers right away and sends
+    the batch to the others with NOTIFY on ``channel``. One listener thread
+    per process holds a dedicated LISTEN connection and dispatches batches
+    from other processes. Batches that carry this process's origin id are
+    skipped, because they were already dispatched locally.
+    """
+
+    def __init__(self, channel=EVENT_BUS_CHANNEL, reconnect_delay=5):
+        super().__init__()
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._stop = threading.Event()
+        self._thread = None
+        self.notify_errors = 0
+        self.oversized_events = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._listen_forever, name="event-bus-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def publish(self, kind, events):
+        if not events:
+            return
+        super().publish(kind, events)
+        payloads, oversized = encode_payloads(self.origin, kind, events)
+        if oversized:
+            self.oversized_events += oversized
+            logger.warning(f"Not sending {oversized} {kind} events over {MAX_PAYLOAD_BYTES} bytes to other processes")
+        if not payloads:
+            return
+        try:
+            _notify(self.channel, payloads)
+        except Exception as e:
+            # Other processes miss this batch; their caches catch up from later events
+            self.notify_errors += 1
+            logger.error(f"Error publishing {len(events)} {kind} events to other processes: {e}")
+
+    def _listen_forever(self):
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = get_db_connection()
+                connection.autocommit = True
+                with connection.cursor() as cur:
+                    cur.execute(f'LISTEN "{self.channel}"')
+                logger.info(f"Listening for events on channel {self.channel}")
+                while not self._stop.is_set():
+                    if select.select([connection], [], [], 5) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        self._receive(connection.notifies.pop(0).payload)
+            except Exception as e:
+                logger.error(f"Event bus listener error, reconnecting in {self.reconnect_delay}s: {e}")
+                time.sleep(self.reconnect_delay)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+    def _receive(self, payload):
+        try:
+            origin, kind, events = decode_payload(payload)
+        except Exception as e:
+            logger.error(f"Discarding malformed event payload: {e}")
+            return
+        if origin == self.origin:
+            return
+        self.received += len(events)
+        self._dispatch(kind, events, remote=True)
+
+    def stats(self):
+        stats = super().stats()
+        stats['channel'] = self.channel
+        stats['notify_errors'] = self.notify_errors
+        stats['oversized_events'] = self.oversized_events
+        return stats
+
+@with_connection
+def _notify(cursor, channel, payloads):
+    cursor.execute(NOTIFY_EVENTS, (channel, payloads))
+
+def create_event_bus(kind=EVENT_BUS):
+    if kind == 'postgres':
+        return PostgresEventBus()
+    if kind != 'local':
+        logger.error(f"Unknown EVENT_BUS '{kind}', using the in-process bus")
+    return LocalEventBus()
+
+event_bus = create_event_bus()
+register_metrics('event_bus', event_bus.stats)
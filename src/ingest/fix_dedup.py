@@ -0,0 +1,91 @@
+import logging
+import threading
+from collections import OrderedDict
+from src.config.env_loader import FIX_DEDUP_WINDOW, FIX_DEDUP_MAX_DEVICES
+from src.ingest.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+def fix_key(fix):
+    """Identity of a fix within its device: its GPS date and time, as in the asset_data unique index."""
+    return fix.gps_time
+
+class FixDeduplicator:
+    """
+    Drops fixes a device retransmits because it missed our ACK.
+
+    For each device the keys of its last ``window`` stored fixes are kept in
+    an LRU, and up to ``max_devices`` devices are tracked (least recently
+    active evicted first). A fix's key is its gps_time, the identity the
+    (device_id, gps_date, gps_time) unique index on asset_data uses, so the
+    filter never drops a fix the database would store. Fixes are only
+    remembered once they are committed, so a frame whose write failed is
+    stored when the device sends it again. The unique index on asset_data catches what falls out of
+    the window, e.g. after a restart.
+    """
+
+    def __init__(self, window=FIX_DEDUP_WINDOW, max_devices=FIX_DEDUP_MAX_DEVICES):
+        self.window = window
+        self.max_devices = max_devices
+        self._devices = OrderedDict()   # device_id -> OrderedDict of fix keys
+        self._lock = threading.Lock()
+        self.received = 0
+        self.memory_duplicates = 0
+        self.database_duplicates = 0
+
+    def fresh(self, fixes):
+        """
+        Return the fixes not seen before, in order. Repeats within ``fixes``
+        count as duplicates too.
+        """
+        fresh, batch_keys = [], set()
+        with self._lock:
+            for fix in fixes:
+                key = fix_key(fix)
+                seen = self._devices.get(fix.device_id)
+                if (fix.device_id, key) in batch_keys or (seen is not None and key in seen):
+                    continue
+                batch_keys.add((fix.device_id, key))
+                fresh.append(fix)
+            self.received += len(fixes)
+            self.memory_duplicates += len(fixes) - len(fresh)
+        return fresh
+
+    def remember(self, fixes, database_duplicates=0):
+        """
+        Record committed fixes, including ``database_duplicates`` of them that
+        the database already held.
+        """
+        if self.window <= 0 or self.max_devices <= 0:
+            return
+        with self._lock:
+            self.database_duplicates += database_duplicates
+            for fix in fixes:
+                seen = self._devices.get(fix.device_id)
+                if seen is None:
+                    seen = self._devices[fix.device_id] = OrderedDict()
+                    while len(self._devices) > self.max_devices:
+                        self._devices.popitem(last=False)
+                else:
+                    self._devices.move_to_end(fix.device_id)
+                key = fix_key(fix)
+                seen[key] = None
+                seen.move_to_end(key)
+                while len(seen) > self.window:
+                    seen.popitem(last=False)
+
+    def stats(self):
+        duplicates = self.memory_duplicates + self.database_duplicates
+        with self._lock:
+            devices = len(self._devices)
+        return {
+            'devices': devices,
+            'received': self.received,
+            'duplicates': duplicates,
+            'memory_duplicates': self.memory_duplicates,
+            'database_duplicates': self.database_duplicates,
+            'dedup_rate': duplicates / self.received if self.received else 0.0,
+        }
+
+fix_dedup = FixDeduplicator()
+register_metrics('fix_dedup', fix_dedup.stats)
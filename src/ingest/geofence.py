@@ -0,0 +1,254 @@
+import math
+import logging
+import threading
+import numpy as np
+from src.config.env_loader import GEOFENCE_CELL_SIZE, GEOFENCE_RELOAD_INTERVAL
+from src.data_models.geofence_data_model import get_active_geofences
+from src.ingest.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_METERS = 6371008.8
+METERS_PER_DEGREE_LAT = 111320.0
+
+# Fences spanning more grid cells than this are tested against every point
+MAX_CELLS_PER_FENCE = 4096
+# Row stride of the flattened (lat cell, lon cell) grid key
+_KEY_STRIDE = 1 << 32
+
+ENTER = 'enter'
+EXIT = 'exit'
+
+def _empty():
+    return np.empty(0, dtype=np.int64)
+
+class GeofenceIndex:
+    """
+    Immutable spatial index over a set of geofences.
+
+    Fences are registered in a uniform lat/lon grid by bounding box, so each
+    point is only tested against the fences of its own cell. Polygon edges are
+    stored as flat NumPy arrays and point-in-polygon (ray casting) and circle
+    (haversine) tests run vectorised over every candidate (point, fence) pair
+    of a batch at once.
+    """
+
+    def __init__(self, geofences, cell_size=GEOFENCE_CELL_SIZE):
+        self.cell_size = cell_size
+        self.size = len(geofences)
+        self.ids = np.array([g['geofence_id'] for g in geofences], dtype=np.int64)
+        self.id_set = frozenset(self.ids.tolist())
+        self.names = [g['name'] for g in geofences]
+
+        self.is_circle = np.array([g['shape'] == 'circle' for g in geofences], dtype=bool)
+        self.center_lat = np.zeros(self.size)
+        self.center_lon = np.zeros(self.size)
+        self.radius = np.zeros(self.size)
+        self.min_lat = np.zeros(self.size)
+        self.max_lat = np.zeros(self.size)
+        self.min_lon = np.zeros(self.size)
+        self.max_lon = np.zeros(self.size)
+        self.edge_start = np.zeros(self.size, dtype=np.int64)
+        self.edge_count = np.zeros(self.size, dtype=np.int64)
+
+        x0, y0, x1, y1 = [], [], [], []
+        for i, fence in enumerate(geofences):
+            if fence['shape'] == 'circle':
+                lat, lon = float(fence['center_latitude']), float(fence['center_longitude'])
+                radius = float(fence['radius_meters'])
+                dlat = radius / METERS_PER_DEGREE_LAT
+                dlon = radius / (METERS_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6))
+                self.center_lat[i], self.center_lon[i], self.radius[i] = lat, lon, radius
+                self.min_lat[i], self.max_lat[i] = lat - dlat, lat + dlat
+                self.min_lon[i], self.max_lon[i] = lon - dlon, lon + dlon
+            else:
+                ring = np.asarray(fence['vertices'], dtype=float)
+                lons, lats = ring[:, 0], ring[:, 1]
+                self.min_lat[i], self.max_lat[i] = lats.min(), lats.max()
+                self.min_lon[i], self.max_lon[i] = lons.min(), lons.max()
+                self.edge_start[i] = len(x0)
+                self.edge_count[i] = len(ring)
+                # Close the ring: edge k runs from vertex k to vertex k+1
+                x0.extend(lons)
+                y0.extend(lats)
+                x1.extend(np.roll(lons, -1))
+                y1.extend(np.roll(lats, -1))
+
+        self.x0, self.y0 = np.array(x0), np.array(y0)
+        self.x1, self.y1 = np.array(x1), np.array(y1)
+        self._build_grid()
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+
+    def _build_grid(self):
+        cells = {}
+        oversized = []
+        for i in range(self.size):
+            lat0, lon0 = self._cell(self.min_lat[i], self.min_lon[i])
+            lat1, lon1 = self._cell(self.max_lat[i], self.max_lon[i])
+            if (lat1 - lat0 + 1) * (lon1 - lon0 + 1) > MAX_CELLS_PER_FENCE:
+                oversized.append(i)
+                continue
+            for cell_lat in range(lat0, lat1 + 1):
+                for cell_lon in range(lon0, lon1 + 1):
+                    cells.setdefault(cell_lat * _KEY_STRIDE + cell_lon, []).append(i)
+        self.grid = {key: np.array(fences, dtype=np.int64) for key, fences in cells.items()}
+        self.oversized = np.array(oversized, dtype=np.int64)
+
+    def candidates(self, lat, lon):
+        """Candidate (point index, fence index) pairs from the grid."""
+        keys = (np.floor(lat / self.cell_size).astype(np.int64) * _KEY_STRIDE
+                + np.floor(lon / self.cell_size).astype(np.int64))
+        points, fences = [], []
+        grid = self.grid
+        for point, key in enumerate(keys.tolist()):
+            cell = grid.get(key)
+            if cell is not None:
+                points.append(np.full(len(cell), point, dtype=np.int64))
+                fences.append(cell)
+        if len(self.oversized):
+            points.append(np.repeat(np.arange(len(lat), dtype=np.int64), len(self.oversized)))
+            fences.append(np.tile(self.oversized, len(lat)))
+        if not points:
+            return _empty(), _empty()
+        return np.concatenate(points), np.concatenate(fences)
+
+    def contains(self, lat, lon):
+        """
+        Test a batch of points against every fence.
+
+        Args:
+            lat, lon: float arrays of equal length
+
+        Returns:
+            (point index, fence index) arrays of every point-inside-fence pair
+        """
+        if self.size == 0 or len(lat) == 0:
+            return _empty(), _empty()
+        points, fences = self.candidates(lat, lon)
+        if not len(points):
+            return points, fences
+
+        plat, plon = lat[points], lon[points]
+        in_box = ((plat >= self.min_lat[fences]) & (plat <= self.max_lat[fences])
+                  & (plon >= self.min_lon[fences]) & (plon <= self.max_lon[fences]))
+        points, fences, plat, plon = points[in_box], fences[in_box], plat[in_box], plon[in_box]
+        inside = np.zeros(len(points), dtype=bool)
+
+        circle = self.is_circle[fences]
+        if circle.any():
+            inside[circle] = self._haversine(plat[circle], plon[circle], fences[circle]) <= self.radius[fences[circle]]
+
+        polygon = np.nonzero(~circle)[0]
+        if len(polygon):
+            counts = self.edge_count[fences[polygon]]
+            pair = np.repeat(np.arange(len(polygon)), counts)
+            first_edge = np.repeat(self.edge_start[fences[polygon]], counts)
+            edge = first_edge + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            px, py = plon[polygon][pair], plat[polygon][pair]
+            x0, y0, x1, y1 = self.x0[edge], self.y0[edge], self.x1[edge], self.y1[edge]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                crosses = ((y0 > py) != (y1 > py)) & (px < (x1 - x0) * (py - y0) / (y1 - y0) + x0)
+            crossings = np.bincount(pair, weights=crosses, minlength=len(polygon))
+            inside[polygon] = (crossings % 2) == 1
+
+        return points[inside], fences[inside]
+
+    def _haversine(self, lat, lon, fences):
+        lat1, lon1 = np.radians(lat), np.radians(lon)
+        lat2, lon2 = np.radians(self.center_lat[fences]), np.radians(self.center_lon[fences])
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(a))
+
+class GeofenceEngine:
+    """
+    Tracks which geofences each device is inside and reports enter/exit
+    transitions for micro-batches of fixes.
+
+    A device's first fix after start-up only records its state; transitions
+    are reported from the second fix on. Fences are reloaded from the
+    database every ``reload_interval`` seconds.
+    """
+
+    def __init__(self, cell_size=GEOFENCE_CELL_SIZE, reload_interval=GEOFENCE_RELOAD_INTERVAL):
+        self.cell_size = cell_size
+        self.reload_interval = reload_interval
+        self._index = GeofenceIndex([], cell_size)
+        self._inside = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.evaluated = 0
+        self.transitions = 0
+
+    def load(self, geofences=None):
+        if geofences is None:
+            geofences = get_active_geofences()
+        self._index = GeofenceIndex(geofences, self.cell_size)
+        logger.info(f"Loaded {len(geofences)} geofences")
+
+    def start(self):
+        try:
+            self.load()
+        except Exception as e:
+            logger.error(f"Error loading geofences: {e}")
+        self._thread = threading.Thread(target=self._run, name="geofence-reload", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.reload_interval):
+            try:
+                self.load()
+            except Exception as e:
+                logger.error(f"Error reloading geofences: {e}")
+
+    def evaluate(self, device_ids, latitudes, longitudes):
+        """
+        Evaluate a batch of fixes, in arrival order.
+
+        Returns:
+            List of (fix index, device_id, geofence_id, geofence name, ENTER|EXIT)
+        """
+        index = self._index
+        if index.size == 0 or not device_ids:
+            return []
+        points, fences = index.contains(np.asarray(latitudes, dtype=float),
+                                        np.asarray(longitudes, dtype=float))
+        inside = [[] for _ in device_ids]
+        for point, fence in zip(points.tolist(), fences.tolist()):
+            inside[point].append(fence)
+
+        events = []
+        with self._lock:
+            for position, device_id in enumerate(device_ids):
+                current = {int(index.ids[fence]): index.names[fence] for fence in inside[position]}
+                previous = self._inside.get(device_id)
+                self._inside[device_id] = current
+                if previous is None:
+                    continue
+                for geofence_id in current.keys() - previous.keys():
+                    events.append((position, device_id, geofence_id, current[geofence_id], ENTER))
+                for geofence_id in previous.keys() - current.keys():
+                    # Fences removed by a reload are not reported as exits
+                    if geofence_id in index.id_set:
+                        events.append((position, device_id, geofence_id, previous[geofence_id], EXIT))
+            self.evaluated += len(device_ids)
+            self.transitions += len(events)
+        return events
+
+    def stats(self):
+        return {
+            'geofences': self._index.size,
+            'devices_tracked': len(self._inside),
+            'evaluated': self.evaluated,
+            'transitions': self.transitions,
+        }
+
+geofences = GeofenceEngine()
+register_metrics('geofences', geofences.stats)
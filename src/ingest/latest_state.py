@@ -0,0 +1,66 @@
+import logging
+import threading
+from src.ingest.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+def _row_key(row):
+    return (row['inserted_at'], row['id'])
+
+class LatestStateTable:
+    """
+    In-process table of each device's most recent asset_data row, shaped like
+    GET_LAST_ASSET_DATA (asset_data columns plus latitude and longitude).
+
+    The ingest pipeline updates it after every committed batch, and readers
+    fall back to the database only for devices that have not been seen since
+    start-up. Rows are shared between readers and must not be mutated.
+    """
+
+    def __init__(self):
+        self._rows = {}
+        self._lock = threading.Lock()
+        # Set once every device's latest row has been loaded from the database;
+        # from then on ingest keeps the table complete on its own
+        self.complete = False
+        self.hits = 0
+        self.misses = 0
+
+    def update(self, rows):
+        """Record rows, keeping only the newest one per device (by inserted_at, id)."""
+        with self._lock:
+            for row in rows:
+                current = self._rows.get(row['device_id'])
+                if current is None or _row_key(row) >= _row_key(current):
+                    self._rows[row['device_id']] = row
+
+    def get(self, device_id):
+        row = self._rows.get(device_id)
+        if row is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return row
+
+    def __contains__(self, device_id):
+        """Whether the table holds a row for ``device_id``; not counted as a hit or miss."""
+        return device_id in self._rows
+
+    def rows(self):
+        """Snapshot of every cached row."""
+        with self._lock:
+            return list(self._rows.values())
+
+    def __len__(self):
+        return len(self._rows)
+
+    def stats(self):
+        return {
+            'devices': len(self._rows),
+            'complete': self.complete,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+latest_state = LatestStateTable()
+register_metrics('latest_state', latest_state.stats)
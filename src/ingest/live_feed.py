@@ -0,0 +1,240 @@
+import json
+import logging
+from collections import deque
+from datetime import date, time, datetime
+from decimal import Decimal
+import numpy as np
+import gevent
+from gevent.event import Event
+from src.config.env_loader import LIVE_QUEUE_SIZE, LIVE_INBOX_SIZE, LIVE_MAX_SUBSCRIBERS
+from src.ingest.event_bus import FIX, NOTIFICATION
+from src.ingest.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+def _json_default(obj):
+    if isinstance(obj, (date, time, datetime)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def encode_event(event):
+    return json.dumps(event, separators=(",", ":"), default=_json_default)
+
+class TooManySubscribers(Exception):
+    pass
+
+class Subscription:
+    """
+    One live-stream client: its filter and its pending events.
+
+    Fixes are coalesced per device, so a slow reader only ever sees the
+    latest position of each device. Notifications are queued, up to
+    ``queue_size``; a subscriber that lets them pile up past that is
+    dropped and has to reconnect.
+    """
+
+    def __init__(self, device_ids=None, bbox=None, kinds=(FIX, NOTIFICATION), queue_size=LIVE_QUEUE_SIZE):
+        self.device_ids = frozenset(device_ids) if device_ids else None
+        self.bbox = bbox
+        self.kinds = frozenset(kinds)
+        self.queue_size = queue_size
+        self.fixes = {}
+        self.notifications = deque()
+        self.ready = Event()
+        self.closed = None
+        self.delivered = 0
+        self.coalesced = 0
+
+    def in_bbox(self, latitude, longitude):
+        min_lon, min_lat, max_lon, max_lat = self.bbox
+        return min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon
+
+    def push_fixes(self, fixes):
+        """Merge {device_id: encoded fix}, replacing any undelivered fix of the same device."""
+        before = len(self.fixes)
+        self.fixes.update(fixes)
+        self.coalesced += before + len(fixes) - len(self.fixes)
+        self.ready.set()
+
+    def push_notification(self, notification):
+        if len(self.notifications) >= self.queue_size:
+            self.close("slow consumer")
+            return
+        self.notifications.append(notification)
+        self.ready.set()
+
+    def close(self, reason):
+        if self.closed is None:
+            self.closed = reason
+        self.ready.set()
+
+    def next_events(self, timeout=None):
+        """
+        Wait up to ``timeout`` seconds for events and take all pending ones,
+        as a list of (kind, encoded event). Returns [] on timeout or once closed.
+        """
+        if not self.fixes and not self.notifications and self.closed is None:
+            self.ready.wait(timeout)
+        self.ready.clear()
+        if self.closed is not None:
+            return []
+        events = [(NOTIFICATION, data) for data in self.notifications]
+        events.extend((FIX, data) for data in self.fixes.values())
+        self.notifications = deque()
+        self.fixes = {}
+        self.delivered += len(events)
+        return events
+
+class LiveFeed:
+    """
+    In-process pub/sub between the event bus and live-stream clients.
+
+    Bus handlers (ingest threads, or the bus listener) ``publish`` whole micro-batches into a bounded inbox and
+    wake a single dispatcher greenlet, one cross-thread signal per batch.
+    The dispatcher runs on the hub of the API server (it is started by the
+    first ``subscribe``). It encodes every event once and routes it through
+    a device index to the matching subscribers' buffers, so publishing is
+    almost free while nobody is subscribed and a slow subscriber never
+    blocks ingest or the other subscribers.
+    """
+
+    def __init__(self, inbox_size=LIVE_INBOX_SIZE, max_subscribers=LIVE_MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._inbox = deque(maxlen=inbox_size)
+        self._wakeup = Event()
+        self._dispatcher = None
+        self._all = set()          # no device/bbox filter
+        self._by_device = {}       # device_id -> subscriptions filtered on that device
+        self._by_bbox = set()      # bbox-only filter
+        self._positions = {}       # device_id -> (latitude, longitude) of its latest fix
+        self.subscribers = 0
+        self.published = 0
+        self.inbox_dropped = 0
+        self.dropped_subscribers = 0
+
+    def publish(self, kind, events):
+        """
+        Hand a batch of events to the dispatcher; safe to call from any thread.
+        Fix events need device_id, latitude and longitude; notification events need device_id.
+        """
+        if not self.subscribers or not events:
+            return
+        if len(self._inbox) == self._inbox.maxlen:
+            self.inbox_dropped += 1
+        self._inbox.append((kind, events))
+        self.published += len(events)
+        self._wakeup.set()
+
+    def subscribe(self, device_ids=None, bbox=None, kinds=(FIX, NOTIFICATION)):
+        if self.subscribers >= self.max_subscribers:
+            raise TooManySubscribers(f"Live stream limit of {self.max_subscribers} subscribers reached")
+        if self._dispatcher is None or self._dispatcher.dead:
+            self._dispatcher = gevent.spawn(self._dispatch_forever)
+        subscription = Subscription(device_ids, bbox, kinds)
+        if subscription.device_ids:
+            for device_id in subscription.device_ids:
+                self._by_device.setdefault(device_id, set()).add(subscription)
+        elif subscription.bbox:
+            self._by_bbox.add(subscription)
+        else:
+            self._all.add(subscription)
+        self.subscribers += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        if subscription.device_ids:
+            for device_id in subscription.device_ids:
+                subscribers = self._by_device.get(device_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._by_device[device_id]
+        else:
+            self._by_bbox.discard(subscription)
+            self._all.discard(subscription)
+        self.subscribers -= 1
+        if subscription.closed == "slow consumer":
+            self.dropped_subscribers += 1
+        subscription.close("unsubscribed")
+
+    def _dispatch_forever(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while self._inbox:
+                kind, events = self._inbox.popleft()
+                try:
+                    if kind == FIX:
+                        self._dispatch_fixes(events)
+                    else:
+                        self._dispatch_notifications(events)
+                except Exception as e:
+                    logger.error(f"Error dispatching live {kind} events: {e}")
+                # Let subscriber greenlets write between batches
+                gevent.sleep(0)
+
+    def _dispatch_fixes(self, events):
+        latest = {}
+        for event in events:
+            latest[event['device_id']] = event
+            self._positions[event['device_id']] = (event['latitude'], event['longitude'])
+        device_ids = list(latest)
+        encoded = {device_id: encode_event(event) for device_id, event in latest.items()}
+
+        for subscription in self._all:
+            if FIX in subscription.kinds:
+                subscription.push_fixes(encoded)
+
+        if self._by_bbox:
+            latitudes = np.fromiter((event['latitude'] for event in latest.values()), float, len(latest))
+            longitudes = np.fromiter((event['longitude'] for event in latest.values()), float, len(latest))
+            # Subscribers sharing a viewport share the filtered batch
+            matches = {}
+            for subscription in self._by_bbox:
+                if FIX not in subscription.kinds:
+                    continue
+                matching = matches.get(subscription.bbox)
+                if matching is None:
+                    min_lon, min_lat, max_lon, max_lat = subscription.bbox
+                    inside = np.flatnonzero((latitudes >= min_lat) & (latitudes <= max_lat)
+                                            & (longitudes >= min_lon) & (longitudes <= max_lon))
+                    matching = matches[subscription.bbox] = {
+                        device_ids[i]: encoded[device_ids[i]] for i in inside.tolist()}
+                if matching:
+                    subscription.push_fixes(matching)
+
+        if self._by_device:
+            for device_id, data in encoded.items():
+                for subscription in self._by_device.get(device_id, ()):
+                    event = latest[device_id]
+                    if FIX in subscription.kinds and (
+                            not subscription.bbox or subscription.in_bbox(event['latitude'], event['longitude'])):
+                        subscription.push_fixes({device_id: data})
+
+    def _dispatch_notifications(self, events):
+        for event in events:
+            data = encode_event(event)
+            device_id = event['device_id']
+            position = self._positions.get(device_id)
+            targets = list(self._all)
+            targets.extend(self._by_device.get(device_id, ()))
+            if position is not None:
+                targets.extend(subscription for subscription in self._by_bbox
+                               if subscription.in_bbox(*position))
+            for subscription in targets:
+                if NOTIFICATION in subscription.kinds:
+                    subscription.push_notification(data)
+
+    def stats(self):
+        return {
+            'subscribers': self.subscribers,
+            'published': self.published,
+            'inbox_depth': len(self._inbox),
+            'inbox_dropped': self.inbox_dropped,
+            'dropped_subscribers': self.dropped_subscribers,
+        }
+
+live_feed = LiveFeed()
+register_metrics('live_feed', live_feed.stats)
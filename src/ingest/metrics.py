@@ -0,0 +1,35 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_providers = {}
+_lock = threading.Lock()
+
+def register_metrics(name, provider):
+    """
+    Register a zero-argument callable whose dict result is reported under ``name``.
+    Registering the same name again replaces the previous provider.
+    """
+    with _lock:
+        _providers[name] = provider
+
+def unregister_metrics(name):
+    with _lock:
+        _providers.pop(name, None)
+
+def collect_metrics():
+    """
+    Snapshot every registered provider. A failing provider is reported as an
+    error entry instead of breaking the whole snapshot.
+    """
+    with _lock:
+        providers = list(_providers.items())
+    snapshot = {}
+    for name, provider in providers:
+        try:
+            snapshot[name] = provider()
+        except Exception as e:
+            logger.error(f"Error collecting metrics from {name}: {e}")
+            snapshot[name] = {'error': str(e)}
+    return snapshot
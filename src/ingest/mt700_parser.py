@@ -0,0 +1,422 @@
+import re
+import math
+import logging
+from itertools import repeat, compress
+from datetime import datetime
+import numpy as np
+from src.config.env_loader import NMEA_CHECKSUM_REQUIRED
+from src.ingest.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+VALID_POSITION = 'valid_position'
+LAST_KNOWN_POSITION = 'last_known_position'
+INVALID_POSITION = 'invalid_position'
+
+class _StatusMessages(dict):
+    def __missing__(self, key):
+        return INVALID_POSITION
+
+# RMC status letter -> status_message
+STATUS_MESSAGES = _StatusMessages(A=VALID_POSITION, L=LAST_KNOWN_POSITION, V=INVALID_POSITION)
+
+# Header of an MT700 frame, up to the '#' that opens its first record:
+#   #<imei>#MT700#0000#AUTO#<record count>\r\n#
+HEADER = re.compile(r'#(?P<imei>[^#]*)#[^#]*#[^#]*#[^#]*#(?P<count>[^#]*)#')
+
+# One GPRMC record and the '#' after it (the next record's, or the first of the closing '##'):
+#   <voltage>$GPRMC,<time>,<status>,<lat>,<N|S>,<lon>,<E|W>,<knots>,...,<date>,...*<checksum>\r\n#
+RECORD = re.compile(
+    r'(?P<voltage>[^$#]*)\$'
+    r'(?P<sentence>[^,*#]*,(?P<time>[^,*#]*),(?P<status>[^,*#]*),(?P<lat>[^,*#]*),(?P<ns>[^,*#]*),'
+    r'(?P<lon>[^,*#]*),(?P<ew>[^,*#]*),(?P<speed>[^,*#]*),[^,*#]*,(?P<date>[^,*#]*)[^*#]*?)'
+    r'(?:\*(?P<checksum>[0-9A-Fa-f]{2}))?\s*#'
+)
+
+# '#' in a frame holding a single record: five around the header, one opening the record, '##'
+_SINGLE_RECORD_HASHES = 8
+# Commas in an RMC sentence with all 13 fields (NMEA 2.3+, what every MT700 sends)
+_RMC_COMMAS = 12
+# Byte value -> hex digit value, -1 for anything else
+_HEX_VALUES = np.full(256, -1, dtype=np.int16)
+for _digit, _char in enumerate(b'0123456789abcdef'):
+    _HEX_VALUES[_char] = _HEX_VALUES[bytes([_char]).upper()[0]] = _digit
+# Days in each month (index 1-12) of a leap year, and days before each month of a common year
+_MONTH_DAYS = np.array([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype=np.int64)
+_DAYS_BEFORE_MONTH = np.array([0, 0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334], dtype=np.int64)
+_LEAP_DAYS_BEFORE_1970 = 1969 // 4 - 1969 // 100 + 1969 // 400
+_UNIX_EPOCH = datetime(1970, 1, 1)
+
+class FrameError(ValueError):
+    pass
+
+class ChecksumError(FrameError):
+    pass
+
+def nmea_checksum(sentence):
+    """XOR of the characters of an NMEA sentence (between ``$`` and ``*``)."""
+    checksum = 0
+    for byte in sentence.encode('ascii', 'replace'):
+        checksum ^= byte
+    return checksum
+
+def degrees_minutes(field):
+    """NMEA ``dddmm.mmmm`` text to decimal degrees ("" is 0)."""
+    value = float(field or 0)
+    degrees = value // 100
+    return degrees + (value - degrees * 100) / 60
+
+class Fix:
+    """
+    One parsed GPS fix, as it travels from the parser to the database writer.
+
+    ``frame`` is the position of its frame in the parsed batch, ``voltage``
+    is in tenths of a volt, ``speed`` in knots and ``gps_time`` a naive UTC
+    datetime (the GPS date and time of the fix).
+    """
+
+    __slots__ = ('frame', 'device_id', 'status', 'voltage', 'latitude', 'longitude', 'speed', 'gps_time')
+
+    def __init__(self, frame, device_id, status, voltage, latitude, longitude, speed, gps_time):
+        self.frame = frame
+        self.device_id = device_id
+        self.status = status
+        self.voltage = voltage
+        self.latitude = latitude
+        self.longitude = longitude
+        self.speed = speed
+        self.gps_time = gps_time
+
+    @property
+    def timestamp(self):
+        """Epoch seconds of ``gps_time``."""
+        return (self.gps_time - _UNIX_EPOCH).total_seconds()
+
+    def __repr__(self):
+        return (f"Fix({self.device_id}, {self.status}, {self.gps_time.isoformat()}, "
+                f"{self.latitude:.6f}, {self.longitude:.6f}, {self.speed:g} kn, {self.voltage:g})")
+
+class FixBatch:
+    """
+    Fixes parsed from a batch of frames, one preallocated column per field,
+    in frame order.
+
+    ``frame_index[i]`` is the position in the input of the frame that fix
+    ``i`` came from; frames that could not be parsed have no fix. Numeric
+    columns are float64 NumPy arrays: ``voltages`` in tenths of a volt,
+    ``latitudes``/``longitudes`` in decimal degrees, ``speeds`` in knots and
+    ``timestamps`` in epoch seconds (UTC, whole seconds).
+    """
+
+    __slots__ = ('frame_index', 'device_ids', 'statuses', 'voltages', 'latitudes', 'longitudes', 'speeds',
+                 'timestamps')
+
+    def __init__(self, size):
+        self.frame_index = np.empty(size, dtype=np.int64)
+        self.device_ids = [None] * size
+        self.statuses = [None] * size
+        self.voltages = np.empty(size)
+        self.latitudes = np.empty(size)
+        self.longitudes = np.empty(size)
+        self.speeds = np.empty(size)
+        self.timestamps = np.empty(size)
+
+    def __len__(self):
+        return len(self.device_ids)
+
+    def _reorder(self, order):
+        for name in ('frame_index', 'voltages', 'latitudes', 'longitudes', 'speeds', 'timestamps'):
+            setattr(self, name, getattr(self, name)[order])
+        order = order.tolist()
+        self.device_ids = [self.device_ids[i] for i in order]
+        self.statuses = [self.statuses[i] for i in order]
+
+    def fixes(self):
+        """The fixes as Fix records, in order."""
+        return list(map(Fix, self.frame_index.tolist(), self.device_ids, self.statuses,
+                        self.voltages.tolist(), self.latitudes.tolist(), self.longitudes.tolist(),
+                        self.speeds.tolist(), self.timestamps.astype('datetime64[s]').tolist()))
+
+def convert_record(voltage, time_utc, status, lat, ns, lon, ew, speed, date):
+    """
+    Convert the text fields of one record to (status, voltage, latitude,
+    longitude, speed, gps_time). Raises FrameError for records that must be
+    dropped.
+    """
+    if len(date) != 6 or len(time_utc) < 6 or not (date + time_utc[:6]).isdigit():
+        raise FrameError(f"Bad GPS date/time {date!r} {time_utc!r}")
+    try:
+        gps_time = datetime(2000 + int(date[4:6]), int(date[2:4]), int(date[:2]),
+                            int(time_utc[:2]), int(time_utc[2:4]), int(time_utc[4:6]))
+        latitude = degrees_minutes(lat)
+        longitude = degrees_minutes(lon)
+        voltage, speed = float(voltage), float(speed or 0)
+        if not all(map(math.isfinite, (voltage, latitude, longitude, speed))):
+            raise ValueError(f"Non-finite number in record {voltage} {lat!r} {lon!r} {speed}")
+        return (STATUS_MESSAGES[status], voltage,
+                -latitude if ns == 'S' else latitude,
+                -longitude if ew == 'W' else longitude,
+                speed, gps_time)
+    except ValueError as e:
+        raise FrameError(str(e)) from e
+
+def parse_frame(message, require_checksum=NMEA_CHECKSUM_REQUIRED):
+    """
+    Parse one frame with the reference (regex) grammar.
+    Returns (device_id, fixes, errors, checksum_mismatches): a convert_record
+    tuple for every good record, in order, a FrameError for every dropped
+    one, and how many records failed their NMEA checksum. Those are dropped
+    with a ChecksumError only if ``require_checksum``. Raises FrameError if
+    the frame has no usable header or no record at all.
+    """
+    header = HEADER.match(message)
+    if header is None:
+        raise FrameError("Not an MT700 frame")
+    if not header['imei']:
+        raise FrameError("Missing device id")
+    fixes, errors, mismatches = [], [], 0
+    position = header.end()
+    while True:
+        record = RECORD.match(message, position)
+        if record is None:
+            break
+        position = record.end()
+        voltage, sentence, time_utc, status, lat, ns, lon, ew, speed, date, checksum = record.groups()
+        if checksum is not None and int(checksum, 16) != nmea_checksum(sentence):
+            mismatches += 1
+            if require_checksum:
+                errors.append(ChecksumError(f"NMEA checksum mismatch in {sentence[:32]!r}"))
+                continue
+        try:
+            fixes.append(convert_record(voltage, time_utc, status, lat, ns, lon, ew, speed, date))
+        except FrameError as e:
+            errors.append(e)
+    if not fixes and not errors:
+        raise FrameError("No RMC record in frame")
+    return header['imei'], fixes, errors, mismatches
+
+def split_frames(frames):
+    """
+    Cut frames in the standard layout (``#imei#...#count\\r\\n#record#...##``)
+    into their records with string splits. Returns (frame positions,
+    device_ids, records), one entry per record, and the positions of the
+    frames in any other layout.
+    """
+    if set(map(str.count, frames, repeat('#'))) == {_SINGLE_RECORD_HASHES}:
+        # One record per frame: a single split of the whole batch, eight fields per frame
+        fields = ''.join(frames).split('#')
+        if not any(fields[0::8]) and not any(fields[7::8]) and all(fields[1::8]):
+            return list(range(len(frames))), fields[1::8], fields[6::8], []
+    positions, device_ids, records, others = [], [], [], []
+    for position, message in enumerate(frames):
+        # ['', imei, model, x, y, count\r\n, record\r\n, ..., '', '']
+        parts = message.split('#')
+        if len(parts) < 9 or parts[0] or parts[-2] or parts[-1] or not parts[1]:
+            others.append(position)
+            continue
+        count = len(parts) - 8
+        positions += [position] * count
+        device_ids += [parts[1]] * count
+        records += parts[6:-2]
+    return positions, device_ids, records, others
+
+def _plain_record(record):
+    return (record.isascii() and record.count(',') == _RMC_COMMAS and record.count('$') == 1
+            and record.count('*') == 1)
+
+def _two_digits(data, at):
+    return (data[at] - 48).astype(np.int64) * 10 + (data[at + 1] - 48)
+
+def scan_records(records):
+    """
+    Decode records of the form ``<voltage>$<5-letter id>,<12 fields>*<hex>\\r\\n``
+    column-wise. Returns a dict of columns and an ``ok`` mask of the records
+    that can be stored as decoded: checksum, date and time and numbers all
+    good. Returns None if some record does not have exactly one '$', one '*'
+    and twelve commas, or is not ASCII.
+    """
+    count = len(records)
+    text = ','.join(records)
+    if not text.isascii():
+        return None
+    data = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+    lengths = np.fromiter(map(len, records), dtype=np.int64, count=count)
+    ends = np.cumsum(lengths + 1) - 1
+    starts = ends - lengths
+    commas = np.flatnonzero(data == ord(','))
+    dollars = np.flatnonzero(data == ord('$'))
+    stars = np.flatnonzero(data == ord('*'))
+    if len(commas) != (_RMC_COMMAS + 1) * count - 1 or len(dollars) != count or len(stars) != count:
+        return None
+    # Row i: the commas of record i, then the one joining it to the next (or the end of the text)
+    commas = np.append(commas, len(data)).reshape(count, _RMC_COMMAS + 1)
+    if not ((commas[:, -1] == ends).all() and (dollars >= starts).all() and (stars >= starts).all()
+            and (dollars < ends).all() and (stars < ends).all()):
+        return None
+
+    ok = ((commas[:, 0] - dollars == 6) & (stars == ends - 5) & (commas[:, -2] < stars)
+          & (data[ends - 2] == ord('\r')) & (data[ends - 1] == ord('\n')))
+    hex_at = np.where(ok, stars, 0)
+    high, low = _HEX_VALUES[data[hex_at + 1]], _HEX_VALUES[data[hex_at + 2]]
+    sentence_xor = np.bitwise_xor.reduceat(data, np.stack([dollars + 1, stars], axis=1).ravel())[::2]
+    ok &= (high >= 0) & (low >= 0) & (high * 16 + low == sentence_xor)
+
+    # hhmmss from the time field (at least six characters), ddmmyy from the date field (exactly six)
+    time_at, date_at = commas[:, 0] + 1, commas[:, 8] + 1
+    ok &= (commas[:, 1] - time_at >= 6) & (commas[:, 9] - date_at == 6)
+    time_at, date_at = np.where(ok, time_at, 0), np.where(ok, date_at, 0)
+    digits = data[np.concatenate([time_at + k for k in range(6)] + [date_at + k for k in range(6)])]
+    ok &= ((digits >= ord('0')) & (digits <= ord('9'))).reshape(12, count).all(axis=0)
+    hour, minute, second = _two_digits(data, time_at), _two_digits(data, time_at + 2), _two_digits(data, time_at + 4)
+    day, month = _two_digits(data, date_at), _two_digits(data, date_at + 2)
+    year = 2000 + _two_digits(data, date_at + 4)
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    ok &= (hour < 24) & (minute < 60) & (second < 60) & (month >= 1) & (month <= 12) & (day >= 1)
+    month = np.where(ok, month, 1)
+    ok &= day <= _MONTH_DAYS[month] - ((month == 2) & ~leap)
+    before = year - 1
+    days = (365 * (year - 1970) + before // 4 - before // 100 + before // 400 - _LEAP_DAYS_BEFORE_1970
+            + _DAYS_BEFORE_MONTH[month] + ((month > 2) & leap) + day - 1)
+
+    fields = text.split(',')
+    voltages, ok = _floats([field[:-6] for field in fields[0::13]], ok)
+    latitudes, ok = _floats(fields[3::13], ok, empty='0')
+    longitudes, ok = _floats(fields[5::13], ok, empty='0')
+    speeds, ok = _floats(fields[7::13], ok, empty='0')
+    with np.errstate(invalid='ignore'):
+        latitudes = _degrees_minutes(latitudes)
+        longitudes = _degrees_minutes(longitudes)
+    ok &= np.isfinite(voltages) & np.isfinite(latitudes) & np.isfinite(longitudes) & np.isfinite(speeds)
+    # A hemisphere field of exactly 'S' / 'W' flips the sign
+    south = (commas[:, 4] - commas[:, 3] == 2) & (data[commas[:, 3] + 1] == ord('S'))
+    west = (commas[:, 6] - commas[:, 5] == 2) & (data[commas[:, 5] + 1] == ord('W'))
+    return {
+        'ok': ok,
+        'statuses': list(map(STATUS_MESSAGES.__getitem__, fields[2::13])),
+        'voltages': voltages,
+        'latitudes': np.where(south, -latitudes, latitudes),
+        'longitudes': np.where(west, -longitudes, longitudes),
+        'speeds': speeds,
+        'timestamps': (days * 86400 + hour * 3600 + minute * 60 + second).astype(np.float64),
+    }
+
+def _floats(texts, ok, empty=None):
+    """float() of every text, as an array; texts it rejects clear their ``ok`` and read as 0."""
+    if empty is not None and '' in texts:
+        texts = [text or empty for text in texts]
+    try:
+        return np.fromiter(map(float, texts), dtype=np.float64, count=len(texts)), ok
+    except ValueError:
+        values = np.zeros(len(texts))
+        ok = ok.copy()
+        for i, text in enumerate(texts):
+            try:
+                values[i] = float(text)
+            except ValueError:
+                ok[i] = False
+        return values, ok
+
+def _degrees_minutes(values):
+    """degrees_minutes over an array of the fields' float values."""
+    degrees = values // 100
+    return degrees + (values - degrees * 100) / 60
+
+class Mt700Parser:
+    """
+    Parser for micro-batches of MT700 frames.
+
+    Frames in the standard layout are cut into records with string splits
+    and the records decoded column-wise into a FixBatch. A frame with a
+    record the columns cannot vouch for (another layout, a checksum
+    mismatch, an impossible date, ...) goes through ``parse_frame``, the
+    regex grammar that has the final say on what is stored or dropped.
+
+    Records that fail their NMEA checksum are logged and counted, and only
+    dropped when ``require_checksum`` (NMEA_CHECKSUM_REQUIRED) is set.
+    """
+
+    def __init__(self, require_checksum=NMEA_CHECKSUM_REQUIRED):
+        self.require_checksum = require_checksum
+        self.parsed = 0
+        self.rejected = 0
+        self.checksum_mismatches = 0
+        self.slow_path = 0
+
+    def parse_many(self, frames):
+        """Parse a list of decoded frames into a FixBatch."""
+        positions, device_ids, records, others = split_frames(frames)
+        columns = scan_records(records) if records else None
+        if records and columns is None:
+            # Leave the frames of irregular records to parse_frame and decode the rest
+            irregular = {position for position, record in zip(positions, records) if not _plain_record(record)}
+            others += irregular
+            keep = [position not in irregular for position in positions]
+            positions, device_ids, records = (list(compress(values, keep))
+                                              for values in (positions, device_ids, records))
+            columns = scan_records(records) if records else None
+        if columns is not None and not columns['ok'].all():
+            # Frames with a record that failed a check are decoded again by parse_frame
+            failed = set(compress(positions, (~columns['ok']).tolist()))
+            others += failed
+            keep = [position not in failed for position in positions]
+            positions, device_ids, columns['statuses'] = (list(compress(values, keep))
+                                                          for values in (positions, device_ids, columns['statuses']))
+            for name in ('voltages', 'latitudes', 'longitudes', 'speeds', 'timestamps'):
+                columns[name] = columns[name][np.array(keep, dtype=bool)]
+        others.sort()
+
+        slow = []
+        for position in others:
+            self.slow_path += 1
+            message = frames[position]
+            try:
+                device_id, fixes, errors, mismatches = parse_frame(message, self.require_checksum)
+            except FrameError as e:
+                self.rejected += 1
+                logger.warning(f"Dropping unparseable frame: {e}")
+                continue
+            if mismatches:
+                self.checksum_mismatches += mismatches
+                action = "dropped" if self.require_checksum else "kept"
+                logger.warning(f"NMEA checksum mismatch in {mismatches} record(s) from device {device_id}, {action}")
+            for e in errors:
+                self.rejected += 1
+                logger.warning(f"Dropping record from device {device_id}: {e}")
+            slow += [(position, device_id, fix) for fix in fixes]
+
+        fast = len(positions)
+        batch = FixBatch(fast + len(slow))
+        if fast:
+            batch.frame_index[:fast] = positions
+            batch.device_ids[:fast] = device_ids
+            batch.statuses[:fast] = columns['statuses']
+            for name in ('voltages', 'latitudes', 'longitudes', 'speeds', 'timestamps'):
+                getattr(batch, name)[:fast] = columns[name]
+        for row, (position, device_id, (status, voltage, latitude, longitude, speed, gps_time)) in \
+                enumerate(slow, fast):
+            batch.frame_index[row] = position
+            batch.device_ids[row] = device_id
+            batch.statuses[row] = status
+            batch.voltages[row] = voltage
+            batch.latitudes[row] = latitude
+            batch.longitudes[row] = longitude
+            batch.speeds[row] = speed
+            batch.timestamps[row] = (gps_time - _UNIX_EPOCH).total_seconds()
+        if slow and fast:
+            batch._reorder(np.argsort(batch.frame_index, kind='stable'))
+        self.parsed += len(batch)
+        return batch
+
+    def stats(self):
+        return {
+            'parsed': self.parsed,
+            'rejected': self.rejected,
+            'checksum_mismatches': self.checksum_mismatches,
+            'slow_path_frames': self.slow_path,
+        }
+
+mt700_parser = Mt700Parser()
+register_metrics('mt700_parser', mt700_parser.stats)
+
+def parse_many(frames):
+    return mt700_parser.parse_many(frames)
@@ -0,0 +1,185 @@
+import time
+import logging
+import threading
+from src.config.env_loader import DEVICE_OFFLINE_TIMEOUT, DEVICE_OFFLINE_TICK, DEVICE_OFFLINE_RELOAD_INTERVAL
+from src.data_models.mtrack_data_model import get_device_liveness
+from src.data_models.notification_data_model import get_active_notifications
+from src.ingest.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+# Slots of the timer wheel; deadlines further away than one revolution wait extra rounds
+WHEEL_SLOTS = 4096
+
+class OfflineDetector:
+    """
+    Raises device_offline when a device has been silent for longer than its
+    timeout (the devices.offline_timeout_seconds override, or ``timeout``).
+
+    Deadlines live in a hashed timer wheel of ``tick``-second slots. Every
+    online device has exactly one wheel entry, and ``touch`` only records
+    the last-seen time, so the ingest path pays one dict write per fix. When
+    a slot comes due, each entry's real deadline is recomputed from its
+    last-seen time. Silent devices are reported and everything else is
+    rescheduled, so each device costs one wheel visit per timeout period.
+
+    A device that reports again after being flagged offline is cleared and
+    rescheduled.
+    """
+
+    def __init__(self, timeout=DEVICE_OFFLINE_TIMEOUT, tick=DEVICE_OFFLINE_TICK,
+                 reload_interval=DEVICE_OFFLINE_RELOAD_INTERVAL, slots=WHEEL_SLOTS):
+        if tick <= 0:
+            raise ValueError("tick must be positive")
+        self.timeout = timeout
+        self.tick = tick
+        self.reload_interval = reload_interval
+        self._wheel = [[] for _ in range(slots)]
+        self._next_tick = None
+        self._last_seen = {}
+        self._timeouts = {}
+        self._offline = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._on_offline = None
+        self.fired = 0
+        self.reconnects = 0
+        self.failures = 0
+
+    def _schedule(self, device_id, deadline):
+        if self._next_tick is None:
+            # The wheel starts turning now, so deadlines already past (devices
+            # found silent by warm) come due on the first tick
+            self._next_tick = int(time.time() // self.tick)
+        slot_tick = max(int(deadline // self.tick), self._next_tick)
+        self._wheel[slot_tick % len(self._wheel)].append(device_id)
+
+    def timeout_for(self, device_id):
+        return self._timeouts.get(device_id, self.timeout)
+
+    def _load_timeouts(self, devices):
+        timeouts = {device['device_id']: float(device['offline_timeout_seconds'])
+                    for device in devices if device['offline_timeout_seconds']}
+        with self._lock:
+            self._timeouts = timeouts
+
+    def warm(self):
+        """Seed last-seen times, timeouts and already-reported offline devices from the database."""
+        devices = get_device_liveness()
+        offline = {notification['device_id'] for notification in get_active_notifications('device_offline')}
+        self._load_timeouts(devices)
+        now = time.time()
+        with self._lock:
+            for device in devices:
+                device_id = device['device_id']
+                if device_id in self._last_seen:
+                    continue
+                last_seen = device['last_seen'].timestamp() if device['last_seen'] else now
+                self._last_seen[device_id] = last_seen
+                if device_id in offline:
+                    self._offline.add(device_id)
+                else:
+                    self._schedule(device_id, last_seen + self.timeout_for(device_id))
+        logger.info(f"Offline detector warmed with {len(devices)} devices ({len(offline)} already offline)")
+
+    def start(self, on_offline):
+        """
+        Start the detector thread. ``on_offline(device_id, last_seen, timeout)``
+        is called from that thread for every device that goes silent; if it
+        raises, the device is retried on the next tick.
+        """
+        self._on_offline = on_offline
+        try:
+            self.warm()
+        except Exception as e:
+            logger.error(f"Error warming offline detector, only devices seen from now on are tracked: {e}")
+        self._thread = threading.Thread(target=self._run, name="offline-detector", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def touch(self, device_ids, seen_at=None):
+        """Record that ``device_ids`` reported at ``seen_at`` (epoch seconds, default now)."""
+        seen_at = seen_at or time.time()
+        with self._lock:
+            for device_id in device_ids:
+                previous = self._last_seen.get(device_id)
+                self._last_seen[device_id] = seen_at
+                if previous is None:
+                    self._schedule(device_id, seen_at + self.timeout_for(device_id))
+                elif device_id in self._offline:
+                    self._offline.discard(device_id)
+                    self.reconnects += 1
+                    self._schedule(device_id, seen_at + self.timeout_for(device_id))
+                    logger.info(f"Device {device_id} is back online")
+
+    def advance(self, now=None):
+        """
+        Process every wheel slot that is due at ``now``.
+        Returns the newly offline devices as (device_id, last_seen, timeout).
+        """
+        now = now or time.time()
+        expired = []
+        with self._lock:
+            current = int(now // self.tick)
+            if self._next_tick is None:
+                self._next_tick = current
+            # After a long stall a single revolution covers every slot
+            self._next_tick = max(self._next_tick, current - len(self._wheel) + 1)
+            while self._next_tick <= current:
+                index = self._next_tick % len(self._wheel)
+                due, self._wheel[index] = self._wheel[index], []
+                self._next_tick += 1
+                for device_id in due:
+                    if device_id in self._offline:
+                        continue
+                    last_seen = self._last_seen[device_id]
+                    timeout = self.timeout_for(device_id)
+                    if last_seen + timeout <= now:
+                        self._offline.add(device_id)
+                        expired.append((device_id, last_seen, timeout))
+                    else:
+                        self._schedule(device_id, last_seen + timeout)
+            self.fired += len(expired)
+        return expired
+
+    def _retry(self, device_id):
+        with self._lock:
+            if device_id in self._offline:
+                self._offline.discard(device_id)
+                self._schedule(device_id, time.time())
+
+    def _run(self):
+        last_reload = time.monotonic()
+        while not self._stop.wait(self.tick):
+            if time.monotonic() - last_reload >= self.reload_interval:
+                last_reload = time.monotonic()
+                try:
+                    self._load_timeouts(get_device_liveness())
+                except Exception as e:
+                    logger.error(f"Error reloading device offline timeouts: {e}")
+            for device_id, last_seen, timeout in self.advance():
+                try:
+                    self._on_offline(device_id, last_seen, timeout)
+                except Exception as e:
+                    self.failures += 1
+                    logger.error(f"Error reporting device {device_id} offline, retrying: {e}")
+                    self._retry(device_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'devices': len(self._last_seen),
+                'offline': len(self._offline),
+                'custom_timeouts': len(self._timeouts),
+                'fired': self.fired,
+                'reconnects': self.reconnects,
+                'failures': self.failures,
+            }
+
+offline_detector = OfflineDetector()
+register_metrics('offline_detector', offline_detector.stats)
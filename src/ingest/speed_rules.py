@@ -0,0 +1,144 @@
+import logging
+import threading
+from src.config.env_loader import SPEED_RULES, SPEED_HYSTERESIS
+from src.ingest.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+class SpeedRule:
+    """Fires when a device stays above ``min_speed`` knots for ``duration`` seconds."""
+
+    __slots__ = ('min_speed', 'duration')
+
+    def __init__(self, min_speed, duration):
+        if min_speed < 0 or duration < 0:
+            raise ValueError("Speed rule thresholds must not be negative")
+        self.min_speed = min_speed
+        self.duration = duration
+
+    @property
+    def name(self):
+        return f"over {self.min_speed:g} knots for {self.duration:g}s"
+
+    def __repr__(self):
+        return f"SpeedRule({self.min_speed:g}, {self.duration:g})"
+
+def parse_speed_rules(spec):
+    """Parse a comma-separated list of ``knots:seconds`` rules, skipping invalid entries."""
+    rules = []
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        try:
+            knots, seconds = entry.split(':')
+            rules.append(SpeedRule(float(knots), float(seconds)))
+        except ValueError:
+            logger.error(f"Ignoring invalid speed rule '{entry}', expected knots:seconds")
+    return rules
+
+class SpeedRun:
+    """
+    A device's newest fix time and, per rule, the run of fixes above the
+    rule's threshold it is in: the run's start timestamp (None outside one)
+    and its peak speed.
+    """
+
+    __slots__ = ('last_time', 'starts', 'peaks', 'alerting')
+
+    def __init__(self, rules):
+        self.last_time = None
+        self.starts = [None] * rules
+        self.peaks = [0.0] * rules
+        # One flag per rule: an alert was raised and the device has not slowed down since
+        self.alerting = [False] * rules
+
+class SpeedRuleEngine:
+    """
+    Evaluates speed rules against the fixes of each device as they arrive.
+
+    For every device and rule the engine keeps when the device's current run
+    of fixes above the threshold started, and its peak, so rules such as
+    "over 60 knots for 30 consecutive seconds" are decided from memory,
+    whatever the duration, without querying history. Alerts are debounced per device and rule:
+    once a rule fires it stays silent until the device drops below the
+    threshold by ``hysteresis`` knots, so a speeding vehicle produces one
+    alert rather than one per fix.
+    """
+
+    def __init__(self, rules=None, hysteresis=SPEED_HYSTERESIS):
+        self.rules = parse_speed_rules(SPEED_RULES) if rules is None else list(rules)
+        self.hysteresis = hysteresis
+        self._devices = {}
+        self._lock = threading.Lock()
+        self.evaluations = 0
+        self.alerts = 0
+        self.suppressed = 0
+        self.out_of_order = 0
+
+    def evaluate(self, device_ids, timestamps, speeds):
+        """
+        Feed a batch of fixes, in arrival order.
+
+        Args:
+            device_ids: device of each fix
+            timestamps: fix times as epoch seconds
+            speeds: fix speeds in knots
+
+        Returns:
+            List of (fix index, device_id, rule, peak speed, seconds above threshold)
+        """
+        rules = self.rules
+        if not rules:
+            return []
+        alerts = []
+        suppressed = 0
+        out_of_order = 0
+        with self._lock:
+            devices = self._devices
+            for position, device_id in enumerate(device_ids):
+                run = devices.get(device_id)
+                if run is None:
+                    run = devices[device_id] = SpeedRun(len(rules))
+                timestamp, speed = timestamps[position], speeds[position]
+                # Fixes older than the newest one are dropped
+                if run.last_time is not None and timestamp < run.last_time:
+                    out_of_order += 1
+                    continue
+                run.last_time = timestamp
+                starts, peaks, alerting = run.starts, run.peaks, run.alerting
+                for rule_index, rule in enumerate(rules):
+                    if speed <= rule.min_speed:
+                        starts[rule_index] = None
+                        if alerting[rule_index] and speed <= rule.min_speed - self.hysteresis:
+                            alerting[rule_index] = False
+                        continue
+                    start = starts[rule_index]
+                    if start is None:
+                        start = starts[rule_index] = timestamp
+                        peaks[rule_index] = speed
+                    elif speed > peaks[rule_index]:
+                        peaks[rule_index] = speed
+                    if alerting[rule_index]:
+                        suppressed += 1
+                    elif timestamp - start >= rule.duration:
+                        alerting[rule_index] = True
+                        alerts.append((position, device_id, rule, peaks[rule_index], timestamp - start))
+            self.evaluations += len(device_ids)
+            self.alerts += len(alerts)
+            self.suppressed += suppressed
+            self.out_of_order += out_of_order
+        return alerts
+
+    def stats(self):
+        return {
+            'rules': [rule.name for rule in self.rules],
+            'devices': len(self._devices),
+            'evaluations': self.evaluations,
+            'alerts': self.alerts,
+            'suppressed': self.suppressed,
+            'out_of_order': self.out_of_order,
+        }
+
+speed_rules = SpeedRuleEngine()
+register_metrics('speed_rules', speed_rules.stats)
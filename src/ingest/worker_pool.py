@@ -0,0 +1,170 @@
+import logging
+import queue
+import threading
+import time
+from gevent import get_hub
+from gevent.event import AsyncResult
+from src.config.env_loader import INGEST_WORKERS, INGEST_QUEUE_SIZE, INGEST_BATCH_SIZE, INGEST_BATCH_WINDOW_MS
+from src.ingest.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class _Shard:
+    def __init__(self, index, maxsize):
+        self.index = index
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.thread = None
+        self.busy = False
+        self.busy_seconds = 0.0
+        self.processed = 0
+        self.batches = 0
+        self.errors = 0
+
+class IngestWorkerPool:
+    """
+    Bounded, device-sharded pool of worker threads sitting between the TCP
+    receiver and the message handler.
+
+    Items are routed to a shard by ``key_func(item)`` (the device IMEI), and
+    each shard is drained by exactly one worker thread, so a device's fixes are
+    handled in arrival order while different devices run in parallel.
+
+    Workers hand items to ``handler`` in micro-batches: a batch closes once it
+    holds ``batch_size`` items or ``batch_window_ms`` has passed since its first
+    item arrived. ``handler(items)`` must return one result per item, in order.
+
+    ``submit`` never grows memory without limit: when the target shard is full
+    the calling greenlet is parked until the worker frees a slot. The receiver
+    therefore stops reading from that socket and holds back its ACK, which
+    pushes the backpressure onto the device.
+    """
+
+    def __init__(self, handler, key_func, workers=INGEST_WORKERS, queue_size=INGEST_QUEUE_SIZE,
+                 batch_size=INGEST_BATCH_SIZE, batch_window_ms=INGEST_BATCH_WINDOW_MS):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.handler = handler
+        self.key_func = key_func
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.batch_window = batch_window_ms / 1000.0
+        self._shards = [_Shard(i, max(1, queue_size // workers)) for i in range(workers)]
+        self._started_at = None
+        self.backpressure_waits = 0
+
+    def start(self):
+        self._started_at = time.monotonic()
+        for shard in self._shards:
+            shard.thread = threading.Thread(target=self._run, args=(shard,),
+                                            name=f"ingest-worker-{shard.index}", daemon=True)
+            shard.thread.start()
+        logger.info(f"Ingest worker pool started with {len(self._shards)} workers "
+                    f"(queue size {self.queue_size})")
+
+    def stop(self):
+        for shard in self._shards:
+            shard.queue.put(_STOP)
+        for shard in self._shards:
+            if shard.thread:
+                shard.thread.join()
+        logger.info("Ingest worker pool stopped")
+
+    def submit(self, item):
+        """
+        Queue ``item`` on its device's shard and return an AsyncResult that is
+        set with the handler's return value (or exception) once processed.
+        Blocks cooperatively while the shard is full.
+        """
+        shard = self._shards[hash(self.key_func(item)) % len(self._shards)]
+        result = AsyncResult()
+        entry = (item, result)
+        try:
+            shard.queue.put_nowait(entry)
+        except queue.Full:
+            self.backpressure_waits += 1
+            logger.debug(f"Ingest shard {shard.index} is full, applying backpressure")
+            # Wait on a hub threadpool thread so only the submitting greenlet is parked
+            get_hub().threadpool.apply(shard.queue.put, (entry,))
+        return result
+
+    def _next_batch(self, shard):
+        """
+        Block for the first entry, then collect more until the batch is full or
+        the window closes. Returns (entries, stop_requested).
+        """
+        first = shard.queue.get()
+        if first is _STOP:
+            return [], True
+        entries = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(entries) < self.batch_size:
+            try:
+                remaining = deadline - time.monotonic()
+                entry = shard.queue.get(timeout=remaining) if remaining > 0 else shard.queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                return entries, True
+            entries.append(entry)
+        return entries, False
+
+    def _run(self, shard):
+        stop = False
+        while not stop:
+            entries, stop = self._next_batch(shard)
+            if not entries:
+                continue
+            shard.busy = True
+            started = time.monotonic()
+            try:
+                results = self.handler([item for item, _ in entries])
+                for (_, result), value in zip(entries, results):
+                    result.set(value)
+            except Exception as e:
+                shard.errors += 1
+                logger.error(f"Error in ingest worker {shard.index}: {e}")
+                for _, result in entries:
+                    result.set_exception(e)
+            finally:
+                shard.busy_seconds += time.monotonic() - started
+                shard.processed += len(entries)
+                shard.batches += 1
+                shard.busy = False
+
+    @property
+    def queue_depth(self):
+        return sum(shard.queue.qsize() for shard in self._shards)
+
+    def stats(self):
+        uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+        shards = [{
+            'shard': shard.index,
+            'queue_depth': shard.queue.qsize(),
+            'busy': shard.busy,
+            'processed': shard.processed,
+            'batches': shard.batches,
+            'errors': shard.errors,
+            'utilisation': round(shard.busy_seconds / uptime, 4) if uptime else 0.0,
+        } for shard in self._shards]
+        return {
+            'workers': len(self._shards),
+            'queue_depth': sum(s['queue_depth'] for s in shards),
+            'queue_capacity': sum(shard.queue.maxsize for shard in self._shards),
+            'busy_workers': sum(1 for s in shards if s['busy']),
+            'utilisation': round(sum(s['utilisation'] for s in shards) / len(shards), 4),
+            'backpressure_waits': self.backpressure_waits,
+            'processed': sum(s['processed'] for s in shards),
+            'batches': sum(s['batches'] for s in shards),
+            'batch_size': self.batch_size,
+            'errors': sum(s['errors'] for s in shards),
+            'shards': shards,
+        }
+
+def create_ingest_pool(handler, key_func):
+    pool = IngestWorkerPool(handler, key_func)
+    register_metrics('ingest_pool', pool.stats)
+    return pool
@@ -4,6 +4,7 @@ from flask import request, jsonify
 import jwt
 from datetime import datetime, timedelta
 from src.controllers.users_controller import find_user_by_id
+from src.middleware.principal_cache import principal_cache
 import logging
 from src.config.env_loader import SECRET_KEY
 
@@ -27,11 +28,16 @@ def token_required(f):
             data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
             user_id = data['user_id']
 
-            # Verify user exists
-            user = find_user_by_id(user_id)
-            if not user:
-                logger.warning(f"User with ID {user_id} not found in the database")
-                return jsonify({'message': 'User not found!'}), 401
+            # Verify user exists, unless this token was already verified recently
+            user = principal_cache.get(user_id, token)
+            if user is None:
+                # Read before the lookup, so a change committed meanwhile keeps the row out of the cache
+                generation = principal_cache.generation(user_id)
+                user = find_user_by_id(user_id)
+                if not user:
+                    logger.warning(f"User with ID {user_id} not found in the database")
+                    return jsonify({'message': 'User not found!'}), 401
+                principal_cache.put(user_id, token, user, data.get('exp'), generation)
 
             # Add user to the request context
             request.user = user
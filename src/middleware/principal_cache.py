@@ -0,0 +1,120 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from src.config.env_loader import AUTH_CACHE_TTL, AUTH_CACHE_SIZE
+from src.ingest.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+class PrincipalCache:
+    """
+    LRU cache of verified principals, keyed by (user_id, token).
+
+    ``token_required`` still checks the token signature and expiry on every
+    request, and only uses the cache for the user lookup. An entry lives at
+    most ``ttl`` seconds and is never kept past its token's own expiry.
+    Once the cache holds ``max_size`` entries, the least recently used entry
+    is evicted. ``invalidate(user_id)`` drops every token of a user, so
+    profile changes and account deletions take effect on the next request.
+
+    Each invalidation also bumps the user's generation. A request reads it
+    with ``generation`` before looking the user up and passes it to ``put``,
+    which skips the entry if the user was invalidated in between, so a
+    lookup in flight cannot cache the row a change just replaced.
+    """
+
+    def __init__(self, ttl=AUTH_CACHE_TTL, max_size=AUTH_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()   # (user_id, token) -> (expires_at, user)
+        self._tokens = {}               # user_id -> set of cached tokens
+        self._generations = {}          # user_id -> invalidations so far
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id, token):
+        key = (user_id, token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def generation(self, user_id):
+        """The user's generation, to pass to ``put`` for a lookup started now."""
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def put(self, user_id, token, user, token_expires_at=None, generation=None):
+        """
+        Cache ``user`` for ``token``; ``token_expires_at`` is the token's exp
+        claim (epoch seconds). Nothing is cached if ``generation`` is given and
+        the user has been invalidated since it was read.
+        """
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        lifetime = self.ttl
+        if token_expires_at is not None:
+            lifetime = min(lifetime, token_expires_at - time.time())
+        if lifetime <= 0:
+            return
+        key = (user_id, token)
+        with self._lock:
+            if generation is not None and generation != self._generations.get(user_id, 0):
+                return
+            self._entries[key] = (time.monotonic() + lifetime, user)
+            self._entries.move_to_end(key)
+            self._tokens.setdefault(user_id, set()).add(token)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        del self._entries[key]
+        tokens = self._tokens.get(key[0])
+        if tokens is not None:
+            tokens.discard(key[1])
+            if not tokens:
+                del self._tokens[key[0]]
+
+    def invalidate(self, user_id):
+        """Forget every cached token of ``user_id``."""
+        with self._lock:
+            for token in self._tokens.pop(user_id, ()):
+                self._entries.pop((user_id, token), None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self.invalidations += 1
+
+    def invalidate_events(self, events):
+        """Event bus handler for user changes made by other processes."""
+        for event in events:
+            self.invalidate(event['user_id'])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'users': len(self._tokens),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'invalidations': self.invalidations,
+            }
+
+principal_cache = PrincipalCache()
+register_metrics('principal_cache', principal_cache.stats)
@@ -0,0 +1,93 @@
+import enum
+import json
+from json.encoder import encode_basestring, encode_basestring_ascii
+from datetime import date, time, datetime
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+
+class Rows:
+    """
+    Query result kept as the cursor returned it: column names and row tuples.
+    RowJSONProvider encodes it as a list of objects without building a dict
+    per row; iterating yields dicts for everything else.
+    """
+    __slots__ = ('columns', 'rows')
+
+    def __init__(self, columns, rows):
+        self.columns = list(columns)
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        columns = self.columns
+        return (dict(zip(columns, row)) for row in self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Rows(self.columns, self.rows[index])
+        return dict(zip(self.columns, self.rows[index]))
+
+class RowJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider of the REST API.
+
+    Dates, times and datetimes are written in ISO 8601, Decimals as strings
+    (exact, as Flask always sent them) and enums by value, in the same pass
+    as the rest of the document. Rows are encoded column by column: when a
+    column holds a single type every value goes through one C-level
+    conversion, and each row is formatted from a template of its keys.
+    """
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (date, time, datetime)):
+            return o.isoformat()
+        if isinstance(o, Decimal):
+            return str(o)
+        if isinstance(o, enum.Enum):
+            return o.value
+        if isinstance(o, Rows):
+            return list(o)
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        # Rows are always written compact and key-sorted, like jsonify's default output
+        if isinstance(obj, Rows) and kwargs.get('indent') is None:
+            return '[' + ','.join(self.encode_rows(obj)) + ']'
+        return super().dumps(obj, **kwargs)
+
+    def encode_rows(self, rows):
+        """The JSON object of every row, as a list of strings."""
+        if not rows.rows:
+            return []
+        order = sorted(range(len(rows.columns)), key=rows.columns.__getitem__)
+        encode_string = encode_basestring_ascii if self.ensure_ascii else encode_basestring
+        template = '{' + ','.join(encode_string(rows.columns[i]).replace('%', '%%') + ':%s' for i in order) + '}'
+        columns = list(zip(*rows.rows))
+        encoded = [self._encode_column(columns[i], encode_string) for i in order]
+        return list(map(template.__mod__, zip(*encoded)))
+
+    def _encode_column(self, values, encode_string):
+        types = set(map(type, values))
+        nullable = type(None) in types
+        types.discard(type(None))
+        kind = types.pop() if len(types) == 1 else None
+        if kind is str:
+            encode = encode_string
+        elif kind is int:
+            encode = int.__repr__
+        elif kind is Decimal:
+            encode = '"%s"'.__mod__
+        elif kind in (date, time, datetime):
+            if not nullable:
+                return map('"%s"'.__mod__, map(kind.isoformat, values))
+            encode = lambda value: f'"{value.isoformat()}"'
+        else:
+            encode = json.JSONEncoder(ensure_ascii=self.ensure_ascii, separators=(',', ':'),
+                                      sort_keys=self.sort_keys, default=self.default).encode
+            nullable = False
+        if nullable:
+            return ['null' if value is None else encode(value) for value in values]
+        return map(encode, values)
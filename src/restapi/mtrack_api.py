@@ -1,23 +1,20 @@
 from flask import Flask
-import json
-from datetime import date, time, datetime
+from src.restapi.json_provider import RowJSONProvider
 from src.router.mtrack_routes import init_routes  # Import the mtrack route initializer
 from src.router.user_routes import init_user_routes  # Import the user route initializer
 from src.router.notification_routes import init_notification_routes
-
-class CustomJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, (date, time, datetime)):
-            return obj.isoformat()
-        return super().default(obj)
+from src.router.ingest_routes import init_ingest_routes
+from src.router.live_routes import init_live_routes
 
 app = Flask(__name__)
-app.json_encoder = CustomJSONEncoder
+app.json = RowJSONProvider(app)
 
 # Initialize routes for devices and user login
 init_routes(app)          # Device-related routes
 init_user_routes(app)     # User-related routes (login, update, delete)
 init_notification_routes(app)
+init_ingest_routes(app)   # Ingest pipeline monitoring
+init_live_routes(app)     # Live push stream
 
 # This function stays here for starting the app externally
 def start_flask_app():
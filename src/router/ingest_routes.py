@@ -0,0 +1,21 @@
+import logging
+from flask import jsonify
+from src.middleware.auth_middleware import token_required
+from src.ingest.metrics import collect_metrics, register_metrics
+from src.config.postgresql import pool_stats
+
+logger = logging.getLogger(__name__)
+
+def init_ingest_routes(app):
+    register_metrics('db_pool', pool_stats)
+
+    @app.route('/api/ingest/stats', methods=['GET'])
+    @token_required
+    def ingest_stats():
+        """Queue depth, worker utilisation and other ingest pipeline metrics"""
+        try:
+            return jsonify(collect_metrics()), 200
+        except Exception as e:
+            logger.error(f"Error collecting ingest stats: {str(e)}")
+            return jsonify(error="Internal Server Error",
+                         message="An unexpected error occurred"), 500
@@ -0,0 +1,65 @@
+import logging
+from flask import jsonify, request, Response
+from werkzeug.exceptions import BadRequest
+from src.middleware.auth_middleware import token_required
+from src.router.mtrack_routes import parse_bbox
+from src.ingest.live_feed import live_feed, TooManySubscribers, FIX, NOTIFICATION
+from src.config.env_loader import LIVE_HEARTBEAT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+MAX_STREAM_DEVICES = 1000
+
+def _sse_events(subscription, heartbeat=LIVE_HEARTBEAT_INTERVAL):
+    """Server-Sent Events body for a subscription; unsubscribes when the client goes away."""
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            events = subscription.next_events(timeout=heartbeat)
+            if subscription.closed is not None:
+                yield f"event: closed\ndata: {{\"reason\":\"{subscription.closed}\"}}\n\n"
+                return
+            if not events:
+                yield ": keepalive\n\n"
+                continue
+            yield "".join(f"event: {kind}\ndata: {data}\n\n" for kind, data in events)
+    finally:
+        live_feed.unsubscribe(subscription)
+
+def init_live_routes(app):
+    @app.route('/api/live/stream', methods=['GET'])
+    @token_required
+    def live_stream():
+        """
+        Server-Sent Events stream of new fixes and notifications.
+        Filters: devices (comma-separated ids), bbox (min_lon,min_lat,max_lon,max_lat),
+        events (fix, notification or both, comma-separated).
+        """
+        try:
+            device_ids = [d for d in request.args.get('devices', '').split(',') if d]
+            if len(device_ids) > MAX_STREAM_DEVICES:
+                raise BadRequest(f"At most {MAX_STREAM_DEVICES} devices per stream")
+            bbox = request.args.get('bbox')
+            bbox = parse_bbox(bbox) if bbox else None
+            kinds = [k for k in request.args.get('events', f"{FIX},{NOTIFICATION}").split(',') if k]
+            if not kinds or any(kind not in (FIX, NOTIFICATION) for kind in kinds):
+                raise BadRequest(f"events must be {FIX}, {NOTIFICATION} or both")
+
+            subscription = live_feed.subscribe(device_ids=device_ids, bbox=bbox, kinds=kinds)
+            logger.info(f"Live stream opened by user {request.user_id} "
+                        f"({len(device_ids)} devices, bbox {bbox}, events {','.join(kinds)})")
+            response = Response(_sse_events(subscription),
+                                mimetype='text/event-stream')
+            response.headers['Cache-Control'] = 'no-cache'
+            response.headers['X-Accel-Buffering'] = 'no'
+            return response
+        except BadRequest as e:
+            logger.warning(f"Bad live stream request: {str(e)}")
+            return jsonify(error="Bad Request", message=str(e)), 400
+        except TooManySubscribers as e:
+            logger.warning(str(e))
+            return jsonify(error="Service Unavailable", message=str(e)), 503
+        except Exception as e:
+            logger.error(f"Error opening live stream: {str(e)}")
+            return jsonify(error="Internal Server Error",
+                         message="An unexpected error occurred"), 500
@@ -1,17 +1,50 @@
-from flask import jsonify, request
+from itertools import chain
+from flask import jsonify, request, current_app, Response, stream_with_context
 from werkzeug.exceptions import NotFound, BadRequest
 from src.controllers.mtrack_controller import (
     get_device_last_data,
     get_device_location_history,
     get_devices,
-    get_device_data_by_date_range
+    get_device_data_page,
+    stream_device_data,
+    get_fleet_snapshot
 )
 from src.middleware.auth_middleware import token_required
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
 
+MAX_PAGE_SIZE = 10000
+DEFAULT_PAGE_SIZE = 1000
+
+def _stream_json_rows(chunks, ndjson):
+    """
+    Encode chunks of Rows as one JSON array (or NDJSON), a chunk at a time,
+    matching jsonify's compact, key-sorted output.
+    """
+    encode_rows = current_app.json.encode_rows
+    separator = "\n" if ndjson else ","
+    if not ndjson:
+        yield "["
+    first = True
+    for rows in chunks:
+        if not len(rows):
+            continue
+        yield ("" if first else separator) + separator.join(encode_rows(rows))
+        first = False
+    yield "\n" if ndjson and not first else ("]\n" if not ndjson else "")
+
+def parse_bbox(value):
+    """Parse a GeoJSON-ordered "min_lon,min_lat,max_lon,max_lat" bbox. Raises BadRequest."""
+    try:
+        bbox = tuple(float(part) for part in value.split(','))
+    except ValueError:
+        raise BadRequest("Invalid bbox. Use min_lon,min_lat,max_lon,max_lat")
+    if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        raise BadRequest("Invalid bbox. Use min_lon,min_lat,max_lon,max_lat")
+    return bbox
+
 def init_routes(app):
     @app.errorhandler(500)
     def internal_server_error(error):
@@ -53,6 +86,32 @@ def init_routes(app):
             logger.error(f"Error in all_devices: {str(e)}")
             return jsonify(error="Internal Server Error", message="An unexpected error occurred"), 500
 
+    @app.route('/api/devices/snapshot')
+    @token_required
+    def devices_snapshot():
+        try:
+            bbox = request.args.get('bbox')
+            since = request.args.get('since')
+
+            if bbox:
+                bbox = parse_bbox(bbox)
+
+            if since:
+                try:
+                    since = datetime.fromisoformat(since)
+                except ValueError:
+                    raise BadRequest("Invalid since format. Use ISO format (YYYY-MM-DDTHH:MM:SS)")
+                if since.tzinfo is None:
+                    since = since.replace(tzinfo=timezone.utc)
+
+            return jsonify(get_fleet_snapshot(bbox=bbox or None, since=since or None))
+        except BadRequest as e:
+            logger.warning(f"Bad request for devices snapshot: {str(e)}")
+            return jsonify(error="Bad Request", message=str(e)), 400
+        except Exception as e:
+            logger.error(f"Error in devices_snapshot: {str(e)}")
+            return jsonify(error="Internal Server Error", message="An unexpected error occurred"), 500
+
     @app.route('/api/devices/<string:device_id>/data')
     @token_required
     def device_data_by_date_range(device_id):
@@ -76,11 +135,36 @@ def init_routes(app):
             if end_date < start_date:
                 raise BadRequest("end_date must be greater than or equal to start_date")
 
-            result = get_device_data_by_date_range(device_id, start_date, end_date)
-            if not result:
-                return jsonify([])  # Return empty array if no data found
+            limit = request.args.get('limit')
+            cursor = request.args.get('cursor')
+            output_format = request.args.get('format', 'json')
+            if output_format not in ('json', 'ndjson'):
+                raise BadRequest("format must be json or ndjson")
 
-            return jsonify(result)
+            if limit or cursor:
+                # Keyset pagination; the next page's cursor is sent in X-Next-Cursor
+                try:
+                    limit = int(limit) if limit else DEFAULT_PAGE_SIZE
+                except ValueError:
+                    raise BadRequest("limit must be an integer")
+                if not 1 <= limit <= MAX_PAGE_SIZE:
+                    raise BadRequest(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+                try:
+                    result, next_cursor = get_device_data_page(device_id, start_date, end_date, limit, cursor)
+                except ValueError as e:
+                    raise BadRequest(str(e))
+                response = jsonify(result)
+                if next_cursor:
+                    response.headers['X-Next-Cursor'] = next_cursor
+                return response
+
+            # Unpaginated: stream rows from a server-side cursor as they arrive
+            chunks = stream_device_data(device_id, start_date, end_date)
+            first_chunk = next(chunks, None)  # surface query errors before the response starts
+            chunks = chain([first_chunk], chunks) if first_chunk is not None else iter(())
+            ndjson = output_format == 'ndjson'
+            return Response(stream_with_context(_stream_json_rows(chunks, ndjson)),
+                            mimetype='application/x-ndjson' if ndjson else 'application/json')
 
         except BadRequest as e:
             logger.warning(f"Bad request for device {device_id}: {str(e)}")
@@ -1,4 +1,5 @@
 import logging
+from datetime import datetime, timezone
 from flask import jsonify, request
 from werkzeug.exceptions import NotFound, BadRequest
 from src.middleware.auth_middleware import token_required
@@ -6,14 +7,76 @@ from src.controllers.notification_controller import (
     create_device_notification,
     get_notification_by_id,
     acknowledge_notification,
+    acknowledge_notifications,
     update_notification_status,
+    update_notifications_status,
     remove_notification,
+    remove_notifications,
     get_notifications_for_device,
     get_all_pending_notifications
 )
 
 logger = logging.getLogger(__name__)
 
+MAX_BATCH_SIZE = 5000
+MAX_PAGE_SIZE = 1000
+DEFAULT_PAGE_SIZE = 100
+
+def _listing_args():
+    """
+    Parse the shared limit/cursor/type/start_date/end_date query parameters
+    of the notification listings. Naive dates are taken as UTC.
+    Raises BadRequest on invalid values.
+    """
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest("limit must be an integer")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise BadRequest(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    dates = {}
+    for name in ('start_date', 'end_date'):
+        value = request.args.get(name)
+        if value is None:
+            dates[name] = None
+            continue
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            raise BadRequest(f"Invalid {name} format. Use ISO format (YYYY-MM-DDTHH:MM:SS)")
+        dates[name] = value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+    return {
+        'limit': limit,
+        'cursor': request.args.get('cursor'),
+        'notification_type': request.args.get('type'),
+        **dates,
+    }
+
+def _page_response(notifications, next_cursor):
+    response = jsonify(notifications)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+def _batch_notification_ids(data):
+    """
+    Validate the notification_ids array of a batch request body.
+    Returns (ids, None) or (None, error response).
+    """
+    notification_ids = (data or {}).get('notification_ids')
+    if not isinstance(notification_ids, list) or not notification_ids:
+        return None, (jsonify(error="Bad Request",
+                              message="notification_ids array is required"), 400)
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in notification_ids):
+        return None, (jsonify(error="Bad Request",
+                              message="notification_ids must be integers"), 400)
+    if len(notification_ids) > MAX_BATCH_SIZE:
+        return None, (jsonify(error="Bad Request",
+                              message=f"At most {MAX_BATCH_SIZE} notification_ids per request"), 400)
+    return notification_ids, None
+
 def init_notification_routes(app):
     @app.route('/api/notifications', methods=['POST'])
     @token_required
@@ -130,10 +193,20 @@ def init_notification_routes(app):
     @app.route('/api/devices/<device_id>/notifications', methods=['GET'])
     @token_required
     def get_device_notifications(device_id):
-        """Get all notifications for a specific device"""
+        """
+        Get a page of a device's notifications, newest first.
+        Filters: type, status, start_date, end_date. The next page's cursor is sent in X-Next-Cursor.
+        """
         try:
-            notifications = get_notifications_for_device(device_id)
-            return jsonify(notifications), 200
+            notifications, next_cursor = get_notifications_for_device(
+                device_id,
+                status=request.args.get('status'),
+                **_listing_args()
+            )
+            return _page_response(notifications, next_cursor), 200
+        except (BadRequest, ValueError) as e:
+            logger.warning(f"Bad notification listing request for device {device_id}: {str(e)}")
+            return jsonify(error="Bad Request", message=str(e)), 400
         except Exception as e:
             logger.error(f"Error retrieving notifications for device {device_id}: {str(e)}")
             return jsonify(error="Internal Server Error",
@@ -142,10 +215,19 @@ def init_notification_routes(app):
     @app.route('/api/notifications/pending', methods=['GET'])
     @token_required
     def get_pending_notifications():
-        """Get all pending notifications"""
+        """
+        Get a page of pending notifications, oldest first.
+        Filters: type, device_id, start_date, end_date. The next page's cursor is sent in X-Next-Cursor.
+        """
         try:
-            notifications = get_all_pending_notifications()
-            return jsonify(notifications), 200
+            notifications, next_cursor = get_all_pending_notifications(
+                device_id=request.args.get('device_id'),
+                **_listing_args()
+            )
+            return _page_response(notifications, next_cursor), 200
+        except (BadRequest, ValueError) as e:
+            logger.warning(f"Bad pending notification listing request: {str(e)}")
+            return jsonify(error="Bad Request", message=str(e)), 400
         except Exception as e:
             logger.error(f"Error retrieving pending notifications: {str(e)}")
             return jsonify(error="Internal Server Error",
@@ -155,27 +237,75 @@ def init_notification_routes(app):
     @token_required
     def batch_acknowledge_notifications():
         """Acknowledge multiple notifications at once"""
-        data = request.json
-        if not data or 'notification_ids' not in data:
-            logger.warning("Missing notification_ids in batch acknowledge request")
-            return jsonify(error="Bad Request",
-                         message="notification_ids array is required"), 400
+        notification_ids, error = _batch_notification_ids(request.get_json(silent=True))
+        if error:
+            logger.warning("Invalid notification_ids in batch acknowledge request")
+            return error
 
         try:
-            results = []
-            for notification_id in data['notification_ids']:
-                notification = acknowledge_notification(
-                    notification_id=notification_id,
-                    user_id=request.user_id  # Assuming middleware adds user_id to request
-                )
-                if notification:
-                    results.append(notification)
-
+            notifications, results = acknowledge_notifications(
+                notification_ids=notification_ids,
+                user_id=request.user_id
+            )
             return jsonify({
-                'message': f"Successfully acknowledged {len(results)} notifications",
-                'notifications': results
+                'message': f"Successfully acknowledged {len(notifications)} notifications",
+                'notifications': notifications,
+                'results': results
             }), 200
         except Exception as e:
             logger.error(f"Error in batch notification acknowledgment: {str(e)}")
             return jsonify(error="Internal Server Error",
                          message="An unexpected error occurred"), 500
+
+    @app.route('/api/notifications/batch/status', methods=['PUT'])
+    @token_required
+    def batch_update_notifications():
+        """Update the status (and optionally the message) of multiple notifications at once"""
+        data = request.get_json(silent=True)
+        notification_ids, error = _batch_notification_ids(data)
+        if error:
+            logger.warning("Invalid notification_ids in batch status update request")
+            return error
+        if 'status' not in data:
+            logger.warning("Missing status in batch status update request")
+            return jsonify(error="Bad Request", message="Status is required"), 400
+
+        try:
+            notifications, results = update_notifications_status(
+                notification_ids=notification_ids,
+                status=data['status'],
+                message=data.get('message')
+            )
+            return jsonify({
+                'message': f"Successfully updated {len(notifications)} notifications",
+                'notifications': notifications,
+                'results': results
+            }), 200
+        except ValueError as e:
+            logger.warning(f"Invalid batch notification update data: {str(e)}")
+            return jsonify(error="Bad Request", message=str(e)), 400
+        except Exception as e:
+            logger.error(f"Error in batch notification update: {str(e)}")
+            return jsonify(error="Internal Server Error",
+                         message="An unexpected error occurred"), 500
+
+    @app.route('/api/notifications/batch', methods=['DELETE'])
+    @token_required
+    def batch_delete_notifications():
+        """Delete multiple notifications at once"""
+        notification_ids, error = _batch_notification_ids(request.get_json(silent=True))
+        if error:
+            logger.warning("Invalid notification_ids in batch delete request")
+            return error
+
+        try:
+            results = remove_notifications(notification_ids)
+            deleted = sum(1 for result in results if result['result'] == 'deleted')
+            return jsonify({
+                'message': f"Successfully deleted {deleted} notifications",
+                'results': results
+            }), 200
+        except Exception as e:
+            logger.error(f"Error in batch notification deletion: {str(e)}")
+            return jsonify(error="Internal Server Error",
+                         message="An unexpected error occurred"), 500
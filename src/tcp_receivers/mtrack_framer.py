@@ -0,0 +1,120 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Every MT700 frame ends with an empty record: "...\r\n##\r\n"
+FRAME_TERMINATOR = b'##\r\n'
+FRAME_START = b'#'
+
+DEFAULT_MAX_FRAME_SIZE = 64 * 1024
+DEFAULT_BUFFER_SIZE = 4096
+
+class FrameTooLarge(Exception):
+    """Raised when a peer sends more than ``max_frame_size`` bytes without a frame terminator."""
+
+class FrameBuffer:
+    """
+    Per-connection reassembly buffer for MT700 frames.
+
+    Socket reads land directly in a growable bytearray through ``recv_into``,
+    so partial frames are never decoded or copied again on the next read. Each
+    complete ``#<imei>#...##\\r\\n`` frame is copied out exactly once when it is
+    returned. Bytes before the first ``#`` of a frame (line noise, keep-alive
+    newlines) are discarded.
+    """
+
+    def __init__(self, max_frame_size=DEFAULT_MAX_FRAME_SIZE, initial_size=DEFAULT_BUFFER_SIZE):
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray(initial_size)
+        self._start = 0   # first unconsumed byte
+        self._end = 0     # one past the last received byte
+        self._scan = 0    # where the next terminator search resumes
+
+    def __len__(self):
+        return self._end - self._start
+
+    def recv_from(self, conn, size=DEFAULT_BUFFER_SIZE):
+        """
+        Read up to ``size`` bytes from ``conn`` straight into the buffer.
+        Returns the number of bytes read; 0 means the peer closed the connection.
+        """
+        self._reserve(size)
+        view = memoryview(self._buffer)[self._end:self._end + size]
+        try:
+            received = conn.recv_into(view)
+        finally:
+            view.release()
+        self._end += received
+        return received
+
+    def feed(self, data):
+        """Append already-received bytes (used by callers that do not own a socket)."""
+        self._reserve(len(data))
+        self._buffer[self._end:self._end + len(data)] = data
+        self._end += len(data)
+
+    def frames(self):
+        """
+        Return every complete frame currently buffered, as bytes including the
+        terminator. Partial trailing data is kept for the next read.
+
+        Raises FrameTooLarge (after discarding the oversized data) when the
+        pending partial frame exceeds ``max_frame_size``.
+        """
+        frames = []
+        buffer = self._buffer
+        while True:
+            start = buffer.find(FRAME_START, self._start, self._end)
+            if start < 0:
+                # Nothing but noise: drop it
+                self._start = self._scan = self._end
+                break
+            self._start = start
+            end = buffer.find(FRAME_TERMINATOR, max(self._scan, start + 1), self._end)
+            if end < 0:
+                # Resume just before the tail so a terminator split across reads is still found
+                self._scan = max(start + 1, self._end - len(FRAME_TERMINATOR) + 1)
+                break
+            end += len(FRAME_TERMINATOR)
+            frames.append(bytes(buffer[start:end]))
+            self._start = self._scan = end
+
+        self._compact()
+
+        if len(self) > self.max_frame_size:
+            discarded = len(self)
+            self._start = self._scan = self._end
+            self._compact()
+            raise FrameTooLarge(f"Discarded {discarded} bytes without a frame terminator "
+                                f"(max frame size {self.max_frame_size})")
+        return frames
+
+    def _reserve(self, size):
+        if self._end + size <= len(self._buffer):
+            return
+        self._compact()
+        if self._end + size > len(self._buffer):
+            self._buffer.extend(bytes(max(self._end + size - len(self._buffer), len(self._buffer))))
+
+    def _compact(self):
+        if self._start == 0:
+            return
+        if self._start == self._end:
+            self._start = self._scan = self._end = 0
+            return
+        remaining = self._end - self._start
+        self._buffer[:remaining] = self._buffer[self._start:self._end]
+        self._scan -= self._start
+        self._start, self._end = 0, remaining
+
+def decode_frame(frame):
+    """Turn a raw frame into the stripped text the message handlers expect."""
+    return frame.decode('utf-8', errors='replace').strip()
+
+def frame_device_id(message):
+    """Return the IMEI from the ``#<imei>#...`` header of a decoded frame, or '' if absent."""
+    start = message.find('#')
+    if start < 0:
+        return ''
+    end = message.find('#', start + 1)
+    return message[start + 1:end] if end > start else ''
@@ -1,65 +1,138 @@
 import socket
-import select
 import logging
-import threading
+from gevent.pool import Pool
+from gevent.server import StreamServer
+from src.config.env_loader import TCP_IDLE_TIMEOUT, TCP_MAX_CONNECTIONS, TCP_MAX_FRAME_SIZE
+from src.tcp_receivers.mtrack_framer import FrameBuffer, FrameTooLarge, decode_frame
 
 logger = logging.getLogger(__name__)
 
+# A minimal acknowledgment: the ASCII ACK character, one per frame
+ACK = b'\x06'
+
 class TCPReceiver:
-    def __init__(self, host='0.0.0.0', port=23304, message_handler=None):
+    """
+    Event-loop TCP server for tracker connections.
+
+    Every device connection is served by a greenlet on a single gevent hub
+    instead of a dedicated OS thread, so thousands of persistent sockets cost
+    a few KB each. Connections beyond ``max_connections`` wait in the listen
+    backlog until a slot frees up, and connections silent for longer than
+    ``idle_timeout`` seconds are closed.
+
+    The byte stream is reassembled into complete MT700 frames before it
+    reaches ``message_handler``, which is called once per frame and returns
+    a result to wait on (see IngestWorkerPool.submit). Each frame is
+    acknowledged with a single ``\\x06`` only once its records are committed,
+    so the device keeps its buffer until the data is safe. If a frame cannot
+    be stored the connection is closed without acknowledging it, and the
+    device sends it again when it reconnects.
+    """
+
+    def __init__(self, host='0.0.0.0', port=23304, message_handler=None,
+                 idle_timeout=TCP_IDLE_TIMEOUT, max_connections=TCP_MAX_CONNECTIONS,
+                 max_frame_size=TCP_MAX_FRAME_SIZE):
         self.host = host
         self.port = port
         self.message_handler = message_handler
-        self.socket = None
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self.max_frame_size = max_frame_size
+        self.server = None
+        self.pool = None
         self.running = False
 
     def start(self):
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.socket.bind((self.host, self.port))
-        self.socket.listen()
+        raise_file_limit(self.max_connections)
+        self.pool = Pool(self.max_connections)
+        self.server = StreamServer((self.host, self.port), self.handle_client, spawn=self.pool)
         self.running = True
-        logger.info(f"TCP Server listening on {self.host}:{self.port}")
-
-        while self.running:
-            try:
-                conn, addr = self.socket.accept()
-                client_thread = threading.Thread(target=self.handle_client, args=(conn, addr))
-                client_thread.start()
-            except Exception as e:
-                logger.error(f"An error occurred in the server: {e}")
+        logger.info(f"TCP Server listening on {self.host}:{self.port} "
+                    f"(max connections: {self.max_connections}, idle timeout: {self.idle_timeout}s)")
+        self.server.serve_forever()
 
     def stop(self):
         self.running = False
-        if self.socket:
-            self.socket.close()
+        if self.server:
+            self.server.stop()
         logger.info("TCP Server stopped")
 
+    @property
+    def active_connections(self):
+        return len(self.pool) if self.pool is not None else 0
+
     def handle_client(self, conn, addr):
         logger.info(f"Connected by {addr}")
-        while self.running:
-            try:
-                ready = select.select([conn], [], [], 60)
-                if ready[0]:
-                    data = conn.recv(1024)
-                    if not data:
-                        logger.info(f"Connection closed by {addr}")
-                        break
-
-                    message = data.decode('utf-8').strip()
-                    logger.info(f"Received message: {message}")
+        conn.settimeout(self.idle_timeout)
+        buffer = FrameBuffer(max_frame_size=self.max_frame_size)
+        try:
+            while self.running:
+                if not buffer.recv_from(conn):
+                    logger.info(f"Connection closed by {addr}")
+                    break
+
+                try:
+                    frames = buffer.frames()
+                except FrameTooLarge as e:
+                    logger.warning(f"Oversized frame from {addr}: {e}")
+                    continue
 
+                # Queue every frame of this read before waiting, so they share micro-batches
+                pending = []
+                for frame in frames:
+                    message = decode_frame(frame)
+                    logger.info(f"Received message: {message}")
                     if self.message_handler:
-                        self.message_handler(message)
+                        pending.append(self.message_handler(message))
+                    else:
+                        conn.sendall(ACK)
+
+                if not self.acknowledge(conn, addr, pending):
+                    break
+        except socket.timeout:
+            logger.info(f"Connection with {addr} idle for {self.idle_timeout}s")
+        except Exception as e:
+            logger.error(f"Error handling client {addr}: {e}")
+        finally:
+            conn.close()
+            logger.info(f"Connection with {addr} closed.")
 
-                    # Send a minimal acknowledgment
-                    conn.sendall(b'\x06')  # ASCII ACK character
+    def acknowledge(self, conn, addr, pending):
+        """
+        ACK frames in order, each once its handler result says it was stored.
+        Returns False if a frame could not be stored and the connection must close.
+        """
+        for result in pending:
+            try:
+                stored = result.get()
             except Exception as e:
-                logger.error(f"Error handling client {addr}: {e}")
-                break
+                logger.error(f"Frame from {addr} was not stored, closing without ACK: {e}")
+                return False
+            if stored is None:
+                logger.error(f"Frame from {addr} was not stored, closing without ACK")
+                return False
+            conn.sendall(ACK)
+        return True
 
-        conn.close()
-        logger.info(f"Connection with {addr} closed.")
+def raise_file_limit(max_connections):
+    """
+    Raise the soft open-file limit so the receiver can actually hold
+    ``max_connections`` sockets (plus headroom for logs and DB connections).
+    """
+    try:
+        import resource
+    except ImportError:
+        return
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        wanted = max_connections + 1024
+        if hard != resource.RLIM_INFINITY:
+            wanted = min(wanted, hard)
+        if soft != resource.RLIM_INFINITY and soft < wanted:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+            logger.info(f"Raised open file limit from {soft} to {wanted}")
+    except (ValueError, OSError) as e:
+        logger.warning(f"Could not raise open file limit: {e}")
 
 def create_tcp_receiver(message_handler):
     return TCPReceiver(message_handler=message_handler)
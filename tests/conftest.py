@@ -0,0 +1,5 @@
+import os
+
+# src.config.env_loader reads these at import; the tests never reach a database
+os.environ.setdefault('POSTGRE_PORT', '5432')
+os.environ.setdefault('SECRET_KEY', 'test-secret')
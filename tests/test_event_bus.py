@@ -0,0 +1,23 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from src.ingest.event_bus import encode_payloads, decode_payload, FIX
+
+def event(i, message='ok'):
+    return {'id': i, 'voltage': Decimal('3.80'), 'inserted_at': datetime(2024, 3, 2, tzinfo=timezone.utc),
+            'message': message}
+
+def test_payloads_round_trip_within_the_size_limit():
+    events = [event(i) for i in range(200)]
+    payloads, oversized = encode_payloads('me', FIX, events, max_bytes=1000)
+    assert oversized == 0 and len(payloads) > 1
+    assert all(len(payload) <= 1000 for payload in payloads)
+    decoded = [decode_payload(payload) for payload in payloads]
+    assert [event for _, _, batch in decoded for event in batch] == events
+    assert {(origin, kind) for origin, kind, _ in decoded} == {('me', FIX)}
+
+def test_events_too_large_for_a_payload_are_left_out():
+    events = [event(0), event(1, 'x' * 2000), event(2)]
+    payloads, oversized = encode_payloads('me', FIX, events, max_bytes=1000)
+    assert oversized == 1
+    assert [event['id'] for payload in payloads for event in decode_payload(payload)[2]] == [0, 2]
+    assert encode_payloads('me', FIX, [event(1, 'x' * 2000)], max_bytes=1000) == ([], 1)
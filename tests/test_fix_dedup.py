@@ -0,0 +1,22 @@
+from datetime import datetime
+from src.ingest.fix_dedup import FixDeduplicator
+from src.ingest.mt700_parser import Fix, VALID_POSITION
+
+def fix(device_id, second, latitude=51.5):
+    return Fix(0, device_id, VALID_POSITION, 38.0, latitude, -0.1, 10.0, datetime(2024, 3, 2, 10, 0, second))
+
+def identities(fixes):
+    return [(fix.device_id, fix.gps_time.second) for fix in fixes]
+
+def test_key_is_the_gps_time_of_the_device():
+    dedup = FixDeduplicator(window=4, max_devices=10)
+    dedup.remember([fix('a', 0)])
+    # The database keeps one row per device and GPS time, whatever the position
+    fresh = dedup.fresh([fix('a', 0, latitude=51.6), fix('b', 0), fix('a', 1), fix('a', 1, latitude=51.7)])
+    assert identities(fresh) == [('b', 0), ('a', 1)]
+    assert dedup.stats()['memory_duplicates'] == 2
+
+def test_window_forgets_oldest_fixes():
+    dedup = FixDeduplicator(window=2, max_devices=10)
+    dedup.remember([fix('a', second) for second in range(3)])
+    assert identities(dedup.fresh([fix('a', second) for second in range(3)])) == [('a', 0)]
@@ -0,0 +1,149 @@
+import random
+from datetime import datetime, timezone
+import pytest
+from src.ingest.mt700_parser import (
+    Mt700Parser,
+    FrameError,
+    nmea_checksum,
+    parse_frame,
+    split_frames,
+    degrees_minutes
+)
+
+def record(voltage, sentence, checksum=None):
+    if checksum is None:
+        checksum = f"{nmea_checksum(sentence):02X}"
+    return f"#{voltage}${sentence}*{checksum}\r\n"
+
+def frame(imei, *records):
+    return f"#{imei}#MT700#0000#AUTO#{len(records)}\r\n" + ''.join(records) + "##"
+
+SENTENCE = "GPRMC,101010.00,A,5130.1234,N,00007.5678,W,12.50,90.00,020324,,,A"
+FIRST = record(38, SENTENCE)
+SECOND = record(37, "GPRMC,101040.00,A,5130.2234,N,00007.6678,W,13.00,91.00,020324,,,A")
+
+# Frames each path must treat the same way: odd but valid, and broken
+ODD_FRAMES = [
+    frame('860000000000010', record(38, SENTENCE, f"{nmea_checksum(SENTENCE):02x}")),
+    frame('860000000000011', record(38, SENTENCE, '00')),
+    frame('860000000000012', record(38, "GPRMC,101010.00,A,5130.1234,N,00007.5678,W,12.50,90.00,311324,,,A")),
+    frame('860000000000013', record(38, "GPRMC,1010,A,5130.1234,N,00007.5678,W,12.50,90.00,020324,,,A")),
+    frame('860000000000014', record(38, "GPRMC,101010.00,V,,,,,,,020324,,,N")),
+    frame('860000000000015', record(38, "GPRMC,101010.00,Q,5130.1234,S,00007.5678,E,,90.00,020324,,,A")),
+    frame('860000000000016', record(38, "GPRMC,101010.00,A,1e3,N,-7.5,W,12.50,90.00,020324,,,A")),
+    frame('860000000000017', record(38, "GPRMC,101010.00,A,5130.1234,N,00007.5678,W,12.50,90.00,020324")),
+    frame('860000000000018', record('', "GPRMC,101010.00,A,5130.1234,N,00007.5678,W,12.50,90.00,020324,,,A")),
+    frame('860000000000019', FIRST.replace('\r\n', ' \r\n')),
+    frame('860000000000020', FIRST, record(38, "GPRMC,101010.00,A,51x0.1234,N,00007.5678,W,1,2,020324,,,A"),
+          SECOND),
+    frame('860000000000021', FIRST.replace('*', '', 1)[:-4] + '\r\n', SECOND),
+    frame('860000000000022', FIRST) + 'junk',
+    frame('', FIRST),
+    frame('860000000000023'),
+    '#860000000000024#MT700#0000#AUTO#1\r\n',
+    'garbage',
+    '',
+]
+
+def reference(frames, require_checksum=False):
+    """(frame, device_id, record fields) of every record parse_frame accepts."""
+    expected = []
+    for position, message in enumerate(frames):
+        try:
+            device_id, records, _, _ = parse_frame(message, require_checksum)
+        except FrameError:
+            continue
+        expected += [(position, device_id) + tuple(fields) for fields in records]
+    return expected
+
+def parsed(frames, require_checksum=False):
+    return [(fix.frame, fix.device_id, fix.status, fix.voltage, fix.latitude, fix.longitude, fix.speed,
+             fix.gps_time) for fix in Mt700Parser(require_checksum).parse_many(frames).fixes()]
+
+def test_standard_frames_are_decoded_column_wise():
+    parser = Mt700Parser()
+    single = [frame('860000000000001', FIRST), frame('860000000000003', SECOND)]
+    assert len(parser.parse_many(single)) == 2
+    assert len(parser.parse_many(single + [frame('860000000000002', FIRST, SECOND)])) == 4
+    assert parser.stats()['slow_path_frames'] == 0
+    assert split_frames(single + ['garbage']) == ([0, 1], ['860000000000001', '860000000000003'],
+                                                  [FIRST[1:], SECOND[1:]], [2])
+
+def test_multi_record_frame():
+    fixes = Mt700Parser().parse_many([frame('860000000000002', FIRST, SECOND)]).fixes()
+    assert [(fix.frame, fix.device_id, fix.gps_time) for fix in fixes] == [
+        (0, '860000000000002', datetime(2024, 3, 2, 10, 10, 10)),
+        (0, '860000000000002', datetime(2024, 3, 2, 10, 10, 40))]
+    assert fixes[0].latitude == degrees_minutes('5130.1234')
+    assert fixes[0].longitude == -degrees_minutes('00007.5678')
+
+@pytest.mark.parametrize('require_checksum', [False, True])
+@pytest.mark.parametrize('message', ODD_FRAMES)
+def test_matches_parse_frame(message, require_checksum):
+    assert parsed([message], require_checksum) == reference([message], require_checksum)
+
+@pytest.mark.parametrize('require_checksum, parsed_count, rejected', [(False, 2, 2), (True, 1, 3)])
+def test_bad_records_are_counted(require_checksum, parsed_count, rejected):
+    parser = Mt700Parser(require_checksum)
+    parser.parse_many(ODD_FRAMES[:3] + ['garbage'])
+    stats = parser.stats()
+    assert stats['parsed'] == parsed_count
+    assert stats['rejected'] == rejected and stats['checksum_mismatches'] == 1
+
+@pytest.mark.parametrize('require_checksum', [False, True])
+def test_mixed_batch_matches_parse_frame(require_checksum):
+    rng = random.Random(7)
+    good = [frame(f"8600000000001{i:02d}", *([FIRST, SECOND][:rng.randint(1, 2)])) for i in range(40)]
+    frames = good + ODD_FRAMES
+    rng.shuffle(frames)
+    assert parsed(frames, require_checksum) == reference(frames, require_checksum)
+
+def test_batch_columns():
+    batch = Mt700Parser().parse_many(['garbage', frame('860000000000001', FIRST), frame('860000000000002', SECOND)])
+    assert batch.frame_index.tolist() == [1, 2]
+    assert batch.device_ids == ['860000000000001', '860000000000002']
+    assert batch.timestamps.tolist() == [datetime(2024, 3, 2, 10, 10, 10, tzinfo=timezone.utc).timestamp(),
+                                         datetime(2024, 3, 2, 10, 10, 40, tzinfo=timezone.utc).timestamp()]
+    assert batch.voltages.tolist() == [38.0, 37.0] and batch.speeds.tolist() == [12.5, 13.0]
+
+def test_two_record_frame_next_to_dropped_frame_keeps_device_ids():
+    # Three frames and three records: one frame holds two, the garbage one none
+    frames = [frame('860000000000001', FIRST), frame('860000000000002', FIRST, SECOND), 'garbage']
+    fixes = Mt700Parser().parse_many(frames).fixes()
+    assert [(fix.frame, fix.device_id) for fix in fixes] == [
+        (0, '860000000000001'), (1, '860000000000002'), (1, '860000000000002')]
+
+def test_nmea_checksum():
+    expected = 0
+    for char in SENTENCE * 3:
+        expected ^= ord(char)
+    assert nmea_checksum(SENTENCE * 3) == expected
+    assert nmea_checksum('') == 0
+
+@pytest.mark.parametrize('field, degrees', [
+    ('5130.1234', 51 + 30.1234 / 60), ('00007.5678', 7.5678 / 60), ('5130', 51.5), ('', 0), ('5.1', 5.1 / 60)])
+def test_degrees_minutes(field, degrees):
+    assert degrees_minutes(field) == pytest.approx(degrees, abs=1e-12)
+
+def mutated(rng, message):
+    """``message`` with a few characters replaced, deleted or inserted."""
+    chars = list(message)
+    for _ in range(rng.randint(1, 3)):
+        at = rng.randrange(len(chars) + 1)
+        edit = rng.random()
+        if edit < 0.4 and at < len(chars):
+            chars[at] = rng.choice('#$*,\r\n0123456789.ASNWEV-eé ')
+        elif edit < 0.7 and at < len(chars):
+            del chars[at]
+        else:
+            chars.insert(at, rng.choice('#$*,\r\n0123456789.ASNWEV-eé '))
+    return ''.join(chars)
+
+@pytest.mark.parametrize('require_checksum', [False, True])
+def test_damaged_batches_match_parse_frame(require_checksum):
+    rng = random.Random(11)
+    for _ in range(300):
+        frames = [frame(f"8600000000{rng.randint(0, 99999):05d}", *([FIRST, SECOND][:rng.randint(1, 2)]))
+                  for _ in range(rng.randint(1, 8))]
+        frames = [mutated(rng, message) if rng.random() < 0.4 else message for message in frames]
+        assert parsed(frames, require_checksum) == reference(frames, require_checksum)
@@ -0,0 +1,30 @@
+import time
+from datetime import datetime, timezone
+from src.ingest import offline_detector as module
+from src.ingest.offline_detector import OfflineDetector
+
+def liveness(now, **seconds_ago):
+    return [{'device_id': device_id, 'offline_timeout_seconds': None,
+             'last_seen': datetime.fromtimestamp(now - ago, timezone.utc)} for device_id, ago in seconds_ago.items()]
+
+def test_devices_silent_at_start_up_are_reported_on_the_first_tick(monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(module, 'get_device_liveness', lambda: liveness(now, stale=7200, fresh=60))
+    monkeypatch.setattr(module, 'get_active_notifications', lambda kind: [])
+    detector = OfflineDetector(timeout=900, tick=5)
+    detector.warm()
+    # The detector thread waits one tick before its first advance
+    expired = detector.advance(now + 5)
+    assert [device_id for device_id, _, _ in expired] == ['stale']
+    assert detector.advance(now + 830) == []
+    assert [device_id for device_id, _, _ in detector.advance(now + 845)] == ['fresh']
+
+def test_already_reported_devices_are_not_reported_again(monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(module, 'get_device_liveness', lambda: liveness(now, stale=7200))
+    monkeypatch.setattr(module, 'get_active_notifications', lambda kind: [{'device_id': 'stale'}])
+    detector = OfflineDetector(timeout=900, tick=5)
+    detector.warm()
+    assert detector.advance(now + 5) == []
+    detector.touch(['stale'], seen_at=now + 10)
+    assert detector.stats()['reconnects'] == 1
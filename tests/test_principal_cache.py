@@ -0,0 +1,58 @@
+import time
+import jwt
+from flask import Flask
+from src.config.env_loader import SECRET_KEY
+from src.middleware import auth_middleware
+from src.middleware.principal_cache import PrincipalCache
+
+USER = {'id': 7, 'username': 'alice'}
+
+def token(user_id=7):
+    return jwt.encode({'user_id': user_id, 'exp': int(time.time()) + 3600}, SECRET_KEY, algorithm='HS256')
+
+def client():
+    app = Flask(__name__)
+
+    @app.route('/me')
+    @auth_middleware.token_required
+    def me():
+        return {'user': auth_middleware.request.user['username']}
+
+    return app.test_client()
+
+def test_put_after_invalidate_is_skipped():
+    cache = PrincipalCache(ttl=60, max_size=10)
+    generation = cache.generation(7)
+    cache.invalidate(7)
+    cache.put(7, 'token', USER, generation=generation)
+    assert cache.get(7, 'token') is None
+    cache.put(7, 'token', USER, generation=cache.generation(7))
+    assert cache.get(7, 'token') == USER
+
+def test_account_deleted_during_lookup_is_not_cached(monkeypatch):
+    cache = PrincipalCache(ttl=60, max_size=10)
+    monkeypatch.setattr(auth_middleware, 'principal_cache', cache)
+    deleted = []
+
+    def find_user_by_id(user_id):
+        if deleted:
+            return None
+        # The account is deleted after this request read the row, before it caches it
+        deleted.append(user_id)
+        cache.invalidate(user_id)
+        return USER
+
+    monkeypatch.setattr(auth_middleware, 'find_user_by_id', find_user_by_id)
+    headers = {'Authorization': f"Bearer {token()}"}
+    assert client().get('/me', headers=headers).status_code == 200
+    assert client().get('/me', headers=headers).status_code == 401
+
+def test_verified_user_is_served_from_the_cache(monkeypatch):
+    cache = PrincipalCache(ttl=60, max_size=10)
+    monkeypatch.setattr(auth_middleware, 'principal_cache', cache)
+    lookups = []
+    monkeypatch.setattr(auth_middleware, 'find_user_by_id', lambda user_id: lookups.append(user_id) or USER)
+    headers = {'Authorization': f"Bearer {token()}"}
+    for _ in range(3):
+        assert client().get('/me', headers=headers).get_json() == {'user': 'alice'}
+    assert lookups == [7]
@@ -0,0 +1,31 @@
+from src.ingest.speed_rules import SpeedRuleEngine, SpeedRule
+
+def feed(engine, device_id, samples):
+    """Feed (timestamp, speed) samples one fix per batch; returns the alerts raised."""
+    alerts = []
+    for timestamp, speed in samples:
+        alerts += engine.evaluate([device_id], [timestamp], [speed])
+    return alerts
+
+def test_rule_longer_than_many_fixes_fires():
+    # One fix every 5 seconds: a 10-minute rule needs a run of 121 fixes
+    engine = SpeedRuleEngine(rules=[SpeedRule(60, 600)], hysteresis=2)
+    alerts = feed(engine, 'a', [(t * 5.0, 70.0 + t % 3) for t in range(200)])
+    assert [(position, device_id, peak, seconds) for position, device_id, _, peak, seconds in alerts] == [
+        (0, 'a', 72.0, 600.0)]
+    assert engine.stats()['suppressed'] == 79
+
+def test_run_restarts_below_threshold_and_rearms_after_hysteresis():
+    engine = SpeedRuleEngine(rules=[SpeedRule(60, 20)], hysteresis=2)
+    assert feed(engine, 'a', [(0, 70), (10, 59), (20, 70), (30, 70)]) == []
+    assert len(feed(engine, 'a', [(40, 70)])) == 1
+    # Dipping under the threshold but within the hysteresis keeps the alert latched
+    assert feed(engine, 'a', [(50, 59), (60, 70), (70, 70), (80, 70)]) == []
+    assert feed(engine, 'a', [(90, 50), (100, 70), (110, 70)]) == []
+    assert len(feed(engine, 'a', [(120, 70)])) == 1
+
+def test_out_of_order_fixes_are_ignored():
+    engine = SpeedRuleEngine(rules=[SpeedRule(60, 10)])
+    assert feed(engine, 'a', [(100, 70), (50, 70), (105, 70)]) == []
+    assert engine.stats()['out_of_order'] == 1
+    assert len(feed(engine, 'a', [(110, 70)])) == 1